@@ -1,10 +1,12 @@
 from sqladmin import Admin, ModelView
 from sqladmin.authentication import AuthenticationBackend
 from fastapi import Request, Form
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from app.repo.user_repo import UserRepo
 from app.repo.datasource import DataSource
-from app.utils.hashing import Hash
+from app.service.hashing_service import hashing_service
+from app.utils.exceptions import HashingBusyError
 from app.utils.auth import get_current_user
 from app.model.user_record import UserRecord
 from app.model.room_record import RoomRecord
@@ -20,7 +22,7 @@ class AdminAuthBackend(AuthenticationBackend):
         # Check session
         user_id = request.session.get("user")
         if user_id:
-            user_record = self.user_repo.get_user_by_id(user_id)
+            user_record = await run_in_threadpool(self.user_repo.get_user_by_id, user_id)
             if user_record and user_record.role == "admin":
                 return user_record
         return None
@@ -29,8 +31,13 @@ class AdminAuthBackend(AuthenticationBackend):
         form = await request.form()
         email = form.get("username")
         password = form.get("password")
-        user_record = self.user_repo.get_user_by_email(email)
-        if user_record and user_record.role == "admin" and Hash.verify(password, user_record.password):
+        user_record = await run_in_threadpool(self.user_repo.get_user_by_email, email, True)
+        try:
+            verified = user_record is not None and user_record.role == "admin" \
+                and await hashing_service.verify(password, user_record.password)
+        except HashingBusyError as e:
+            return PlainTextResponse(str(e), status_code=429)
+        if verified:
             # Set session
             request.session["user"] = str(user_record.id)
             response = RedirectResponse(url="/admin", status_code=302)
@@ -1,5 +1,5 @@
 from fastapi import FastAPI
-from app.api.routers import auth_routes, user_routes, room_routes, message_routes, ws_routes,admin_analytics_routes
+from app.api.routers import auth_routes, user_routes, room_routes, message_routes, ws_routes,admin_analytics_routes,admin_user_routes
 
 def include_routers(app):
     app.include_router(user_routes.router)
@@ -7,4 +7,5 @@ def include_routers(app):
     app.include_router(message_routes.router)
     app.include_router(auth_routes.router)
     app.include_router(ws_routes.router)
-    app.include_router(admin_analytics_routes.router)
\ No newline at end of file
+    app.include_router(admin_analytics_routes.router)
+    app.include_router(admin_user_routes.router)
\ No newline at end of file
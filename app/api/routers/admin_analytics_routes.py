@@ -1,17 +1,51 @@
-from fastapi import APIRouter, Depends, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime
-from app.repo.datasource import DataSource
-from app.model.room_record import RoomRecord
-from app.model.message_record import MessageRecord
-from app.model.user_record import UserRecord
-from app.utils.auth import require_admin, get_db
-from typing import List, Optional
-import csv
-import io
+from datetime import datetime, timedelta, timezone
+from app.repo.analytics_repo import AnalyticsRepo, SORT_COUNT
+from app.repo.datasource import READ, AsyncDataSource, DataSource
+from app.repo.message_repo import MessageRepo
+from app.repo.partition_repo import PartitionRepo
+from app.repo.sketch_repo import SketchRepo
+from app.repo.user_cache import user_identity_cache
+from app.service.partition_service import PartitionService
+from app.service.rollup_service import RollupService
+from app.service.session_store import session_store
+from app.service.sketch_service import active_user_sketches, estimate_distinct_users
+from app.service.timeseries_service import TimeseriesService
+from app.settings import settings
+from app.utils import exportutil, tokenutil
+from app.utils.auth import require_admin, get_read_db
+from typing import Any, Callable, Iterator, List, Optional, Sequence
 
 router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"])
+analytics_repo = AnalyticsRepo()
+message_repo = MessageRepo()
+sketch_repo = SketchRepo()
+rollup_service = RollupService(DataSource(), analytics_repo)
+partition_service = PartitionService(DataSource(), PartitionRepo(), analytics_repo)
+timeseries_service = TimeseriesService(analytics_repo)
+
+@router.get("/cache-stats")
+def cache_stats(current_user=Depends(require_admin)):
+    """
+    Returns hit/miss counters of this worker's in-process caches, plus session store sizes and replica health.
+    """
+    return {"user_identity": user_identity_cache.stats(), "verified_tokens": tokenutil.stats(),
+            "sessions": session_store.stats(), "timeseries_buckets": timeseries_service.stats(),
+            "user_sketches": active_user_sketches.stats(),
+            "replicas": {"sync": DataSource().replicas.stats(), "async": AsyncDataSource().replicas.stats()}}
+
+@router.get("/rollups/check")
+def check_rollups(
+    current_user=Depends(require_admin),
+    days: Optional[int] = Query(7, ge=1, description="Number of most recent rolled-up days to verify"),
+    repair: bool = Query(False, description="Recompute days whose rollups disagree with raw counts")
+):
+    """
+    Compares the daily rollups with raw message counts and lists the days that differ.
+    """
+    return {"mismatches": rollup_service.check(days, repair)}
 
 def parse_date(date_str: Optional[str]) -> Optional[datetime]:
     if date_str:
@@ -21,85 +55,160 @@ def parse_date(date_str: Optional[str]) -> Optional[datetime]:
             return None
     return None
 
+FORMAT_PATTERN = "^(json|csv|ndjson|arrow|parquet)$"
+EXPORT_FORMAT_PATTERN = "^(csv|ndjson|arrow|parquet)$"
+
+ROOM_COUNT_COLUMNS = [("room_id", "string"), ("room_name", "string"), ("message_count", "int")]
+USER_ACTIVITY_COLUMNS = [("user_id", "string"), ("username", "string"), ("email", "string"), ("message_count", "int")]
+MESSAGE_COLUMNS = [("id", "string"), ("room_id", "string"), ("user_id", "string"), ("full_name", "string"),
+                   ("content", "string"), ("created_at", "timestamp"), ("updated_at", "timestamp")]
+
+def _export_batches(fetch: Callable[[Session], Iterator[Sequence]]) -> Iterator[Sequence]:
+    # The export owns its session: it outlives the request handler and is closed with the stream
+    db = DataSource()
+    session = db.get_session(READ)
+    try:
+        yield from fetch(session)
+    finally:
+        db.close_session(session)
+
+def _export_response(request: Request, format: str, fetch: Callable[[Session], Iterator[Sequence]],
+                     columns: exportutil.Columns, name: str) -> StreamingResponse:
+    if format in (exportutil.ARROW, exportutil.PARQUET) and not exportutil.has_pyarrow():
+        raise HTTPException(status_code=501, detail=f"format={format} requires pyarrow on the server")
+    chunks = exportutil.encode(format, _export_batches(fetch), columns)
+    return StreamingResponse(
+        exportutil.stream(request, chunks),
+        media_type=exportutil.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={name}.{exportutil.EXTENSIONS[format]}"}
+    )
+
+def _report(build_query: Callable[[Session], Any]) -> Callable[[Session], Iterator[Sequence]]:
+    return lambda session: analytics_repo.stream(session, build_query(session), settings.EXPORT_CHUNK_ROWS)
+
+def _paging(sort: str, order: str, skip: int, limit: Optional[int], top: Optional[int]) -> dict:
+    # top=N is shorthand for the N busiest entries
+    if top is not None:
+        return {"sort": SORT_COUNT, "descending": True, "skip": 0, "limit": top}
+    return {"sort": sort, "descending": order == "desc", "skip": skip, "limit": limit}
+
 @router.get("/messages-per-room")
 def messages_per_room(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user=Depends(require_admin),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)", alias="start_date"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)", alias="end_date"),
-    format: str = Query("json", description="Response format: json or csv")
+    format: str = Query("json", pattern=FORMAT_PATTERN, description="Response format: json, csv, ndjson, arrow or parquet"),
+    sort: str = Query(SORT_COUNT, pattern="^(count|name)$", description="Sort by message count or room name"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort direction"),
+    skip: int = Query(0, ge=0, description="Number of rooms to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of rooms to return"),
+    top: Optional[int] = Query(None, ge=1, description="Only the N rooms with the most messages")
 ):
     """
-    Returns a list of rooms with the count of messages in each room. Optional date filters. Supports CSV export.
+    Returns a list of rooms with the count of messages in each room. Optional date filters. Supports CSV, NDJSON, Arrow and Parquet export.
     """
     start = parse_date(start_date)
     end = parse_date(end_date)
-    rooms = db.query(RoomRecord).all()
-    result = []
-    for room in rooms:
-        msg_query = db.query(MessageRecord).filter(MessageRecord.room_id == room.id)
-        if start:
-            msg_query = msg_query.filter(MessageRecord.created_at >= start)
-        if end:
-            msg_query = msg_query.filter(MessageRecord.created_at <= end)
-        message_count = msg_query.count()
-        result.append({
-            "room_id": room.id,
-            "room_name": room.name,
-            "message_count": message_count
-        })
-    if format == "csv":
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=["room_id", "room_name", "message_count"])
-        writer.writeheader()
-        for row in result:
-            writer.writerow(row)
-        output.seek(0)
-        return StreamingResponse(
-            output,
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=messages_per_room.csv"}
-        )
-    return {"rooms": result}
+    paging = _paging(sort, order, skip, limit, top)
+    if format != "json":
+        return _export_response(
+            request, format, _report(lambda s: analytics_repo.messages_per_room_query(s, start=start, end=end, **paging)),
+            ROOM_COUNT_COLUMNS, "messages_per_room")
+    rows = analytics_repo.messages_per_room(db, start=start, end=end, **paging)
+    return {"rooms": [dict(row) for row in rows]}
 
 @router.get("/user-activity")
 def user_activity(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user=Depends(require_admin),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)", alias="start_date"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)", alias="end_date"),
-    format: str = Query("json", description="Response format: json or csv")
+    format: str = Query("json", pattern=FORMAT_PATTERN, description="Response format: json, csv, ndjson, arrow or parquet"),
+    sort: str = Query(SORT_COUNT, pattern="^(count|name)$", description="Sort by message count or username"),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort direction"),
+    skip: int = Query(0, ge=0, description="Number of users to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of users to return"),
+    top: Optional[int] = Query(None, ge=1, description="Only the N most active users")
 ):
     """
-    Returns a list of users with the count of messages sent by each user. Optional date filters. Supports CSV export.
+    Returns a list of users with the count of messages sent by each user. Optional date filters. Supports CSV, NDJSON, Arrow and Parquet export.
     """
     start = parse_date(start_date)
     end = parse_date(end_date)
-    users = db.query(UserRecord).all()
-    result = []
-    for user in users:
-        msg_query = db.query(MessageRecord).filter(MessageRecord.user_id == user.id)
-        if start:
-            msg_query = msg_query.filter(MessageRecord.created_at >= start)
-        if end:
-            msg_query = msg_query.filter(MessageRecord.created_at <= end)
-        message_count = msg_query.count()
-        result.append({
-            "user_id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "message_count": message_count
-        })
-    if format == "csv":
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=["user_id", "username", "email", "message_count"])
-        writer.writeheader()
-        for row in result:
-            writer.writerow(row)
-        output.seek(0)
-        return StreamingResponse(
-            output,
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=user_activity.csv"}
-        )
-    return {"users": result}
+    paging = _paging(sort, order, skip, limit, top)
+    if format != "json":
+        return _export_response(
+            request, format, _report(lambda s: analytics_repo.user_activity_query(s, start=start, end=end, **paging)),
+            USER_ACTIVITY_COLUMNS, "user_activity")
+    rows = analytics_repo.user_activity(db, start=start, end=end, **paging)
+    return {"users": [dict(row) for row in rows]}
+
+@router.get("/rooms/{room_id}/export")
+def export_room_history(
+    room_id: str,
+    request: Request,
+    current_user=Depends(require_admin),
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN, description="csv, ndjson, arrow or parquet"),
+    start_date: Optional[str] = Query(None, description="Only messages from this time on (ISO 8601)"),
+    end_date: Optional[str] = Query(None, description="Only messages before this time (ISO 8601)")
+):
+    """
+    Streams a room's message history, oldest first, in record batches. A date range only reads
+    the monthly partitions it overlaps.
+    """
+    start, end = parse_date(start_date), parse_date(end_date)
+    return _export_response(
+        request, format,
+        lambda s: message_repo.stream_history(s, room_id, settings.EXPORT_CHUNK_ROWS, start=start, end=end),
+        MESSAGE_COLUMNS, f"room_{room_id}_messages")
+
+@router.get("/partitions")
+def list_partitions(current_user=Depends(require_admin)):
+    """
+    Monthly partitions of the messages table and the retention in force.
+    """
+    return partition_service.partitions()
+
+@router.get("/timeseries")
+def timeseries(
+    db: Session = Depends(get_read_db),
+    current_user=Depends(require_admin),
+    bucket: str = Query("hour", pattern="^(minute|hour|day)$", description="Bucket width: minute, hour or day"),
+    start_date: Optional[str] = Query(None, description="Range start (ISO 8601); defaults to 1h/24h/30d before the end"),
+    end_date: Optional[str] = Query(None, description="Range end (ISO 8601); defaults to now"),
+    group_by: Optional[str] = Query(None, pattern="^(room|user)$", description="One series per room or per user"),
+    room_id: Optional[str] = Query(None, description="Only messages in this room"),
+    user_id: Optional[str] = Query(None, description="Only messages from this user")
+):
+    """
+    Returns message counts per time bucket as dense arrays, zero-filled where a bucket had no messages.
+    """
+    try:
+        return timeseries_service.series(db, bucket, parse_date(start_date), parse_date(end_date),
+                                         group_by=group_by, room_id=room_id, user_id=user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/distinct-users")
+def distinct_users(
+    db: Session = Depends(get_read_db),
+    current_user=Depends(require_admin),
+    start_date: Optional[str] = Query(None, description="First day (YYYY-MM-DD); defaults to 6 days before the last"),
+    end_date: Optional[str] = Query(None, description="Last day (YYYY-MM-DD), inclusive; defaults to today"),
+    room_id: Optional[List[str]] = Query(None, description="Rooms to merge (repeatable); all rooms by default"),
+    per_room: bool = Query(False, description="Also return an estimate for each room")
+):
+    """
+    Approximate number of distinct users who posted in the given rooms and days, merged from per-room daily
+    HyperLogLog sketches (about 1.6% standard error).
+    """
+    end = parse_date(end_date)
+    last_day = end.date() if end else datetime.now(timezone.utc).date()
+    start = parse_date(start_date)
+    first_day = start.date() if start else last_day - timedelta(days=6)
+    if first_day > last_day:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    return estimate_distinct_users(db, sketch_repo, first_day, last_day, room_id, per_room)
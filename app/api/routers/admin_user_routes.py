@@ -0,0 +1,40 @@
+import anyio
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.repo.datasource import DataSource
+from app.repo.user_repo import UserRepo
+from app.service.user_import_service import CSV, NDJSON, UserImportService, read_rows
+from app.utils import jsonutil
+from app.utils.auth import require_admin
+
+router = APIRouter(prefix="/admin/users", tags=["Admin Users"])
+user_import_service = UserImportService(UserRepo(db=DataSource()))
+
+@router.post("/import")
+async def import_users(
+    current_user=Depends(require_admin),
+    file: UploadFile = File(..., description="CSV with a header row, or one JSON object per line"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults from the file extension")
+):
+    """
+    Creates users from an uploaded file with columns email, full_name, password and optionally
+    username, role, phone and profile_pic_url. Results stream back as NDJSON, one line per input
+    row ({row, email, status: created|duplicate|invalid|failed, ...}) followed by a summary line.
+    """
+    if format is None:
+        filename = (file.filename or "").lower()
+        format = NDJSON if filename.endswith((".ndjson", ".jsonl")) else CSV
+    if format not in (CSV, NDJSON):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    async def results():
+        try:
+            async for result in user_import_service.import_rows(read_rows(file.file, format)):
+                yield jsonutil.dumps(result) + "\n"
+        finally:
+            # A client disconnect cancels the stream; still close the spooled upload
+            with anyio.CancelScope(shield=True):
+                await file.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -1,11 +1,13 @@
 # Authentication API routes 
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader, OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from app.domain.auth import  LoginResponse, LogoutResponse, Session
 from app.domain.common import ErrorCode
 from app.domain.auth import LoginResponse, Session, LogoutResponse
 from app.service.auth_service import AuthService
 from app.utils import loggerutil
+from app.utils.exceptions import HashingBusyError
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=True)
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=True)
@@ -22,7 +24,8 @@ async def get_authorization_token(authorization: str = Depends(oauth2_scheme)):
 
 
 async def authorize(authorization: str = Depends(oauth2_scheme)):
-    res = auth_service.authorize(authorization)
+    # The session store (SQLite/Redis) and user lookup block
+    res = await run_in_threadpool(auth_service.authorize, authorization)
     if res.error:
         raise HTTPException(status_code=res.code.value, detail=res.msg)
     return res.session.user
@@ -31,8 +34,10 @@ async def authorize(authorization: str = Depends(oauth2_scheme)):
 @router.post("/auth/login", response_model=LoginResponse)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     try:
-        res = auth_service.login(form_data.username, form_data.password)
+        res = await auth_service.login(form_data.username, form_data.password)
         return res
+    except HashingBusyError as e:
+        raise HTTPException(status_code=ErrorCode.TOO_MANY_REQUESTS.value, detail=str(e))
     except ValueError as ve:
         logger.error(f"Validation error: {ve}")
         return LoginResponse(error=True, code=ErrorCode.UNAUTHORIZED, msg=str(ve))
@@ -44,11 +49,15 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 @router.post("/auth/token", response_model=Session)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     try:
-        res = auth_service.login(form_data.username, form_data.password)
+        res = await auth_service.login(form_data.username, form_data.password)
         if res.error:
             logger.error(f"Invalid credentials for user: {form_data.username}")
             raise HTTPException(status_code=res.code.value, detail=res.msg)
         return res.session
+    except HTTPException:
+        raise
+    except HashingBusyError as e:
+        raise HTTPException(status_code=ErrorCode.TOO_MANY_REQUESTS.value, detail=str(e))
     except ValueError as ve:
         logger.error(f"Validation error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -60,7 +69,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 @router.post("/auth/logout", response_model=LogoutResponse)
 async def logout(token: str = Depends(oauth2_scheme)):
     try:
-        return auth_service.logout(token)
+        return await run_in_threadpool(auth_service.logout, token)
     except ValueError as ve:
         logger.error(f"Validation error: {ve}")
         return LogoutResponse(error=True, code=ErrorCode.UNAUTHORIZED, msg=str(ve))
@@ -1,34 +1,62 @@
 # Message API routes 
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends, Query
 from app.domain.message_req_res import (
     CreateMessageRequest, CreateMessageResponse,
-    ListMessageRequest, ListMessageResponse
+    ListMessageRequest, ListMessageResponse,
+    SearchMessageResponse
 )
-from app.repo.message_repo import MessageRepo
+from app.api.routers.ws_routes import room_broker
+from app.repo.message_repo import AsyncMessageRepo
 from app.service.message_service import MessageService
 from app.utils import loggerutil
-from app.repo.datasource import DataSource
+from app.repo.datasource import READ, WRITE, AsyncDataSource
 from app.utils.auth import get_current_user
 
 router = APIRouter(prefix="/message", tags=["Messages"])
 
-message_repo = MessageRepo()
-message_service = MessageService(message_repo)
+message_repo = AsyncMessageRepo()
+message_service = MessageService(message_repo, room_broker=room_broker)
 logger = loggerutil.get_logger(__name__)
-db = DataSource()
+db = AsyncDataSource()
 
 @router.post("/rooms/{room_id}/messages", response_model=CreateMessageResponse)
-def create_message(room_id: str, request: CreateMessageRequest, current_user=Depends(get_current_user)):
-    session = db.get_session()
+async def create_message(room_id: str, request: CreateMessageRequest, current_user=Depends(get_current_user)):
+    session = db.get_session(WRITE, user_id=current_user.id)
     try:
-        return message_service.create_message(session, request=request, user_id=current_user.id, room_id=room_id)
+        return await message_service.create_message(session, request=request, user_id=current_user.id, room_id=room_id)
     finally:
-        db.close_session(session)
+        await db.close_session(session)
+
+@router.get("/search", response_model=SearchMessageResponse)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=256, description="Words to search for"),
+    room_id: Optional[str] = Query(None, description="Only search this room"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page"),
+    current_user=Depends(get_current_user)
+):
+    """
+    Full-text search over the messages of rooms the user administers or has posted in
+    (every room for admins), best match first. Matches are wrapped in <mark> in `highlight`.
+    """
+    session = db.get_session(READ, user_id=current_user.id)
+    try:
+        return await message_service.search_messages(session, q, current_user, room_id=room_id, limit=limit,
+                                                     cursor=cursor)
+    finally:
+        await db.close_session(session)
 
 @router.get("/rooms/{room_id}/messages", response_model=ListMessageResponse)
-def list_messages(room_id: str, skip: int = Query(0), limit: int = Query(50), current_user=Depends(get_current_user)):
-    session = db.get_session()
+async def list_messages(
+    room_id: str,
+    skip: int = Query(0),
+    limit: int = Query(50),
+    cursor: Optional[str] = Query(None, description="next_cursor/prev_cursor from a previous page; takes precedence over skip"),
+    current_user=Depends(get_current_user)
+):
+    session = db.get_session(READ, user_id=current_user.id)
     try:
-        return message_service.list_messages(session, room_id=room_id, skip=skip, limit=limit)
+        return await message_service.list_messages(session, room_id=room_id, skip=skip, limit=limit, cursor=cursor)
     finally:
-        db.close_session(session)
\ No newline at end of file
+        await db.close_session(session)
\ No newline at end of file
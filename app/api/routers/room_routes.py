@@ -9,7 +9,7 @@ from app.domain.room_req_res import (
 )
 from app.service.room_service import RoomService
 from app.utils import loggerutil
-from app.repo.datasource import DataSource
+from app.repo.datasource import READ, WRITE, DataSource
 from app.repo.room_repo import RoomRepo
 from app.utils.auth import get_current_user, require_admin
 
@@ -22,7 +22,7 @@ db = DataSource()
 
 @router.post("/", response_model=CreateRoomResponse)
 def create_room(request: CreateRoomRequest, current_user=Depends(get_current_user)):
-    session = db.get_session()
+    session = db.get_session(WRITE, user_id=current_user.id)
     try:
         return room_service.create_room(session, request=request, current_user=current_user)
     finally:
@@ -30,7 +30,7 @@ def create_room(request: CreateRoomRequest, current_user=Depends(get_current_use
 
 @router.get("/rooms", response_model=ListRoomResponse)
 def list_rooms(skip: int = Query(0), limit: int = Query(10), current_user=Depends(get_current_user)):
-    session = db.get_session()
+    session = db.get_session(READ, user_id=current_user.id)
     try:
         return room_service.list_rooms(session, current_user, skip=skip, limit=limit)
     finally:
@@ -38,7 +38,7 @@ def list_rooms(skip: int = Query(0), limit: int = Query(10), current_user=Depend
 
 @router.get("/{room_id}", response_model=GetRoomResponse)
 def get_room(room_id: str, current_user=Depends(get_current_user)):
-    session = db.get_session()
+    session = db.get_session(READ, user_id=current_user.id)
     try:
         return room_service.get_room(session, room_id, current_user)
     finally:
@@ -46,7 +46,7 @@ def get_room(room_id: str, current_user=Depends(get_current_user)):
 
 @router.patch("/{room_id}", response_model=UpdateRoomResponse)
 def update_room(room_id: str, request: UpdateRoomRequest, current_user=Depends(get_current_user)):
-    session = db.get_session()
+    session = db.get_session(WRITE, user_id=current_user.id)
     try:
         return room_service.update_room(session, room_id, request, current_user)
     finally:
@@ -54,7 +54,7 @@ def update_room(room_id: str, request: UpdateRoomRequest, current_user=Depends(g
 
 @router.delete("/{room_id}", response_model=DeleteRoomResponse)
 def delete_room(room_id: str, current_user=Depends(get_current_user)):
-    session = db.get_session()
+    session = db.get_session(WRITE, user_id=current_user.id)
     try:
         return room_service.delete_room(session, room_id, current_user)
     finally:
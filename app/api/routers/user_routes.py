@@ -1,5 +1,6 @@
 # User API routes 
 from fastapi import APIRouter, Depends, Query, HTTPException
+from starlette.concurrency import run_in_threadpool
 from app.api.routers.auth_routes import get_authorization_token
 from app.domain.common import ErrorCode
 from app.domain.user_req_res import (
@@ -13,6 +14,7 @@ from app.repo.user_repo import UserRepo
 from app.service.auth_service import AuthService
 from app.service.user_service import UserService
 from app.utils import loggerutil
+from app.utils.exceptions import HashingBusyError
 from app.repo.datasource import DataSource
 
 router = APIRouter(prefix="/user", tags=["Users"])
@@ -26,14 +28,13 @@ user_service = UserService(auth_service=auth_service, user_repo=user_repo)  # Pa
 logger = loggerutil.get_logger(__name__)
 
 @router.post("/signup", response_model=CreateUserResponse)
-def signup_user(req: CreateUserRequest):
+async def signup_user(req: CreateUserRequest):
     print("Signup endpoint called")
-    session = db.get_session()
     try:
-        response = user_service.create_user(req)
+        response = await user_service.create_user(req)
         return response
-    finally:
-        db.close_session(session)
+    except HashingBusyError as e:
+        raise HTTPException(status_code=ErrorCode.TOO_MANY_REQUESTS.value, detail=str(e))
 
 @router.get("/users", response_model=ListUserResponse)
 def get_all_users(
@@ -74,17 +75,20 @@ def update_user(
         return UpdateUserResponse(error=True, msg=str(e))
 
 @router.post("/update_password", response_model=UpdateUserPasswordResponse)
-def update_password(
+async def update_password(
     req: UpdateUserPasswordRequest,
     authorization: str = Depends(get_authorization_token)
 ):
     # Extract user info from token
-    user_info = user_service.auth_service.authorize(authorization)
+    user_info = await run_in_threadpool(user_service.auth_service.authorize, authorization)
     if not user_info or not user_info.session or not user_info.session.user:
         raise HTTPException(status_code=401, detail="Unauthorized")
     user_id = user_info.session.user.id
 
-    response = user_service.update_user_password(user_id, req)
+    try:
+        response = await user_service.update_user_password(user_id, req)
+    except HashingBusyError as e:
+        raise HTTPException(status_code=ErrorCode.TOO_MANY_REQUESTS.value, detail=str(e))
     if not response.success:
         raise HTTPException(status_code=400, detail=response.msg)
     return response
\ No newline at end of file
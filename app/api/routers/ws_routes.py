@@ -1,35 +1,98 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, status
 from fastapi.responses import JSONResponse
-from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
 from app.settings import settings
-from app.repo.user_repo import UserRepo
-from app.repo.room_repo import RoomRepo
-from app.utils.auth import get_db
-from sqlalchemy.orm import Session
-from typing import Dict, List, Optional
-from app.model.message_record import MessageRecord
+from app.repo.user_repo import AsyncUserRepo
+from app.repo.user_cache import user_identity_cache
+from app.utils.auth import require_admin
+from app.utils import jsonutil, tokenutil
+from app.utils.exceptions import MessageBufferFullError
+from typing import Optional
 from app.model.user_record import UserRecord
-from datetime import datetime
+from app.repo.datasource import READ, AsyncDataSource, recent_writers
+from app.repo.message_repo import AsyncMessageRepo
+from app.service.connection_manager import ConnectionManager
+from app.service.message_cache import CachedMessage, recent_messages
+from app.service.message_service import MessageService
+from app.service.message_writer import MessageWriter
+from app.service.room_broker import create_room_broker
+from app.service.session_store import session_store
+from app.service.sketch_service import active_user_sketches
+from datetime import datetime, timezone
 import uuid
 
 router = APIRouter()
 
-# In-memory room connections: {room_id: [WebSocket, ...]}
-room_connections: Dict[str, List[WebSocket]] = {}
+db = AsyncDataSource()
+user_repo = AsyncUserRepo(db)
+message_repo = AsyncMessageRepo()
+message_service = MessageService(message_repo)
 
-def get_user_from_token(token: str, db: Session) -> Optional[UserRecord]:
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email = payload.get("sub")
-        if not isinstance(email, str) or not email:
-            return None
-        user = db.query(UserRecord).filter(UserRecord.email == email).first()
-        return user
-    except JWTError:
+# Fans messages out to every worker with members in the room
+room_broker = create_room_broker()
+# Sockets connected to this worker, each with its own bounded send queue
+connection_manager = ConnectionManager(room_broker)
+# Persists incoming chat lines, optionally write-behind in batches
+message_writer = MessageWriter(db, message_repo)
+
+
+async def on_room_frame(room_id: str, frame: str):
+    # Keeps this worker's ring buffer current with messages written on other workers too
+    recent_messages.append_frame(room_id, frame)
+    await connection_manager.broadcast(room_id, frame)
+
+async def on_broker_event(frame: str):
+    # A user was updated or deleted on some worker: drop this worker's cached copy
+    user_identity_cache.apply_event(frame)
+
+room_broker.set_handler(on_room_frame)
+room_broker.set_event_handler(on_broker_event)
+
+
+@router.get("/ws/stats")
+def websocket_stats(current_user=Depends(require_admin)):
+    """
+    Returns send-queue depth and drop counters for the sockets connected to this worker,
+    plus the state of the message write pipeline and the recent-message cache.
+    """
+    return {
+        **connection_manager.stats(),
+        "message_writer": message_writer.stats(),
+        "message_cache": recent_messages.stats(),
+    }
+
+async def get_user_from_token(token: str) -> Optional[UserRecord]:
+    payload = tokenutil.verify_token(token)
+    # The SQLite and Redis session stores block, keep them off the event loop
+    if payload is None or await run_in_threadpool(session_store.is_revoked, token):
         return None
+    email = payload.get("sub")
+    if not isinstance(email, str) or not email:
+        return None
+    return await user_repo.get_user_by_email(email)
+
+def history_depth(websocket: WebSocket) -> int:
+    try:
+        depth = int(websocket.query_params.get("history", settings.WS_HISTORY_DEFAULT))
+    except ValueError:
+        depth = settings.WS_HISTORY_DEFAULT
+    return max(0, min(depth, settings.WS_HISTORY_MAX))
+
+
+async def send_history(websocket: WebSocket, room_id: str, depth: int, user_id: Optional[str] = None):
+    if depth <= 0:
+        return
+    # Short-lived session (only used on a cache miss) so the socket doesn't hold a pooled connection
+    async with db.get_session(READ, user_id=user_id) as session:
+        recent = await message_service.recent_history(session, str(room_id), depth)
+    history = [msg.to_dict() for msg in recent]  # Oldest first
+    chunk_size = settings.WS_HISTORY_CHUNK_SIZE
+    for i in range(0, len(history), chunk_size):
+        await websocket.send_text(jsonutil.dumps(history[i:i + chunk_size]))
+
 
 @router.websocket("/ws/{room_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, room_id: str):
     print(f"WebSocket connection started for room {room_id}")
     await websocket.accept()
     token = websocket.query_params.get("token")
@@ -40,59 +103,55 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str, db: Session = D
     if not token:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
-    user = get_user_from_token(token, db)
+    user = await get_user_from_token(token)
     if not user or not hasattr(user, "full_name"):
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
-    if room_id not in room_connections:
-        room_connections[room_id] = []
-    room_connections[room_id].append(websocket)
+    conn = await connection_manager.connect(room_id, websocket, user_id=user.id)
     try:
-        # 1. Fetch and send recent messages from DB (e.g., last 50)
-        recent_messages = db.query(MessageRecord).filter(MessageRecord.room_id == str(room_id)).order_by(MessageRecord.created_at.desc()).limit(50).all()
-        for msg in reversed(recent_messages):  # Send oldest first
-            sender = db.query(UserRecord).filter_by(id=msg.user_id).first()
-            await websocket.send_json({
-                "id": msg.id,
-                "content": msg.content,
-                "user_id": msg.user_id,
-                "room_id": msg.room_id,
-                "full_name": sender.full_name if sender else None,
-                "created_at": msg.created_at.isoformat(),
-                "updated_at": msg.updated_at.isoformat()
-            })
+        # 1. Send recent history (depth negotiated with ?history=N) as JSON array frames
+        await send_history(websocket, room_id, history_depth(websocket), user_id=user.id)
+        # Frames broadcast while history was being sent are queued, deliver them now
+        conn.start()
         while True:
             print("Waiting to receive message...")
             data = await websocket.receive_text()
             print(f"Received message: {data}")
-            # 2. Store incoming message in DB
-            new_msg = MessageRecord(
-                id=str(uuid.uuid4()),
-                content=data,
-                user_id=user.id,
-                room_id=str(room_id),
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            db.add(new_msg)
-            db.commit()
-            db.refresh(new_msg)
+            # 2. Store incoming message (committed now, or buffered in write-behind mode)
+            now = datetime.now(timezone.utc)
+            new_msg = {
+                "id": str(uuid.uuid4()),
+                "content": data,
+                "user_id": user.id,
+                "room_id": str(room_id),
+                "created_at": now,
+                "updated_at": now
+            }
+            try:
+                await message_writer.submit(new_msg)
+            except MessageBufferFullError as e:
+                # Not stored, so not broadcast; the client may resend later
+                print(f"Message rejected: {e}")
+                await websocket.send_text(jsonutil.dumps({"error": "Message not saved, try again later"}))
+                continue
+            recent_writers.mark(user.id)
+            active_user_sketches.record(room_id, user.id, now)
             msg_payload = {
-                "id": new_msg.id,
-                "content": new_msg.content,
-                "user_id": new_msg.user_id,
-                "room_id": new_msg.room_id,
+                "id": new_msg["id"],
+                "content": new_msg["content"],
+                "user_id": new_msg["user_id"],
+                "room_id": new_msg["room_id"],
                 "full_name": user.full_name,
-                "created_at": new_msg.created_at.isoformat(),
-                "updated_at": new_msg.updated_at.isoformat()
+                "created_at": now.isoformat(),
+                "updated_at": now.isoformat()
             }
-            for conn in room_connections[room_id]:
-                await conn.send_json(msg_payload)
+            recent_messages.append(str(room_id), CachedMessage.from_dict(msg_payload))
+            # Encode once; every recipient on every worker gets the same text frame
+            await room_broker.publish(room_id, jsonutil.dumps(msg_payload))
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for room {room_id}")
-        room_connections[room_id].remove(websocket)
-        if not room_connections[room_id]:
-            del room_connections[room_id]
     except Exception as e:
         print(f"WebSocket error: {e}")
         await websocket.close()
+    finally:
+        await connection_manager.disconnect(conn)
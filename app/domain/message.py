@@ -11,3 +11,8 @@ class Message(BaseModel):
     full_name: Optional[str] = None
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+
+
+class MessageSearchHit(Message):
+    rank: Optional[float] = None
+    highlight: Optional[str] = None
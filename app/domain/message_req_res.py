@@ -1,6 +1,7 @@
 from typing import Optional, List
 from pydantic import BaseModel
-from app.domain.message import Message
+from app.domain.common import Pagination
+from app.domain.message import Message, MessageSearchHit
 
 
 class BaseResponse(BaseModel):
@@ -29,10 +30,17 @@ class ListMessageRequest(BaseModel):
     room_id: str
     skip: Optional[int] = 0
     limit: Optional[int] = 50
+    cursor: Optional[str] = None
 
 
 class ListMessageResponse(BaseResponse):
     messages: Optional[List[Message]] = None
+    pagination: Optional[Pagination] = None
+
+
+class SearchMessageResponse(BaseResponse):
+    hits: Optional[List[MessageSearchHit]] = None
+    pagination: Optional[Pagination] = None
 
 
 class GetMessageRequest(BaseModel):
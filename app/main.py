@@ -1,9 +1,17 @@
+import asyncio
+
 from fastapi import FastAPI
 
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.api.routers import include_routers
+from app.api.routers import admin_analytics_routes, message_routes, ws_routes
+from app.repo.datasource import AsyncDataSource, DataSource, ReplicaMonitor
+from app.repo.user_cache import user_identity_cache
+from app.service.hashing_service import hashing_service
+from app.service.session_store import session_store
+from app.service.sketch_service import active_user_sketches
 from app.settings import Settings
 from fastapi import Request
 from fastapi.responses import JSONResponse
@@ -22,6 +30,8 @@ from app.admin_dashboard import setup_admin
 
 
 
+replica_monitor = ReplicaMonitor(DataSource(), AsyncDataSource())
+
 app = FastAPI(title="CHAT-APPLICATION API", version="1.0.0")
 setup_admin(app)
 
@@ -48,6 +58,41 @@ app.add_middleware(SessionMiddleware, secret_key="supersecret")
 include_routers(app)
 
 
+@app.on_event("startup")
+async def startup():
+    await replica_monitor.start()
+    session = message_routes.db.get_session()
+    try:
+        await message_routes.message_service.ensure_search_index(session)
+    finally:
+        await message_routes.db.close_session(session)
+    await ws_routes.room_broker.start()
+    # User updates and deletes on this worker evict the cached copies on every worker
+    user_identity_cache.broadcast(ws_routes.room_broker.publish_event, asyncio.get_running_loop())
+    await ws_routes.message_writer.start()
+    if settings.ROLLUP_ENABLED and ws_routes.message_writer.recovered_days:
+        # Recovered messages may belong to days that were rolled up while they sat in a journal
+        await asyncio.to_thread(admin_analytics_routes.rollup_service.reroll, ws_routes.message_writer.recovered_days)
+    await session_store.start()
+    await active_user_sketches.start()
+    if settings.ROLLUP_ENABLED:
+        await admin_analytics_routes.rollup_service.start()
+    await admin_analytics_routes.partition_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await replica_monitor.stop()
+    await session_store.stop()
+    await active_user_sketches.stop()
+    await admin_analytics_routes.rollup_service.stop()
+    await admin_analytics_routes.partition_service.stop()
+    await ws_routes.message_writer.stop()
+    await ws_routes.room_broker.close()
+    await AsyncDataSource().dispose()
+    hashing_service.shutdown()
+
+
 @app.get("/")
 async def hc():
     return {"error": False, "msg": "Ok", "result": {"status": "SERVING"}}
@@ -1,26 +1,33 @@
 import uuid
 
+from app.domain.user import User
 from app.model.user_record import UserRecord
-from app.utils.hashing import Hash
 from typing import Dict, Any
 
-def hash_password(password: str) -> str:
-    return Hash.hash(password)
-
-def map_user_create_to_user_record(user_dict, plain_password, role="user"):
+def map_user_create_to_user_record(user_dict, password_hash, role="user"):
     return UserRecord(
         id=str(uuid.uuid4()),
         username=user_dict.get("username"),
         email=user_dict.get("email"),
-        password=Hash.hash(plain_password),
+        password=password_hash,
         role=role,
         full_name=user_dict.get("full_name"),
         phone=user_dict.get("phone"),
         profile_pic_url=user_dict.get("profile_pic_url")
     )
 
+def map_user_record_to_user(user_record: UserRecord) -> User:
+    return User(
+        id=getattr(user_record, 'id', None),
+        email=str(getattr(user_record, 'email', '')) if getattr(user_record, 'email', None) is not None else '',
+        username=getattr(user_record, 'username', None),
+        full_name=getattr(user_record, 'full_name', None),
+        phone=getattr(user_record, 'phone', None),
+        profile_pic_url=getattr(user_record, 'profile_pic_url', None),
+        role=getattr(user_record, 'role', None)
+    )
+
 class UserMapper:
-    hash_password = staticmethod(hash_password)
     map_user_create_to_user_record = staticmethod(map_user_create_to_user_record)
 
 user_mapper = UserMapper()
\ No newline at end of file
@@ -0,0 +1,34 @@
+# SQLAlchemy models for the pre-aggregated analytics rollups
+from sqlalchemy import BigInteger, Column, Date, DateTime, LargeBinary, String
+from sqlalchemy.sql import func
+from app.repo.datasource import Base
+
+class RoomDailyCountRecord(Base):
+    __tablename__ = "message_counts_room_daily"
+    room_id = Column(String(255), primary_key=True)
+    day = Column(Date, primary_key=True)
+    message_count = Column(BigInteger, nullable=False, default=0)
+
+
+class UserDailyCountRecord(Base):
+    __tablename__ = "message_counts_user_daily"
+    user_id = Column(String(255), primary_key=True)
+    day = Column(Date, primary_key=True)
+    message_count = Column(BigInteger, nullable=False, default=0)
+
+
+class RollupStateRecord(Base):
+    # `watermark` is the first UTC day not yet rolled up; earlier days are complete
+    __tablename__ = "analytics_rollup_state"
+    name = Column(String(100), primary_key=True)
+    watermark = Column(Date, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class RoomDailyUserSketchRecord(Base):
+    # HyperLogLog registers (p=12, 4096 bytes) of the users who posted in a room that day
+    __tablename__ = "room_daily_user_sketches"
+    room_id = Column(String(255), primary_key=True)
+    day = Column(Date, primary_key=True)
+    registers = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
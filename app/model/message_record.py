@@ -1,15 +1,26 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Text
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, DateTime, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.repo.datasource import Base
 
 class MessageRecord(Base):
+    # On Postgres the table is range-partitioned by month on created_at (liquibase message/04)
+    # and its primary key is (id, created_at), so the database no longer rejects a duplicate id
+    # with a different created_at. Ids are server-generated UUIDs, and the one path that
+    # re-inserts rows, write-behind journal recovery, skips ids already stored
+    # (MessageRepo.existing_ids); anything else that inserts messages must do the same.
+    # Timestamps are TIMESTAMPTZ: write timezone-aware UTC datetimes.
     __tablename__ = "messages"
     id = Column(String(255), primary_key=True, index=True)
     content = Column(Text, nullable=False)
     user_id = Column(String(255), ForeignKey("users.id"), nullable=False)
     room_id = Column(String(255), ForeignKey("rooms.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     user = relationship("UserRecord", back_populates="messages")
-    room = relationship("RoomRecord", back_populates="messages")
\ No newline at end of file
+    room = relationship("RoomRecord", back_populates="messages")
+
+
+# Room history / keyset pagination (room_id = ? ORDER BY created_at DESC, id DESC) and per-user activity
+Index("ix_messages_room_id_created_at_id", MessageRecord.room_id, MessageRecord.created_at.desc(), MessageRecord.id.desc())
+Index("ix_messages_user_id_created_at", MessageRecord.user_id, MessageRecord.created_at)
@@ -10,7 +10,7 @@ class UserRecord(Base):
     email = Column(String(255), unique=True, nullable=False)
     password = Column(String(255), nullable=False)
     phone = Column(String(50), nullable=True)
-    username = Column(String(100), nullable=False)
+    username = Column(String(100), unique=True, nullable=False)
     full_name = Column(String(255), nullable=False)
     profile_pic_url = Column(Text, nullable=True)
     role = Column(String(50), nullable=True, default="user")
@@ -0,0 +1,225 @@
+# Aggregate queries behind the admin analytics endpoints
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, Date, cast, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.model.analytics_record import RollupStateRecord, RoomDailyCountRecord, UserDailyCountRecord
+from app.model.message_record import MessageRecord
+from app.model.room_record import RoomRecord
+from app.model.user_record import UserRecord
+
+SORT_COUNT = "count"
+SORT_NAME = "name"
+
+BUCKET_WIDTHS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+_SQLITE_BUCKET_FORMATS = {"minute": "%Y-%m-%d %H:%M:00", "hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
+ROLLUP_NAME = "messages_daily"
+DAY = timedelta(days=1)
+
+# (raw message column, rollup table, rollup key column) per report dimension
+_BY_ROOM = (MessageRecord.room_id, RoomDailyCountRecord, RoomDailyCountRecord.room_id)
+_BY_USER = (MessageRecord.user_id, UserDailyCountRecord, UserDailyCountRecord.user_id)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def _raw_counts(group_column, start: Optional[datetime], end: Optional[datetime], end_exclusive: bool = False):
+    query = select(group_column.label("key"), func.count(MessageRecord.id).label("message_count"))
+    if start is not None:
+        query = query.where(MessageRecord.created_at >= start)
+    if end is not None:
+        query = query.where(MessageRecord.created_at < end if end_exclusive else MessageRecord.created_at <= end)
+    return query.group_by(group_column)
+
+
+def _rollup_counts(rollup, rollup_key, first_day: Optional[date], end_day: date):
+    query = select(rollup_key.label("key"), func.sum(rollup.message_count).label("message_count"))
+    if first_day is not None:
+        query = query.where(rollup.day >= first_day)
+    return query.where(rollup.day < end_day).group_by(rollup_key)
+
+
+def _page(query, count_column, name_column, id_column, sort: str, descending: bool,
+          skip: int, limit: Optional[int]):
+    sort_column = count_column if sort == SORT_COUNT else name_column
+    query = query.order_by(sort_column.desc() if descending else sort_column.asc(), id_column.asc())
+    if skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+class AnalyticsRepo:
+    """
+    Each report is a single statement: message counts per key are computed first and
+    then LEFT JOINed onto rooms or users, so entities with no messages report 0.
+
+    Counts come from the daily rollup tables for every whole UTC day before the
+    compaction watermark; only the partial days at either end of the range (including
+    the current one) are counted from raw rows.
+    """
+
+    def messages_per_room(self, db: Session, **kwargs):
+        return db.execute(self.messages_per_room_query(db, **kwargs)).mappings().all()
+
+    def user_activity(self, db: Session, **kwargs):
+        return db.execute(self.user_activity_query(db, **kwargs)).mappings().all()
+
+    def stream(self, db: Session, query, chunk_size: int) -> Iterator[Sequence]:
+        """
+        Run a report on a server-side cursor and yield its rows `chunk_size` at a time,
+        so an export of any size holds only one chunk in memory.
+        """
+        result = db.execute(query.execution_options(yield_per=chunk_size))
+        try:
+            for rows in result.mappings().partitions():
+                yield rows
+        finally:
+            result.close()
+
+    def messages_per_room_query(self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                sort: str = SORT_COUNT, descending: bool = True, skip: int = 0,
+                                limit: Optional[int] = None):
+        counts = self._message_counts(db, _BY_ROOM, start, end)
+        message_count = func.coalesce(counts.c.message_count, 0).label("message_count")
+        query = (
+            select(RoomRecord.id.label("room_id"), RoomRecord.name.label("room_name"), message_count)
+            .outerjoin(counts, counts.c.key == RoomRecord.id)
+        )
+        return _page(query, message_count, RoomRecord.name, RoomRecord.id, sort, descending, skip, limit)
+
+    def user_activity_query(self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            sort: str = SORT_COUNT, descending: bool = True, skip: int = 0,
+                            limit: Optional[int] = None):
+        counts = self._message_counts(db, _BY_USER, start, end)
+        message_count = func.coalesce(counts.c.message_count, 0).label("message_count")
+        query = (
+            select(UserRecord.id.label("user_id"), UserRecord.username, UserRecord.email, message_count)
+            .outerjoin(counts, counts.c.key == UserRecord.id)
+        )
+        return _page(query, message_count, UserRecord.username, UserRecord.id, sort, descending, skip, limit)
+
+    def _message_counts(self, db: Session, dimension, start: Optional[datetime], end: Optional[datetime]):
+        """(key, message_count) subquery for messages with start <= created_at <= end."""
+        group_column, rollup, rollup_key = dimension
+        start, end = _utc(start), _utc(end)
+        watermark = self.get_watermark(db)
+        # Whole days [first_day, end_day) can be read from the rollup
+        first_day = None
+        if start is not None:
+            first_day = start.date() if start == day_start(start.date()) else start.date() + DAY
+        end_day = watermark
+        if end_day is not None and end is not None:
+            end_day = min(end_day, end.date())
+        if end_day is None or (first_day is not None and first_day >= end_day):
+            return _raw_counts(group_column, start, end).subquery()
+
+        parts = [_rollup_counts(rollup, rollup_key, first_day, end_day)]
+        if first_day is not None and start < day_start(first_day):
+            parts.append(_raw_counts(group_column, start, day_start(first_day), end_exclusive=True))
+        parts.append(_raw_counts(group_column, day_start(end_day), end))
+        combined = union_all(*parts).subquery()
+        return (
+            select(combined.c.key, cast(func.sum(combined.c.message_count), BigInteger).label("message_count"))
+            .group_by(combined.c.key)
+            .subquery()
+        )
+
+    def bucket_counts(self, db: Session, bucket: str, start: datetime, end: datetime,
+                      group_by: Optional[str] = None, room_id: Optional[str] = None,
+                      user_id: Optional[str] = None) -> List[Tuple[datetime, Optional[str], int]]:
+        """
+        (bucket start, room/user id or None, count) for messages with
+        start <= created_at < end, truncated to `bucket` in the database. Empty
+        buckets are not returned; naive bucket starts are taken as UTC.
+        """
+        if db.get_bind().dialect.name == "sqlite":
+            truncated = func.strftime(_SQLITE_BUCKET_FORMATS[bucket], MessageRecord.created_at)
+        else:
+            # Truncate the UTC wall-clock time, not the session TimeZone's (day buckets would shift)
+            truncated = func.date_trunc(bucket, func.timezone("UTC", MessageRecord.created_at))
+        columns = [truncated.label("bucket")]
+        group_column = {"room": MessageRecord.room_id, "user": MessageRecord.user_id}.get(group_by)
+        if group_column is not None:
+            columns.append(group_column.label("key"))
+        query = (
+            select(*columns, func.count(MessageRecord.id).label("message_count"))
+            .where(MessageRecord.created_at >= start, MessageRecord.created_at < end)
+        )
+        if room_id:
+            query = query.where(MessageRecord.room_id == room_id)
+        if user_id:
+            query = query.where(MessageRecord.user_id == user_id)
+        query = query.group_by(*columns)
+        rows = []
+        for row in db.execute(query):
+            bucket_start = row.bucket
+            if isinstance(bucket_start, str):
+                bucket_start = datetime.fromisoformat(bucket_start)
+            rows.append((_utc(bucket_start), row.key if group_column is not None else None, int(row.message_count)))
+        return rows
+
+    # Rollup maintenance
+
+    def get_watermark(self, db: Session, for_update: bool = False) -> Optional[date]:
+        query = select(RollupStateRecord.watermark).where(RollupStateRecord.name == ROLLUP_NAME)
+        if for_update:
+            # Liquibase seeds the state row; create it if missing so there is always a row to lock
+            dialect = sqlite if db.get_bind().dialect.name == "sqlite" else postgresql
+            db.execute(dialect.insert(RollupStateRecord).values(name=ROLLUP_NAME).on_conflict_do_nothing())
+            query = query.with_for_update()
+        return db.execute(query).scalar()
+
+    def set_watermark(self, db: Session, watermark: Optional[date]) -> None:
+        state = db.get(RollupStateRecord, ROLLUP_NAME)
+        if state is None:
+            db.add(RollupStateRecord(name=ROLLUP_NAME, watermark=watermark))
+        else:
+            state.watermark = watermark
+        db.flush()
+
+    def first_message_day(self, db: Session) -> Optional[date]:
+        first = db.execute(select(func.min(MessageRecord.created_at))).scalar()
+        return _utc(first).date() if first is not None else None
+
+    def rollup_day(self, db: Session, day: date) -> None:
+        """(Re)compute both rollups for one UTC day from raw rows."""
+        start, end = day_start(day), day_start(day + DAY)
+        for group_column, rollup, rollup_key in (_BY_ROOM, _BY_USER):
+            db.execute(delete(rollup).where(rollup.day == day))
+            counts = (
+                select(group_column, literal(day, Date), func.count(MessageRecord.id))
+                .where(MessageRecord.created_at >= start, MessageRecord.created_at < end)
+                .group_by(group_column)
+            )
+            db.execute(insert(rollup).from_select([rollup_key.key, "day", "message_count"], counts))
+
+    def clear_rollups(self, db: Session) -> None:
+        db.execute(delete(RoomDailyCountRecord))
+        db.execute(delete(UserDailyCountRecord))
+        self.set_watermark(db, None)
+
+    def rollup_totals(self, db: Session, day: date) -> Dict[str, int]:
+        """Total messages for one day according to each rollup and to the raw rows."""
+        raw = db.execute(
+            select(func.count(MessageRecord.id))
+            .where(MessageRecord.created_at >= day_start(day), MessageRecord.created_at < day_start(day + DAY))
+        ).scalar()
+        by_room = db.execute(select(func.sum(RoomDailyCountRecord.message_count))
+                             .where(RoomDailyCountRecord.day == day)).scalar()
+        by_user = db.execute(select(func.sum(UserDailyCountRecord.message_count))
+                             .where(UserDailyCountRecord.day == day)).scalar()
+        return {"raw": int(raw or 0), "by_room": int(by_room or 0), "by_user": int(by_user or 0)}
@@ -1,5 +1,11 @@
-from sqlalchemy import create_engine, text, inspect
+import asyncio
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine, event, text, inspect
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, DeclarativeBase
 from app.settings import settings
 import logging
@@ -11,6 +17,87 @@ logging.basicConfig(level=logging.INFO)
 class Base(DeclarativeBase):
     pass
 
+# Session intent: READ sessions may be served by a replica, WRITE sessions always use the primary
+READ = "read"
+WRITE = "write"
+
+
+def _pool_args(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return dict(pool_size=20, max_overflow=30, pool_timeout=60, pool_recycle=3600)
+
+
+class RecentWriters:
+    """
+    Users who committed a write in the last `window_seconds`. Their READ sessions stay
+    on the primary so they always see their own writes despite replication lag.
+    """
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: str):
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.window_seconds
+            if len(self._until) > 10000:
+                self._until = {key: until for key, until in self._until.items() if until > now}
+
+    def is_recent(self, user_id: Optional[str]) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            return self._until.get(user_id, 0.0) > time.monotonic()
+
+
+recent_writers = RecentWriters(settings.READ_YOUR_WRITES_SECONDS)
+
+
+class ReplicaSet:
+    """
+    Round-robin over replica engines (sync or async). A replica whose connection fails is
+    skipped for `retry_seconds`, after which it is tried again; health checks mark
+    replicas down or up in between. With no healthy replica, reads use the primary.
+    """
+    def __init__(self, engines: List, retry_seconds: float):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._down_until = [0.0] * len(engines)
+        self._next = itertools.count()
+        for index, engine in enumerate(engines):
+            sync_engine = getattr(engine, "sync_engine", engine)
+            event.listen(sync_engine, "handle_error", self._on_error(index))
+
+    def _on_error(self, index: int):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(index)
+        return handle_error
+
+    def pick(self):
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self._next) % len(self.engines)
+            if self._down_until[index] <= now:
+                return self.engines[index]
+        return None
+
+    def mark_down(self, index: int):
+        if self._down_until[index] <= time.monotonic():
+            logger.warning(f"Replica {index} is unavailable; routing its reads elsewhere for {self.retry_seconds}s")
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+
+    def mark_up(self, index: int):
+        self._down_until[index] = 0.0
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {"replicas": len(self.engines),
+                "healthy": sum(1 for until in self._down_until if until <= now)}
+
+
 class Singleton(type):
     _instances = {}
     def __call__(cls, *args, **kwargs):
@@ -24,6 +111,9 @@ class DataSource(metaclass=Singleton):
             self.engine = create_engine(settings.DATABASE_URL, pool_size=20, max_overflow=30, pool_timeout=60, pool_recycle=3600)
             self.ping()
             self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+            self.replicas = ReplicaSet(
+                [create_engine(url, pool_pre_ping=True, **_pool_args(url)) for url in settings.DATABASE_REPLICA_URLS],
+                settings.REPLICA_RETRY_SECONDS)
         except Exception as e:
             logger.exception(f"Database connection error: {e}")
             exit(1)
@@ -36,13 +126,34 @@ class DataSource(metaclass=Singleton):
         except Exception as e:
             logger.exception(f"Database connection error: {e}")
 
-    def get_session(self) -> Session:
-        return self.Session()
+    def get_session(self, intent: str = WRITE, user_id: Optional[str] = None) -> Session:
+        """
+        A READ session goes to a healthy replica unless `user_id` wrote recently. Committing
+        a WRITE session with a `user_id` keeps that user's reads on the primary for a while.
+        """
+        if intent == READ and not recent_writers.is_recent(user_id):
+            replica = self.replicas.pick()
+            if replica is not None:
+                return self.Session(bind=replica)
+        session = self.Session()
+        if intent == WRITE and user_id is not None:
+            event.listen(session, "after_commit", lambda _: recent_writers.mark(user_id))
+        return session
 
     def close_session(self, session: Session):
         if session:
             session.close()
 
+    def check_replicas(self):
+        """Probe every replica and update its health."""
+        for index, replica in enumerate(self.replicas.engines):
+            try:
+                with replica.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                self.replicas.mark_up(index)
+            except Exception:
+                self.replicas.mark_down(index)
+
     def create_or_migrate_tables(self):
         try:
             self.create_tables()
@@ -96,6 +207,86 @@ class DataSource(metaclass=Singleton):
         except Exception as e:
             logger.exception(f"Error adding columns to table '{table.name}': {e}")
 
+class AsyncDataSource(metaclass=Singleton):
+    """
+    Async engine on ASYNC_DATABASE_URL (postgresql+asyncpg, or sqlite+aiosqlite locally)
+    for code running on the event loop.
+    """
+    def __init__(self):
+        try:
+            self.engine = create_async_engine(settings.ASYNC_DATABASE_URL, **_pool_args(settings.ASYNC_DATABASE_URL))
+            self.Session = async_sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+            self.replicas = ReplicaSet(
+                [create_async_engine(url, pool_pre_ping=True, **_pool_args(url))
+                 for url in settings.ASYNC_DATABASE_REPLICA_URLS],
+                settings.REPLICA_RETRY_SECONDS)
+        except Exception as e:
+            logger.exception(f"Async database engine error: {e}")
+            exit(1)
+
+    async def ping(self):
+        try:
+            async with self.engine.connect() as connection:
+                result = await connection.execute(text("SELECT 1"))
+                logger.info(f"Async database connection established: {result.scalar()}")
+        except Exception as e:
+            logger.exception(f"Async database connection error: {e}")
+
+    def get_session(self, intent: str = WRITE, user_id: Optional[str] = None) -> AsyncSession:
+        """Same routing as DataSource.get_session."""
+        if intent == READ and not recent_writers.is_recent(user_id):
+            replica = self.replicas.pick()
+            if replica is not None:
+                return self.Session(bind=replica)
+        session = self.Session()
+        if intent == WRITE and user_id is not None:
+            event.listen(session.sync_session, "after_commit", lambda _: recent_writers.mark(user_id))
+        return session
+
+    async def close_session(self, session: AsyncSession):
+        if session:
+            await session.close()
+
+    async def check_replicas(self):
+        for index, replica in enumerate(self.replicas.engines):
+            try:
+                async with replica.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+                self.replicas.mark_up(index)
+            except Exception:
+                self.replicas.mark_down(index)
+
+    async def dispose(self):
+        await self.engine.dispose()
+        for replica in self.replicas.engines:
+            await replica.dispose()
+
+class ReplicaMonitor:
+    """Probes the replicas of both data sources every `interval_seconds` so failures are noticed before a read hits them."""
+    def __init__(self, db: DataSource, async_db: AsyncDataSource, interval_seconds: float = None):
+        self.db = db
+        self.async_db = async_db
+        self.interval = interval_seconds or settings.REPLICA_HEALTH_CHECK_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None and (self.db.replicas.engines or self.async_db.replicas.engines):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.to_thread(self.db.check_replicas)
+            await self.async_db.check_replicas()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {"sync": self.db.replicas.stats(), "async": self.async_db.replicas.stats()}
+
 class Repo:
     def __init__(self, db: DataSource):
         self.db = db
@@ -1,13 +1,278 @@
 # Message repository for database access 
-from sqlalchemy.orm import Session  
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import column, func, insert, literal_column, select, table, text, tuple_, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
 from app.model.message_record import MessageRecord
+from app.model.room_record import RoomRecord
+from app.model.user_record import UserRecord
 
-class MessageRepo:
-    def get_recent_by_room(self, db: Session, room_id: str, limit: int = 50, skip: int = 0):
-        return db.query(MessageRecord).filter(MessageRecord.room_id == room_id).order_by(MessageRecord.created_at.desc()).offset(skip).limit(limit).all()
+# Full-text search. Postgres matches the generated, GIN-indexed `search_vector` column
+# (liquibase message/03); SQLite matches the `messages_fts` FTS5 table. Both are
+# maintained by the database on every insert/update/delete of a message, so every
+# write path (single creates and write-behind batches) is indexed in the same transaction.
+SEARCH_CONFIG = "english"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+# messages has a text primary key, so its implicit rowid may be renumbered by VACUUM.
+# FTS rows are keyed by messages_fts_ids.fts_rowid instead, an INTEGER PRIMARY KEY
+# (stable) mapped to the message id.
+_SQLITE_FTS_TABLES = [
+    "CREATE TABLE messages_fts_ids (fts_rowid INTEGER PRIMARY KEY, message_id TEXT NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE messages_fts USING fts5(content)",
+]
+_SQLITE_FTS_POPULATE = [
+    "INSERT INTO messages_fts_ids(message_id) SELECT id FROM messages",
+    "INSERT INTO messages_fts(rowid, content) SELECT i.fts_rowid, m.content "
+    "FROM messages_fts_ids i JOIN messages m ON m.id = i.message_id",
+]
+_SQLITE_FTS_ROWID = "(SELECT fts_rowid FROM messages_fts_ids WHERE message_id = {}.id)"
+_SQLITE_FTS_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts_ids(message_id) VALUES (new.id);
+        INSERT INTO messages_fts(rowid, content) VALUES ({_SQLITE_FTS_ROWID.format("new")}, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = {_SQLITE_FTS_ROWID.format("old")};
+        DELETE FROM messages_fts_ids WHERE message_id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        UPDATE messages_fts SET content = new.content WHERE rowid = {_SQLITE_FTS_ROWID.format("new")};
+    END""",
+]
+# An earlier layout indexed messages by their implicit rowid (external content table)
+_SQLITE_FTS_LEGACY = ["DROP TRIGGER IF EXISTS messages_fts_ai", "DROP TRIGGER IF EXISTS messages_fts_ad",
+                      "DROP TRIGGER IF EXISTS messages_fts_au", "DROP TABLE IF EXISTS messages_fts"]
+_messages_fts = table("messages_fts", column("rowid"))
+_messages_fts_ids = table("messages_fts_ids", column("fts_rowid"), column("message_id"))
+
+
+def _fts5_query(query: str) -> str:
+    """Every word of the user's query as a quoted FTS5 string, so operators and punctuation match literally."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def _visible_rooms(user_id: str):
+    """Rooms a user administers or has posted in."""
+    posted = aliased(MessageRecord)
+    return union(
+        select(RoomRecord.id).where(RoomRecord.admin_id == user_id),
+        select(posted.room_id).where(posted.user_id == user_id),
+    )
 
+class MessageRepo:
     def create(self, db: Session, message: MessageRecord):
         db.add(message)
         db.commit()
         db.refresh(message)
-        return message
\ No newline at end of file
+        return message
+
+    def bulk_create(self, db: Session, rows: List[dict]):
+        """Insert many message rows in one executemany and a single commit."""
+        if not rows:
+            return
+        db.execute(insert(MessageRecord), rows)
+        db.commit()
+
+    def existing_ids(self, db: Session, ids: Iterable[str], since: Optional[datetime] = None) -> Set[str]:
+        """Which of `ids` are stored. `since` (the oldest created_at among them) limits the lookup to later partitions."""
+        ids = list(ids)
+        if not ids:
+            return set()
+        query = db.query(MessageRecord.id).filter(MessageRecord.id.in_(ids))
+        if since is not None:
+            query = query.filter(MessageRecord.created_at >= since)
+        return {row[0] for row in query.all()}
+
+    def stream_history(self, db: Session, room_id: str, chunk_size: int, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> Iterator[Sequence]:
+        """A room's history (start <= created_at < end) with author names, oldest first, `chunk_size` rows at a time."""
+        query = (
+            select(
+                MessageRecord.id,
+                MessageRecord.room_id,
+                MessageRecord.user_id,
+                UserRecord.full_name,
+                MessageRecord.content,
+                MessageRecord.created_at,
+                MessageRecord.updated_at,
+            )
+            .outerjoin(UserRecord, UserRecord.id == MessageRecord.user_id)
+            .where(MessageRecord.room_id == room_id)
+            .order_by(MessageRecord.created_at.asc(), MessageRecord.id.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        if start is not None:
+            query = query.where(MessageRecord.created_at >= start)
+        if end is not None:
+            query = query.where(MessageRecord.created_at < end)
+        result = db.execute(query)
+        try:
+            for rows in result.mappings().partitions():
+                yield rows
+        finally:
+            result.close()
+
+
+class AsyncMessageRepo:
+    async def get_history(self, db: AsyncSession, room_id: str, limit: int = 50,
+                          before: Optional[Tuple[datetime, str]] = None,
+                          after: Optional[Tuple[datetime, str]] = None, skip: int = 0):
+        """
+        Messages of a room with their author's name, newest first, in one query.
+        `before`/`after` are (created_at, id) keyset positions: the page holds the
+        `limit` messages just older/newer than that position, whatever its depth.
+        `skip` is the legacy offset and should only be used without a position.
+        The position's created_at is also applied on its own, since Postgres prunes
+        partitions on plain created_at bounds but not on the row comparison.
+        """
+        query = (
+            select(
+                MessageRecord.id,
+                MessageRecord.content,
+                MessageRecord.user_id,
+                MessageRecord.room_id,
+                UserRecord.full_name,
+                MessageRecord.created_at,
+                MessageRecord.updated_at,
+            )
+            .outerjoin(UserRecord, UserRecord.id == MessageRecord.user_id)
+            .where(MessageRecord.room_id == room_id)
+        )
+        position = tuple_(MessageRecord.created_at, MessageRecord.id)
+        if after is not None:
+            query = query.where(MessageRecord.created_at >= after[0], position > tuple_(*after)) \
+                .order_by(MessageRecord.created_at.asc(), MessageRecord.id.asc()).limit(limit)
+            result = await db.execute(query)
+            return list(reversed(result.all()))
+        if before is not None:
+            query = query.where(MessageRecord.created_at <= before[0], position < tuple_(*before))
+        query = query.order_by(MessageRecord.created_at.desc(), MessageRecord.id.desc()).offset(skip).limit(limit)
+        result = await db.execute(query)
+        return result.all()
+
+    async def create(self, db: AsyncSession, message: MessageRecord):
+        db.add(message)
+        await db.commit()
+        await db.refresh(message)
+        return message
+
+    async def bulk_create(self, db: AsyncSession, rows: List[dict]):
+        """Insert many message rows in one executemany and a single commit."""
+        if not rows:
+            return
+        await db.execute(insert(MessageRecord), rows)
+        await db.commit()
+
+    async def existing_ids(self, db: AsyncSession, ids: Iterable[str], since: Optional[datetime] = None) -> Set[str]:
+        """Which of `ids` are stored. `since` (the oldest created_at among them) limits the lookup to later partitions."""
+        ids = list(ids)
+        if not ids:
+            return set()
+        query = select(MessageRecord.id).where(MessageRecord.id.in_(ids))
+        if since is not None:
+            query = query.where(MessageRecord.created_at >= since)
+        result = await db.execute(query)
+        return set(result.scalars().all())
+
+    async def search(self, db: AsyncSession, query: str, limit: int = 20, user_id: Optional[str] = None,
+                     room_id: Optional[str] = None, after: Optional[Tuple[float, datetime, str]] = None):
+        """
+        Messages matching `query`, best match first (then newest first), with the author's
+        name, a relevance `rank` and the content with matches wrapped in HIGHLIGHT_START/STOP.
+        `user_id` limits hits to the rooms that user can see; `after` is the (rank,
+        created_at, id) of the last hit of the previous page.
+        """
+        if db.get_bind().dialect.name == "sqlite":
+            return await self._search_sqlite(db, query, limit, user_id, room_id, after)
+        return await self._search_postgres(db, query, limit, user_id, room_id, after)
+
+    async def _search_postgres(self, db: AsyncSession, query: str, limit: int, user_id: Optional[str],
+                               room_id: Optional[str], after: Optional[Tuple[float, datetime, str]]):
+        config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+        tsquery = func.websearch_to_tsquery(config, query)
+        rank = func.ts_rank_cd(literal_column("messages.search_vector"), tsquery)
+        # Rank and page on the index first; headlines are then built for the page only
+        hits = select(MessageRecord.id, MessageRecord.created_at, rank.label("rank")) \
+            .where(literal_column("messages.search_vector").op("@@")(tsquery))
+        hits = self._scope(hits, user_id, room_id)
+        if after is not None:
+            hits = hits.where(tuple_(rank, MessageRecord.created_at, MessageRecord.id) < tuple_(*after))
+        hits = hits.order_by(rank.desc(), MessageRecord.created_at.desc(), MessageRecord.id.desc()) \
+            .limit(limit).subquery()
+        options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2"
+        page = (
+            select(
+                MessageRecord.id,
+                MessageRecord.content,
+                MessageRecord.user_id,
+                MessageRecord.room_id,
+                UserRecord.full_name,
+                MessageRecord.created_at,
+                MessageRecord.updated_at,
+                hits.c.rank,
+                func.ts_headline(config, MessageRecord.content, tsquery, options).label("highlight"),
+            )
+            .join(hits, hits.c.id == MessageRecord.id)
+            .outerjoin(UserRecord, UserRecord.id == MessageRecord.user_id)
+            .order_by(hits.c.rank.desc(), hits.c.created_at.desc(), hits.c.id.desc())
+        )
+        result = await db.execute(page)
+        return result.all()
+
+    async def _search_sqlite(self, db: AsyncSession, query: str, limit: int, user_id: Optional[str],
+                             room_id: Optional[str], after: Optional[Tuple[float, datetime, str]]):
+        match = _fts5_query(query)
+        if not match:
+            return []
+        fts = literal_column("messages_fts")
+        # bm25() is lower for better matches; negate it so rank sorts like ts_rank_cd
+        rank = -func.bm25(fts)
+        page = (
+            select(
+                MessageRecord.id,
+                MessageRecord.content,
+                MessageRecord.user_id,
+                MessageRecord.room_id,
+                UserRecord.full_name,
+                MessageRecord.created_at,
+                MessageRecord.updated_at,
+                rank.label("rank"),
+                func.highlight(fts, 0, HIGHLIGHT_START, HIGHLIGHT_STOP).label("highlight"),
+            )
+            .select_from(_messages_fts)
+            .join(_messages_fts_ids, _messages_fts_ids.c.fts_rowid == _messages_fts.c.rowid)
+            .join(MessageRecord, MessageRecord.id == _messages_fts_ids.c.message_id)
+            .outerjoin(UserRecord, UserRecord.id == MessageRecord.user_id)
+            .where(fts.op("MATCH")(match))
+        )
+        page = self._scope(page, user_id, room_id)
+        if after is not None:
+            page = page.where(tuple_(rank, MessageRecord.created_at, MessageRecord.id) < tuple_(*after))
+        page = page.order_by(rank.desc(), MessageRecord.created_at.desc(), MessageRecord.id.desc()).limit(limit)
+        result = await db.execute(page)
+        return result.all()
+
+    def _scope(self, query, user_id: Optional[str], room_id: Optional[str]):
+        if room_id:
+            query = query.where(MessageRecord.room_id == room_id)
+        if user_id:
+            query = query.where(MessageRecord.room_id.in_(_visible_rooms(user_id)))
+        return query
+
+    async def ensure_search_index(self, db: AsyncSession) -> None:
+        """
+        Create the SQLite FTS5 index and its triggers when missing, indexing existing
+        messages once. Postgres gets its index from Liquibase, so this is a no-op there.
+        """
+        if db.get_bind().dialect.name != "sqlite":
+            return
+        exists = await db.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts_ids'"))
+        if exists.scalar() is None:
+            for statement in _SQLITE_FTS_LEGACY + _SQLITE_FTS_TABLES + _SQLITE_FTS_POPULATE:
+                await db.execute(text(statement))
+        for trigger in _SQLITE_FTS_TRIGGERS:
+            await db.execute(text(trigger))
+        await db.commit()
@@ -0,0 +1,68 @@
+# Monthly range partitions of the messages table (Postgres)
+import re
+from datetime import date
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PARTITION_PREFIX = "messages_p"
+_PARTITION_NAME = re.compile(r"^messages_p(\d{4})(\d{2})$")
+
+# Serialises partition maintenance across workers
+_MAINTENANCE_LOCK = 0x6d736770
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+class PartitionRepo:
+    """
+    Partitions are named messages_pYYYYMM and hold [first of the month, first of the
+    next month) in UTC. Names are built from dates only, never from user input.
+    """
+
+    def is_partitioned(self, db: Session) -> bool:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        query = text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('messages')")
+        return db.execute(query).scalar() is not None
+
+    def lock(self, db: Session) -> None:
+        """Transaction-scoped advisory lock; released on commit or rollback."""
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK})
+
+    def list_partitions(self, db: Session) -> List[Tuple[date, str]]:
+        """(month, name) of every monthly partition, oldest first."""
+        rows = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'messages'::regclass"
+        ))
+        partitions = []
+        for (name,) in rows:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+        return sorted(partitions)
+
+    def create_partition(self, db: Session, month: date) -> None:
+        month = month_start(month)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF messages "
+            f"FOR VALUES FROM ('{month} 00:00:00+00') TO ('{add_months(month, 1)} 00:00:00+00')"
+        ))
+
+    def drop_partition(self, db: Session, month: date) -> None:
+        name = partition_name(month)
+        db.execute(text(f"ALTER TABLE messages DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
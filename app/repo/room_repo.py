@@ -9,4 +9,4 @@ class RoomRepo:
         db.add(room)
         db.commit()
         db.refresh(room)
-        return room
\ No newline at end of file
+        return room
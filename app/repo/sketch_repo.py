@@ -0,0 +1,66 @@
+# Per-room daily HyperLogLog sketches of active users
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.model.analytics_record import RoomDailyUserSketchRecord
+from app.model.message_record import MessageRecord
+
+
+def _insert_ignore(dialect_name: str, values: dict):
+    insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+    return insert(RoomDailyUserSketchRecord).values(**values).on_conflict_do_nothing()
+
+
+class SketchRepo:
+    def get_sketches(self, db: Session, first_day: date, last_day: date,
+                     room_ids: Optional[List[str]] = None) -> Iterator[Tuple[str, date, bytes]]:
+        """Streams the sketches in the range; only a batch of rows is held in memory at a time."""
+        query = select(RoomDailyUserSketchRecord.room_id, RoomDailyUserSketchRecord.day,
+                       RoomDailyUserSketchRecord.registers) \
+            .where(RoomDailyUserSketchRecord.day >= first_day, RoomDailyUserSketchRecord.day <= last_day)
+        if room_ids:
+            query = query.where(RoomDailyUserSketchRecord.room_id.in_(room_ids))
+        for row in db.execute(query.execution_options(yield_per=1000)):
+            yield row.room_id, row.day, row.registers
+
+    def room_day_users(self, db: Session, start, end) -> Iterable[Tuple[str, str]]:
+        """Distinct (room_id, user_id) pairs with messages in [start, end)."""
+        query = select(MessageRecord.room_id, MessageRecord.user_id).distinct() \
+            .where(MessageRecord.created_at >= start, MessageRecord.created_at < end)
+        return db.execute(query.execution_options(yield_per=10000))
+
+    def merge_day(self, db: Session, day: date, sketches: Dict[str, bytes]) -> None:
+        """
+        Register-wise max of each room's sketch into its row for the day. Workers may be
+        flushing the same rows, so rows are locked rather than replaced.
+        """
+        dialect_name = db.get_bind().dialect.name
+        for room_id, registers in sorted(sketches.items()):
+            db.execute(_insert_ignore(dialect_name, {"room_id": room_id, "day": day, "registers": bytes(len(registers))}))
+            row = db.execute(
+                select(RoomDailyUserSketchRecord)
+                .where(RoomDailyUserSketchRecord.room_id == room_id, RoomDailyUserSketchRecord.day == day)
+                .with_for_update()
+            ).scalars().one()
+            row.registers = np.maximum(np.frombuffer(row.registers, dtype=np.uint8),
+                                       np.frombuffer(registers, dtype=np.uint8)).tobytes()
+        db.commit()
+
+
+class AsyncSketchRepo:
+    async def get_for_update(self, db: AsyncSession, room_id: str, day: date, empty: bytes) -> RoomDailyUserSketchRecord:
+        """The (room, day) sketch row, created empty if needed and locked until commit."""
+        await db.execute(_insert_ignore(db.get_bind().dialect.name,
+                                        {"room_id": room_id, "day": day, "registers": empty}))
+        result = await db.execute(
+            select(RoomDailyUserSketchRecord)
+            .where(RoomDailyUserSketchRecord.room_id == room_id, RoomDailyUserSketchRecord.day == day)
+            .with_for_update()
+        )
+        return result.scalars().one()
@@ -0,0 +1,130 @@
+# Shared cache of user records for authenticated lookups
+import asyncio
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Optional, Set
+
+from app.model.user_record import UserRecord
+from app.settings import settings
+from app.utils import jsonutil, loggerutil
+from app.utils.cacheutil import TTLCache
+
+logger = loggerutil.get_logger(__name__)
+
+EventPublisher = Callable[[str], Awaitable[None]]
+
+
+def _identity(user_record: UserRecord) -> UserRecord:
+    """Copy of a record without its password hash."""
+    return UserRecord(
+        id=user_record.id,
+        email=user_record.email,
+        username=user_record.username,
+        full_name=user_record.full_name,
+        phone=user_record.phone,
+        profile_pic_url=user_record.profile_pic_url,
+        role=user_record.role,
+        created_at=user_record.created_at,
+        updated_at=user_record.updated_at,
+    )
+
+
+class UserIdentityCache:
+    """
+    Detached UserRecords keyed by both email and id, so token checks (by email) and
+    session checks (by id) skip the database. Entries expire after the TTL; UserRepo
+    invalidates them when a user is updated or deleted. Once `broadcast` is set up,
+    each invalidation is also published to the other workers, which drop their copy
+    in `apply_event`, so a role change takes effect everywhere within a broker hop.
+
+    Cached copies carry no password hash: password checks must read fresh records.
+    """
+
+    def __init__(self, max_size: int = None, ttl_seconds: float = None):
+        max_size = max_size or settings.USER_CACHE_MAX_SIZE
+        ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.USER_CACHE_TTL_SECONDS
+        self._by_email = TTLCache(max_size, ttl_seconds)
+        self._by_id = TTLCache(max_size, ttl_seconds)
+        self._publish: Optional[EventPublisher] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Set[Future] = set()
+        self.published = 0
+        self.received = 0
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        return self._by_email.get(email)
+
+    def get_by_id(self, id: str) -> Optional[UserRecord]:
+        return self._by_id.get(id)
+
+    def put(self, user_record: Optional[UserRecord]) -> Optional[UserRecord]:
+        """Cache an identity copy of `user_record`; the record itself is returned unchanged."""
+        if user_record is not None:
+            identity = _identity(user_record)
+            self._by_email.set(user_record.email, identity)
+            self._by_id.set(user_record.id, identity)
+        return user_record
+
+    def invalidate(self, id: str) -> None:
+        self._drop_id(id)
+        self._broadcast({"id": id})
+
+    def invalidate_email(self, email: str) -> None:
+        self._drop_email(email)
+        self._broadcast({"email": email})
+
+    def _drop_id(self, id: str) -> None:
+        user_record = self._by_id.pop(id)
+        if user_record is not None:
+            self._by_email.pop(user_record.email)
+
+    def _drop_email(self, email: str) -> None:
+        user_record = self._by_email.pop(email)
+        if user_record is not None:
+            self._by_id.pop(user_record.id)
+
+    def broadcast(self, publish: EventPublisher, loop: asyncio.AbstractEventLoop) -> None:
+        """Publish invalidations with the coroutine function `publish`, run on `loop`."""
+        self._publish = publish
+        self._loop = loop
+
+    def apply_event(self, frame: str) -> None:
+        """Drop an entry invalidated by any worker (this one's own events come back too)."""
+        event = jsonutil.loads(frame)
+        self.received += 1
+        if event.get("id"):
+            self._drop_id(event["id"])
+        if event.get("email"):
+            self._drop_email(event["email"])
+
+    def _broadcast(self, event: dict) -> None:
+        if self._publish is None or self._loop is None or self._loop.is_closed():
+            return
+        # UserRepo runs in threadpool workers: hand the publish to the event loop
+        future = asyncio.run_coroutine_threadsafe(self._publish(jsonutil.dumps(event)), self._loop)
+        self._pending.add(future)
+        future.add_done_callback(self._published)
+        self.published += 1
+
+    def _published(self, future: Future) -> None:
+        self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Failed to publish a user cache invalidation: {future.exception()}")
+
+    def clear(self) -> None:
+        self._by_email.clear()
+        self._by_id.clear()
+
+    def stats(self) -> dict:
+        by_email, by_id = self._by_email.stats(), self._by_id.stats()
+        return {
+            "size": by_id["size"],
+            "hits": by_email["hits"] + by_id["hits"],
+            "misses": by_email["misses"] + by_id["misses"],
+            "by_email": by_email,
+            "by_id": by_id,
+            "invalidations_published": self.published,
+            "invalidations_received": self.received,
+        }
+
+
+user_identity_cache = UserIdentityCache()
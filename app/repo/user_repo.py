@@ -1,63 +1,121 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
 from app.domain.user import User
+from app.mapper.user_mapper import map_user_record_to_user
 from app.model.user_record import UserRecord
-from app.repo.datasource import DataSource, Repo
+from app.repo.datasource import READ, AsyncDataSource, DataSource, Repo
+from app.repo.user_cache import UserIdentityCache, user_identity_cache
 from app.utils import uuidutil
-from app.utils.hashing import Hash
-import uuid
+from app.utils.strutil import generate_unique_username
 
+# Each prefix adds a LIKE to one OR, and SQLite rejects expressions nested over 1000 deep
+PREFIXES_PER_QUERY = 250
 
-def _map_user_record_to_user(user_record: UserRecord) -> User:
-    return User(
-        id=getattr(user_record, 'id', None),
-        email=str(getattr(user_record, 'email', '')) if getattr(user_record, 'email', None) is not None else '',
-        username=getattr(user_record, 'username', None),
-        full_name=getattr(user_record, 'full_name', None),
-        phone=getattr(user_record, 'phone', None),
-        profile_pic_url=getattr(user_record, 'profile_pic_url', None),
-        role=getattr(user_record, 'role', None)
-    )
+
+def _suffixed(prefix: str) -> str:
+    """LIKE pattern for `prefix_<anything>`, with the prefix's wildcards escaped."""
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "\\_%"
 
 
 class UserRepo(Repo):
-    def __init__(self, db: DataSource):
+    def __init__(self, db: DataSource, cache: UserIdentityCache = user_identity_cache):
         super().__init__(db)
+        self.cache = cache
 
     def list_users(self, skip: int = 0, limit: int = 10) -> List[User]:
         """List users with pagination support."""
-        with self.db.get_session() as session:
+        with self.db.get_session(READ) as session:
             user_records = (
                 session.query(UserRecord)
                 .offset(skip)
                 .limit(limit)
                 .all()
             )
-            return [_map_user_record_to_user(user_record) for user_record in user_records]
+            return [map_user_record_to_user(user_record) for user_record in user_records]
 
     def get_user_by_id(self, id: str) -> Optional[User]:
-        with self.db.get_session() as session:
-            user_record = (
-                session.query(UserRecord)
-                .filter(UserRecord.id == id)
-                .first()
-            )
-            if user_record:
-                return _map_user_record_to_user(user_record)
+        user_record = self.get_user_record_by_id(id)
+        if user_record:
+            return map_user_record_to_user(user_record)
         return None
 
-    def get_user_by_email(self, email: str) -> Optional[UserRecord]:
+    def get_user_by_email(self, email: str, fresh: bool = False) -> Optional[UserRecord]:
+        """
+        Cached records have no password hash; pass fresh=True to read the database
+        for password checks.
+        """
+        user_record = None if fresh else self.cache.get_by_email(email)
+        if user_record is not None:
+            return user_record
         with self.db.get_session() as session:
-            return (
+            return self.cache.put(
                 session.query(UserRecord)
                 .filter(UserRecord.email == email)
                 .first()
             )
 
-    def get_existing_usernames(self) -> List[str]:
-        """Get all existing usernames for uniqueness checking."""
+    def get_usernames_with_prefix(self, prefix: str) -> Set[str]:
+        """Usernames equal to `prefix` or starting with `prefix_`, found with an index range scan."""
+        return self.get_usernames_with_prefixes([prefix])
+
+    def get_usernames_with_prefixes(self, prefixes: Iterable[str]) -> Set[str]:
+        """get_usernames_with_prefix for many prefixes, up to PREFIXES_PER_QUERY of them per query."""
+        prefixes = list(set(prefixes))
+        usernames: Set[str] = set()
+        if not prefixes:
+            return usernames
         with self.db.get_session() as session:
-            usernames = session.query(UserRecord.username).all()
-            return [str(username[0]) for username in usernames if username[0]]
+            for start in range(0, len(prefixes), PREFIXES_PER_QUERY):
+                chunk = prefixes[start:start + PREFIXES_PER_QUERY]
+                conditions = [UserRecord.username.in_(chunk)] + \
+                    [UserRecord.username.like(_suffixed(prefix), escape="\\") for prefix in chunk]
+                usernames |= {str(row[0]) for row in session.query(UserRecord.username).filter(or_(*conditions)).all()}
+        return usernames
+
+    def existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """The given emails that are already registered, compared and returned in lower case."""
+        emails = list({email.lower() for email in emails})
+        if not emails:
+            return set()
+        email = func.lower(UserRecord.email)
+        with self.db.get_session() as session:
+            return {str(row[0]) for row in session.query(email).filter(email.in_(emails)).all()}
+
+    def existing_usernames(self, usernames: Iterable[str]) -> Set[str]:
+        usernames = list(usernames)
+        if not usernames:
+            return set()
+        with self.db.get_session() as session:
+            return {str(row[0]) for row in
+                    session.query(UserRecord.username).filter(UserRecord.username.in_(usernames)).all()}
+
+    def bulk_insert(self, rows: List[dict]) -> None:
+        """Insert many user rows with one executemany and a single commit."""
+        if not rows:
+            return
+        with self.db.get_session() as session:
+            session.execute(insert(UserRecord), rows)
+            session.commit()
+
+    def add_user_record_with_unique_username(self, user_record: UserRecord, base_username: str,
+                                             attempts: int = 3) -> User:
+        """
+        Insert a user under `base_username`, or `base_username_N` when that is taken. The
+        unique constraint settles concurrent signups; the loser probes again.
+        """
+        for attempt in range(attempts):
+            user_record.username = generate_unique_username(base_username, self.get_usernames_with_prefix(base_username))
+            try:
+                return self.add_user_record(user_record)
+            except IntegrityError:
+                # Retry only when the username (not e.g. the email) was taken in the meantime
+                if attempt == attempts - 1 or not self.is_username_taken(str(user_record.username)):
+                    raise
+
+    def is_username_taken(self, username: str) -> bool:
+        with self.db.get_session() as session:
+            return session.query(UserRecord.id).filter(UserRecord.username == username).first() is not None
 
     def update_user(self, id: str, user_data: User) -> Optional[User]:
         with self.db.get_session() as session:
@@ -68,6 +126,7 @@ class UserRepo(Repo):
             )
             if not user_record:
                 return None
+            old_email = user_record.email
 
             # Only update fields that are provided and not None
             if user_data.username is not None:
@@ -83,7 +142,9 @@ class UserRepo(Repo):
 
             session.commit()
             session.refresh(user_record)
-            return _map_user_record_to_user(user_record)
+            self.cache.invalidate(id)
+            self.cache.invalidate_email(old_email)
+            return map_user_record_to_user(user_record)
 
     def delete_user(self, id: str) -> bool:
         with self.db.get_session() as session:
@@ -93,14 +154,21 @@ class UserRepo(Repo):
                 .first()
             )
             if user_record:
+                email = user_record.email
                 session.delete(user_record)
                 session.commit()
+                self.cache.invalidate(id)
+                self.cache.invalidate_email(email)
                 return True
         return False
 
-    def get_user_record_by_id(self, id: str) -> Optional[UserRecord]:
+    def get_user_record_by_id(self, id: str, fresh: bool = False) -> Optional[UserRecord]:
+        """See get_user_by_email for when to pass fresh=True."""
+        user_record = None if fresh else self.cache.get_by_id(id)
+        if user_record is not None:
+            return user_record
         with self.db.get_session() as session:
-            return (
+            return self.cache.put(
                 session.query(UserRecord)
                 .filter(UserRecord.id == id)
                 .first()
@@ -117,6 +185,8 @@ class UserRepo(Repo):
                 return False
             setattr(user_record, 'password', password)
             session.commit()
+            self.cache.invalidate(id)
+            self.cache.invalidate_email(user_record.email)
             return True
 
     def add_user_record(self, user_record: UserRecord) -> User:
@@ -125,22 +195,38 @@ class UserRepo(Repo):
             session.add(user_record)
             session.commit()
             session.refresh(user_record)
-            return _map_user_record_to_user(user_record)
+            return map_user_record_to_user(user_record)
 
-    def create_user(self, user_data: User, password: str, role: str = "user") -> User:
-        with self.db.get_session() as session:
-            hashed_password = Hash.hash(password)
-            user_record = UserRecord(
-                id=str(uuid.uuid4()),
-                username=user_data.username,
-                email=str(user_data.email),
-                password=hashed_password,
-                role=role,
-                full_name=user_data.full_name,
-                phone=user_data.phone,
-                profile_pic_url=user_data.profile_pic_url
-            )
-            session.add(user_record)
-            session.commit()
-            session.refresh(user_record)
-            return _map_user_record_to_user(user_record)
\ No newline at end of file
+
+class AsyncUserRepo(Repo):
+    def __init__(self, db: AsyncDataSource, cache: UserIdentityCache = user_identity_cache):
+        super().__init__(db)
+        self.cache = cache
+
+    async def list_users(self, skip: int = 0, limit: int = 10) -> List[User]:
+        """List users with pagination support."""
+        async with self.db.get_session() as session:
+            result = await session.execute(select(UserRecord).offset(skip).limit(limit))
+            return [map_user_record_to_user(user_record) for user_record in result.scalars().all()]
+
+    async def get_user_by_id(self, id: str) -> Optional[User]:
+        user_record = await self.get_user_record_by_id(id)
+        if user_record:
+            return map_user_record_to_user(user_record)
+        return None
+
+    async def get_user_record_by_id(self, id: str) -> Optional[UserRecord]:
+        user_record = self.cache.get_by_id(id)
+        if user_record is not None:
+            return user_record
+        async with self.db.get_session() as session:
+            result = await session.execute(select(UserRecord).where(UserRecord.id == id))
+            return self.cache.put(result.scalars().first())
+
+    async def get_user_by_email(self, email: str) -> Optional[UserRecord]:
+        user_record = self.cache.get_by_email(email)
+        if user_record is not None:
+            return user_record
+        async with self.db.get_session() as session:
+            result = await session.execute(select(UserRecord).where(UserRecord.email == email))
+            return self.cache.put(result.scalars().first())
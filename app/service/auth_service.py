@@ -1,57 +1,29 @@
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
-import os
-import jwt
+
+from starlette.concurrency import run_in_threadpool
 
 from app.domain.common import ErrorCode
 from app.domain.auth import Session, LoginResponse, AuthResponse, LogoutResponse
 from app.domain.user import User
+from app.mapper.user_mapper import map_user_record_to_user
 from app.repo.datasource import DataSource
 from app.repo.user_repo import UserRepo
-from app.utils import loggerutil
-from app.utils.hashing import Hash
+from app.service.hashing_service import hashing_service
+from app.service.session_store import SessionStore, session_store
+from app.utils import loggerutil, tokenutil
+from app.utils.exceptions import HashingBusyError
 from app.utils.singleton import Singleton
 
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
-JWT_ALGORITHM = "HS256"
+SECRET_KEY = tokenutil.SECRET_KEY
+JWT_ALGORITHM = tokenutil.ALGORITHM
 JWT_ACCESS_TOKEN_EXPIRE_SECONDS = 7 * 24 * 60 * 60
 
 logger = loggerutil.get_logger(__name__)
 
 
-class SessionStore:
-    def __init__(self):
-        self.sessions: Dict[str, Session] = {}
-
-    def add_session(self, email: str, token: str, expires: datetime) -> None:
-        self.sessions[token] = Session(email=email, expiry=expires, access_token=token)
-
-    def get_session(self, token: str) -> Optional[Session]:
-        session = self.sessions.get(token, None)
-        if session and session.expiry and session.expiry < datetime.now():
-            self.remove_session(token)
-            return None
-        return session
-
-    def remove_session(self, token: str) -> Optional[Session]:
-        return self.sessions.pop(token, None)
-
-    def cleanup_expired(self) -> None:
-        current_time = datetime.now()
-        expired = [token for token, session in self.sessions.items() 
-                  if session.expiry and session.expiry < current_time]
-        for token in expired:
-            self.remove_session(token)
-
 def _decode_jwt(token: str) -> Optional[Dict]:
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-    except jwt.ExpiredSignatureError:
-        logger.error("Token has expired")
-        return None
-    except jwt.InvalidTokenError as e:
-        logger.error(f"Invalid token: {e}")
-        return None
+    return tokenutil.verify_token(token)
 
 
 class AuthService(metaclass=Singleton):
@@ -61,11 +33,14 @@ class AuthService(metaclass=Singleton):
         if AuthService._instance is not None:
             return
         self.user_repo = user_repo
-        self.session_store = SessionStore()
-
-    def authenticate(self, email: str, password: str) -> Optional[User]:
-        """Authenticate the user by email and password."""
-        user_record = self.user_repo.get_user_by_email(email)
+        self.session_store: SessionStore = session_store
+
+    async def authenticate(self, email: str, password: str) -> Optional[User]:
+        """
+        Authenticate the user by email and password. Raises HashingBusyError when the
+        hashing pool is saturated.
+        """
+        user_record = await run_in_threadpool(self.user_repo.get_user_by_email, email, True)
         if not user_record:
             return None
         
@@ -73,24 +48,31 @@ class AuthService(metaclass=Singleton):
         if not password_hash:
             return None
             
-        if not Hash.verify(password, password_hash):
+        if not await hashing_service.verify(password, password_hash):
             return None
-        from app.repo.user_repo import _map_user_record_to_user
-        return _map_user_record_to_user(user_record)
+        if hashing_service.needs_rehash(password_hash):
+            await self._rehash(user_record.id, password)
+        return map_user_record_to_user(user_record)
+
+    async def _rehash(self, user_id: str, password: str) -> None:
+        """Upgrade a hash made with an old work factor; the login succeeds either way."""
+        try:
+            password_hash = await hashing_service.hash(password)
+            await run_in_threadpool(self.user_repo.update_user_password, user_id, password_hash)
+        except HashingBusyError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to rehash password for user {user_id}: {e}")
 
-    def login(self, email: str, password: str) -> LoginResponse:
+    async def login(self, email: str, password: str) -> LoginResponse:
         """Log in the user and create a session."""
-        user = self.authenticate(email, password)
+        user = await self.authenticate(email, password)
         if user is None:
             return LoginResponse(error=True, code=ErrorCode.UNAUTHORIZED, msg="Invalid username or password")
 
-        session = self._create_access_token(email)
+        session = await run_in_threadpool(self._create_access_token, email)
         session.user = user
-        user_record = self.user_repo.get_user_by_email(email)
-        if user_record and user_record.role is not None:
-            session.role = str(user_record.role)
-        else:
-            session.role = "user"
+        session.role = str(user.role) if user.role is not None else "user"
         dashboard = "business" if session.role == "business" else "user"
         return LoginResponse(error=False, session=session, dashboard=dashboard)
 
@@ -98,7 +80,7 @@ class AuthService(metaclass=Singleton):
         """Create a JWT access token for the user."""
         expire = datetime.now() + (expires_delta or timedelta(seconds=JWT_ACCESS_TOKEN_EXPIRE_SECONDS))
         to_encode = {"sub": email, "exp": expire}
-        token = jwt.encode(to_encode, SECRET_KEY, algorithm=JWT_ALGORITHM)
+        token = tokenutil.create_token(to_encode)
         self.session_store.add_session(email=email, token=token, expires=expire)
         return Session(
             access_token=token,
@@ -128,8 +110,7 @@ class AuthService(metaclass=Singleton):
         user_record = self.user_repo.get_user_by_email(username)
         if user_record is None:
             return ErrorCode.UNAUTHORIZED, "User does not exist", None
-        from app.repo.user_repo import _map_user_record_to_user
-        session.user = _map_user_record_to_user(user_record)
+        session.user = map_user_record_to_user(user_record)
         session.role = str(user_record.role) if user_record.role is not None else "user"
         return None, None, session
 
@@ -149,6 +130,12 @@ class AuthService(metaclass=Singleton):
     def logout(self, token: str) -> LogoutResponse:
         """Log out the user and remove the session."""
         session = self.session_store.remove_session(token)
+        if session is None:
+            # Still revoke a valid token issued elsewhere so no worker accepts it again
+            claims = _decode_jwt(token)
+            if claims is not None and isinstance(claims.get("exp"), (int, float)):
+                self.session_store.revoke(token, claims["exp"])
+        tokenutil.forget_token(token)
         if session is None:
             return LogoutResponse(error=True, code=ErrorCode.NOT_FOUND, msg="Session not found")
         return LogoutResponse(error=False)
@@ -167,5 +154,5 @@ class AuthService(metaclass=Singleton):
         """Generate a JWT token for the given user ID."""
         expire = datetime.now() + (expires_delta or timedelta(seconds=JWT_ACCESS_TOKEN_EXPIRE_SECONDS))
         to_encode = {"sub": user_id, "exp": expire}
-        token = jwt.encode(to_encode, SECRET_KEY, algorithm=JWT_ALGORITHM)
+        token = tokenutil.create_token(to_encode)
         return token
\ No newline at end of file
@@ -0,0 +1,192 @@
+# Per-connection send queues for WebSocket rooms
+import asyncio
+from typing import Dict, List, Optional, Union
+
+from fastapi import WebSocket, status
+
+from app.service.message_cache import RecentMessageCache, recent_messages
+from app.service.room_broker import RoomBroker
+from app.settings import settings
+from app.utils import jsonutil, loggerutil
+
+logger = loggerutil.get_logger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+COALESCE = "coalesce"
+OVERFLOW_POLICIES = (DROP_OLDEST, DISCONNECT, COALESCE)
+
+Frame = Union[str, List[str]]
+
+
+class RoomConnection:
+    """
+    A socket in a room with its own bounded send queue and writer task, so a slow
+    client only ever delays itself. Frames are pre-encoded JSON text shared by every
+    recipient; coalesced frames are sent as {"type": "batch", "messages": [...]} and
+    hold at most coalesce_max messages, the oldest being dropped past that.
+    """
+
+    def __init__(self, websocket: WebSocket, room_id: str, user_id: Optional[str],
+                 max_queue: int, policy: str, send_timeout: float, coalesce_max: int = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.websocket = websocket
+        self.room_id = room_id
+        self.user_id = user_id
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.coalesce_max = coalesce_max or settings.WS_COALESCE_MAX_MESSAGES
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.closed = False
+        self._task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer())
+
+    def offer(self, frame: Frame) -> bool:
+        """Enqueue without blocking, applying the overflow policy when the queue is full."""
+        if self.closed:
+            return False
+        if self.queue.full():
+            if self.policy == DISCONNECT:
+                self.dropped += 1
+                if self._close_task is None:
+                    # Keep a reference so the task isn't collected mid-close and its errors surface
+                    self._close_task = asyncio.create_task(self.close(status.WS_1013_TRY_AGAIN_LATER))
+                    self._close_task.add_done_callback(self._closed)
+                return False
+            if self.policy == DROP_OLDEST:
+                self.queue.get_nowait()
+                self.dropped += 1
+            else:
+                pending = self._drain()
+                self.coalesced += len(pending)
+                pending.extend(frame if isinstance(frame, list) else [frame])
+                overflow = len(pending) - self.coalesce_max
+                if overflow > 0:
+                    del pending[:overflow]
+                    self.dropped += overflow
+                self.queue.put_nowait(pending)
+                return True
+        self.queue.put_nowait(frame)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def _closed(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to close a connection in room {self.room_id}: {task.exception()}")
+
+    def _drain(self) -> List[str]:
+        frames: List[str] = []
+        while not self.queue.empty():
+            frame = self.queue.get_nowait()
+            if isinstance(frame, list):
+                frames.extend(frame)
+            else:
+                frames.append(frame)
+        return frames
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                frame = await self.queue.get()
+                if isinstance(frame, list):
+                    frame = jsonutil.batch_frame(frame)
+                await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.send_timeout)
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            logger.warning(f"Send timed out for a connection in room {self.room_id}, closing it")
+            await self.close(status.WS_1013_TRY_AGAIN_LATER)
+        except Exception as e:
+            logger.error(f"Writer stopped for a connection in room {self.room_id}: {e}")
+            self.closed = True
+
+    async def close(self, code: Optional[int] = None) -> None:
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if self.closed:
+            return
+        self.closed = True
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "room_id": self.room_id,
+            "user_id": self.user_id,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+class ConnectionManager:
+    """
+    Tracks the sockets connected to this worker and feeds them from the room broker.
+    The recent-message cache only keeps rooms this worker is subscribed to.
+    """
+
+    def __init__(self, broker: RoomBroker, max_queue: int = None, policy: str = None,
+                 send_timeout: float = None, message_cache: RecentMessageCache = recent_messages,
+                 coalesce_max: int = None):
+        self.broker = broker
+        self.message_cache = message_cache
+        self.max_queue = max_queue or settings.WS_SEND_QUEUE_SIZE
+        self.policy = policy or settings.WS_OVERFLOW_POLICY
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self.coalesce_max = coalesce_max or settings.WS_COALESCE_MAX_MESSAGES
+        self.rooms: Dict[str, List[RoomConnection]] = {}
+
+    async def connect(self, room_id: str, websocket: WebSocket, user_id: Optional[str] = None) -> RoomConnection:
+        """Register a socket. Frames queue up until the caller starts the connection."""
+        conn = RoomConnection(websocket, room_id, user_id, self.max_queue, self.policy, self.send_timeout,
+                              self.coalesce_max)
+        if room_id not in self.rooms:
+            self.rooms[room_id] = []
+            await self.broker.subscribe(room_id)
+            self.message_cache.watch(room_id)
+        self.rooms[room_id].append(conn)
+        return conn
+
+    async def disconnect(self, conn: RoomConnection) -> None:
+        await conn.close()
+        connections = self.rooms.get(conn.room_id)
+        if connections is None:
+            return
+        if conn in connections:
+            connections.remove(conn)
+        if not connections:
+            del self.rooms[conn.room_id]
+            await self.broker.unsubscribe(conn.room_id)
+            self.message_cache.unwatch(conn.room_id)
+
+    async def broadcast(self, room_id: str, frame: Frame) -> None:
+        for conn in list(self.rooms.get(room_id, [])):
+            conn.offer(frame)
+
+    def stats(self) -> dict:
+        connections = [conn.stats() for room in self.rooms.values() for conn in room]
+        return {
+            "rooms": len(self.rooms),
+            "connections": len(connections),
+            "queued": sum(c["queue_depth"] for c in connections),
+            "dropped": sum(c["dropped"] for c in connections),
+            "coalesced": sum(c["coalesced"] for c in connections),
+            "overflow_policy": self.policy,
+            "queue_size": self.max_queue,
+            "details": connections,
+        }
@@ -0,0 +1,93 @@
+# Password hashing off the event loop
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from app.settings import settings
+from app.utils import loggerutil
+from app.utils.exceptions import HashingBusyError
+from app.utils.hashing import Hash
+
+logger = loggerutil.get_logger(__name__)
+
+
+class HashingService:
+    """
+    Runs bcrypt in a process pool so a login burst neither blocks the event loop nor
+    holds the GIL. At most `max_pending` jobs may be queued or running; beyond that
+    callers get HashingBusyError straight away (surfaced as 429) instead of waiting.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, rounds: int = None):
+        self.workers = workers or settings.HASH_POOL_WORKERS
+        self.max_pending = max_pending or settings.HASH_POOL_MAX_PENDING
+        self.rounds = rounds or settings.BCRYPT_ROUNDS
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threadpool is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusyError("Password hashing is saturated, try again shortly")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(Hash.hash, password, self.rounds)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(Hash.verify, plain_password, hashed_password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hash a batch across all workers for bulk jobs. The batch waits for the pool
+        rather than being rejected, but keeps at most `workers` hashes queued so
+        interactive logins are never stuck behind a whole batch.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        slots = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with slots:
+                return await loop.run_in_executor(executor, Hash.hash, password, self.rounds)
+
+        hashes = await asyncio.gather(*(hash_one(password) for password in passwords))
+        self.completed += len(hashes)
+        return list(hashes)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True when a stored hash was made with a different work factor than configured."""
+        return Hash.needs_rehash(hashed_password, self.rounds)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_service = HashingService()
@@ -0,0 +1,193 @@
+# In-memory ring buffer of recent messages per room
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Set
+
+from app.settings import settings
+from app.utils import jsonutil
+
+# Rough per-message cost of the slotted object, its strings and the deque slot
+_MESSAGE_OVERHEAD_BYTES = 240
+
+
+def _iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class CachedMessage:
+    __slots__ = ("id", "content", "user_id", "room_id", "full_name", "created_at", "updated_at")
+
+    def __init__(self, id, content, user_id, room_id, full_name, created_at, updated_at):
+        self.id = id
+        self.content = content
+        self.user_id = user_id
+        self.room_id = room_id
+        self.full_name = full_name
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row) -> "CachedMessage":
+        return cls(row.id, row.content, row.user_id, row.room_id, row.full_name,
+                   row.created_at, row.updated_at)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CachedMessage":
+        return cls(data.get("id"), data.get("content"), data.get("user_id"), data.get("room_id"),
+                   data.get("full_name"), data.get("created_at"), data.get("updated_at"))
+
+    def size(self) -> int:
+        return _MESSAGE_OVERHEAD_BYTES + len(self.content or "") + len(self.full_name or "")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "content": self.content,
+            "user_id": self.user_id,
+            "room_id": self.room_id,
+            "full_name": self.full_name,
+            "created_at": _iso(self.created_at),
+            "updated_at": _iso(self.updated_at),
+        }
+
+
+class _RoomBuffer:
+    __slots__ = ("messages", "ids", "seeded", "complete", "bytes", "seeded_at")
+
+    def __init__(self, capacity: int):
+        self.messages: Deque[CachedMessage] = deque(maxlen=capacity)
+        self.ids: Set[str] = set()
+        # Unseeded buffers only hold writes seen by this worker and can't answer reads
+        self.seeded = False
+        # True when the buffer holds the room's entire history
+        self.complete = False
+        self.bytes = 0
+        self.seeded_at = 0.0
+
+
+class RecentMessageCache:
+    """
+    Last `room_capacity` messages of hot rooms, oldest first. Every write seen by this
+    worker is appended; a room answers reads once it has been seeded from the primary
+    on a miss. Seeding merges the writes already buffered, so messages that are still
+    in flight (or waiting in the write-behind buffer) are not lost. Cold rooms are
+    evicted LRU once max_rooms or max_bytes is exceeded.
+
+    Only watched rooms (this worker is subscribed to their broker channel, so it sees
+    every write from every worker) are seeded. Unwatching a room evicts it, since its
+    buffer stops receiving other workers' writes.
+    """
+
+    def __init__(self, room_capacity: int = None, max_rooms: int = None, max_bytes: int = None,
+                 ttl_seconds: float = None):
+        self.room_capacity = room_capacity or settings.MESSAGE_CACHE_ROOM_CAPACITY
+        self.max_rooms = max_rooms or settings.MESSAGE_CACHE_MAX_ROOMS
+        self.max_bytes = max_bytes or settings.MESSAGE_CACHE_MAX_BYTES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.MESSAGE_CACHE_TTL_SECONDS
+        self._rooms: "OrderedDict[str, _RoomBuffer]" = OrderedDict()
+        self._watched: Set[str] = set()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, room_id: str, limit: int) -> Optional[List[CachedMessage]]:
+        """Latest `limit` messages oldest first, or None when the buffer can't answer."""
+        buffer = self._rooms.get(room_id)
+        if buffer is not None and buffer.seeded and self.ttl_seconds \
+                and time.monotonic() - buffer.seeded_at > self.ttl_seconds:
+            buffer.seeded = False
+        if buffer is None or not buffer.seeded or (limit > len(buffer.messages) and not buffer.complete):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._rooms.move_to_end(room_id)
+        messages = list(buffer.messages)
+        return messages[-limit:] if limit else []
+
+    def watch(self, room_id: str) -> None:
+        self._watched.add(room_id)
+
+    def is_watched(self, room_id: str) -> bool:
+        return room_id in self._watched
+
+    def unwatch(self, room_id: str) -> None:
+        self._watched.discard(room_id)
+        self.evict(room_id)
+
+    def seed(self, room_id: str, messages: List[CachedMessage]) -> None:
+        """Load a room's latest messages from the database, oldest first. Ignored for unwatched rooms."""
+        if room_id not in self._watched:
+            return
+        pending = self._rooms.get(room_id)
+        self.evict(room_id)
+        buffer = _RoomBuffer(self.room_capacity)
+        buffer.complete = len(messages) < self.room_capacity
+        for message in messages[-self.room_capacity:]:
+            self._push(buffer, message)
+        if pending is not None:
+            for message in pending.messages:
+                if message.id not in buffer.ids:
+                    self._push(buffer, message)
+        buffer.seeded = True
+        buffer.seeded_at = time.monotonic()
+        self._rooms[room_id] = buffer
+        self._bytes += buffer.bytes
+        self._enforce_limits()
+
+    def append(self, room_id: str, message: CachedMessage) -> None:
+        """Record a new message written to the room."""
+        buffer = self._rooms.get(room_id)
+        if buffer is None:
+            if room_id not in self._watched:
+                return
+            buffer = self._rooms[room_id] = _RoomBuffer(self.room_capacity)
+        elif message.id in buffer.ids:
+            return
+        self._rooms.move_to_end(room_id)
+        self._bytes += self._push(buffer, message)
+        self._enforce_limits()
+
+    def append_frame(self, room_id: str, frame: str) -> None:
+        """Record a broadcast frame, e.g. one written by another worker."""
+        self.append(room_id, CachedMessage.from_dict(jsonutil.loads(frame)))
+
+    def evict(self, room_id: str) -> None:
+        buffer = self._rooms.pop(room_id, None)
+        if buffer is not None:
+            self._bytes -= buffer.bytes
+
+    @staticmethod
+    def _push(buffer: _RoomBuffer, message: CachedMessage) -> int:
+        """Append to a buffer and return how many bytes it grew by."""
+        delta = message.size()
+        if len(buffer.messages) == buffer.messages.maxlen:
+            oldest = buffer.messages[0]
+            buffer.ids.discard(oldest.id)
+            delta -= oldest.size()
+            buffer.complete = False
+        buffer.messages.append(message)
+        buffer.ids.add(message.id)
+        buffer.bytes += delta
+        return delta
+
+    def _enforce_limits(self) -> None:
+        while self._rooms and (len(self._rooms) > self.max_rooms or self._bytes > self.max_bytes):
+            _, buffer = self._rooms.popitem(last=False)
+            self._bytes -= buffer.bytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self._rooms),
+            "watched": len(self._watched),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+recent_messages = RecentMessageCache()
@@ -1,11 +1,18 @@
 # Message service for message business logic 
-from app.repo.message_repo import MessageRepo
+from sqlalchemy import select
+from app.repo.datasource import WRITE, AsyncDataSource
+from app.repo.message_repo import AsyncMessageRepo
+from app.service.message_cache import CachedMessage, RecentMessageCache, recent_messages
+from app.service.room_broker import RoomBroker
+from app.service.sketch_service import ActiveUserSketches, active_user_sketches
 from app.model.message_record import MessageRecord
 from app.domain.message_req_res import CreateMessageRequest, CreateMessageResponse
-from app.domain.message import Message as MessageDomain
-from app.utils import loggerutil
-from typing import List
-from app.domain.message_req_res import ListMessageResponse
+from app.domain.message import Message as MessageDomain, MessageSearchHit
+from app.utils import cursorutil, jsonutil, loggerutil
+from app.utils.strutil import is_empty
+from typing import List, Optional
+from app.domain.common import Pagination
+from app.domain.message_req_res import ListMessageResponse, SearchMessageResponse
 from datetime import datetime
 from app.model.user_record import UserRecord
 
@@ -17,11 +24,19 @@ def to_iso(dt):
     return dt.isoformat()
 
 class MessageService:
-    def __init__(self, message_repo: MessageRepo):
+    def __init__(self, message_repo: AsyncMessageRepo, message_cache: RecentMessageCache = recent_messages,
+                 user_sketches: ActiveUserSketches = active_user_sketches, room_broker: Optional[RoomBroker] = None,
+                 db: Optional[AsyncDataSource] = None):
         self.message_repo = message_repo
+        # Seeds the ring buffer from the primary, never from a replica
+        self.db = db or AsyncDataSource()
+        self.message_cache = message_cache
+        self.user_sketches = user_sketches
+        # Fans created messages out to room members and to every worker's cache
+        self.room_broker = room_broker
         self.logger = loggerutil.get_logger(self.__class__.__name__)
 
-    def create_message(self, db, request: CreateMessageRequest, user_id: str, room_id: str = None) -> CreateMessageResponse:
+    async def create_message(self, db, request: CreateMessageRequest, user_id: str, room_id: str = None) -> CreateMessageResponse:
         import uuid
         message = MessageRecord(
             id=str(uuid.uuid4()),
@@ -29,9 +44,10 @@ class MessageService:
             user_id=user_id,
             room_id=room_id or request.message.room_id
         )
-        created_message = self.message_repo.create(db, message)
+        created_message = await self.message_repo.create(db, message)
         # Convert to domain model for response
-        user = db.query(UserRecord).filter(UserRecord.id == created_message.user_id).first()
+        result = await db.execute(select(UserRecord).where(UserRecord.id == created_message.user_id))
+        user = result.scalars().first()
         message_domain = MessageDomain(
             id=getattr(created_message, 'id', None),
             content=getattr(created_message, 'content', None),
@@ -41,19 +57,104 @@ class MessageService:
             created_at=to_iso(getattr(created_message, 'created_at', None)),
             updated_at=to_iso(getattr(created_message, 'updated_at', None))
         )
+        self.message_cache.append(message_domain.room_id, CachedMessage.from_dict(message_domain.dict()))
+        if self.room_broker is not None:
+            await self.room_broker.publish(message_domain.room_id, jsonutil.dumps(message_domain.dict()))
+        self.user_sketches.record(created_message.room_id, created_message.user_id, created_message.created_at)
         return CreateMessageResponse(message=message_domain)
 
-    def list_messages(self, db, room_id: str, skip: int = 0, limit: int = 50) -> ListMessageResponse:
-        messages = self.message_repo.get_recent_by_room(db, room_id, limit, skip)
-        message_domains = [
-            MessageDomain(
-                id=getattr(m, 'id', None),
-                content=getattr(m, 'content', None),
-                user_id=getattr(m, 'user_id', None),
-                room_id=getattr(m, 'room_id', None),
-                full_name=user.full_name if user else None,
-                created_at=to_iso(getattr(m, 'created_at', None)),
-                updated_at=to_iso(getattr(m, 'updated_at', None))
-            ) for m in messages
-        ]
-        return ListMessageResponse(messages=message_domains)
\ No newline at end of file
+    async def recent_history(self, db, room_id: str, limit: int) -> List[CachedMessage]:
+        """Latest `limit` messages of a room, oldest first, from the ring buffer when it can answer."""
+        cached = self.message_cache.get(room_id, limit)
+        if cached is not None:
+            return cached
+        if not self.message_cache.is_watched(room_id):
+            # The buffer would drop the seed anyway: read just the page, replica is fine
+            rows = await self.message_repo.get_history(db, room_id, limit=limit)
+            return [CachedMessage.from_row(row) for row in reversed(rows)]
+        # A seeded buffer answers until evicted, so a replica that lags would leave gaps in it
+        async with self.db.get_session(WRITE) as primary:
+            rows = await self.message_repo.get_history(primary, room_id,
+                                                       limit=max(limit, self.message_cache.room_capacity))
+        self.message_cache.seed(room_id, [CachedMessage.from_row(row) for row in reversed(rows)])
+        cached = self.message_cache.get(room_id, limit)
+        if cached is not None:
+            return cached
+        return [CachedMessage.from_row(row) for row in reversed(rows[:limit])]
+
+    async def list_messages(self, db, room_id: str, skip: int = 0, limit: int = 50,
+                            cursor: Optional[str] = None) -> ListMessageResponse:
+        try:
+            position = cursorutil.parse_cursor(cursor)
+        except ValueError as e:
+            return ListMessageResponse(error=True, msg=str(e))
+        if position is not None:
+            # Keyset page: cost doesn't depend on how deep into the history it is
+            direction, created_at, message_id = position
+            key = (created_at, message_id)
+            if direction == cursorutil.AFTER:
+                rows = await self.message_repo.get_history(db, room_id, limit, after=key)
+            else:
+                rows = await self.message_repo.get_history(db, room_id, limit, before=key)
+            message_domains = [_row_to_domain(row) for row in rows]
+            return ListMessageResponse(messages=message_domains,
+                                       pagination=_pagination(message_domains, limit, skip, direction))
+        if skip == 0 and 0 < limit <= self.message_cache.room_capacity:
+            # First page of a hot room: served from the ring buffer, newest first
+            recent = await self.recent_history(db, room_id, limit)
+            message_domains = [MessageDomain(**m.to_dict()) for m in reversed(recent)]
+            return ListMessageResponse(messages=message_domains, pagination=_pagination(message_domains, limit, skip))
+        # Authors come from the same joined query: one round-trip per page
+        rows = await self.message_repo.get_history(db, room_id, limit, skip=skip)
+        message_domains = [_row_to_domain(row) for row in rows]
+        return ListMessageResponse(messages=message_domains, pagination=_pagination(message_domains, limit, skip))
+
+    async def search_messages(self, db, query: str, current_user, room_id: Optional[str] = None, limit: int = 20,
+                              cursor: Optional[str] = None) -> SearchMessageResponse:
+        """Ranked, highlighted search over the rooms the user can see (all rooms for admins)."""
+        if is_empty(query):
+            return SearchMessageResponse(error=True, msg="Search query is required")
+        try:
+            after = cursorutil.parse_cursor(cursor, cursorutil.SEARCH)
+        except ValueError as e:
+            return SearchMessageResponse(error=True, msg=str(e))
+        user_id = None if getattr(current_user, "role", "user") == "admin" else current_user.id
+        rows = await self.message_repo.search(db, query, limit=limit, user_id=user_id, room_id=room_id, after=after)
+        hits = [MessageSearchHit(**_row_to_domain(row).dict(), rank=float(row.rank), highlight=row.highlight)
+                for row in rows]
+        pagination = Pagination(limit=limit)
+        if len(rows) >= limit:
+            last = rows[-1]
+            pagination.next_cursor = cursorutil.encode_cursor(float(last.rank), last.created_at, last.id)
+        return SearchMessageResponse(hits=hits, pagination=pagination)
+
+    async def ensure_search_index(self, db) -> None:
+        try:
+            await self.message_repo.ensure_search_index(db)
+        except Exception as e:
+            self.logger.warning(f"Message search index unavailable: {e}")
+
+
+def _row_to_domain(row) -> MessageDomain:
+    return MessageDomain(
+        id=row.id,
+        content=row.content,
+        user_id=row.user_id,
+        room_id=row.room_id,
+        full_name=row.full_name,
+        created_at=to_iso(row.created_at),
+        updated_at=to_iso(row.updated_at)
+    )
+
+
+def _pagination(messages: List[MessageDomain], limit: int, skip: int = 0,
+                direction: Optional[str] = None) -> Pagination:
+    """Cursors around a newest-first page: next_cursor goes to older messages, prev_cursor to newer ones."""
+    pagination = Pagination(limit=limit, offset=skip)
+    if not messages:
+        return pagination
+    newest, oldest = messages[0], messages[-1]
+    pagination.prev_cursor = cursorutil.encode_cursor(cursorutil.AFTER, newest.created_at, newest.id)
+    if len(messages) >= limit or direction == cursorutil.AFTER:
+        pagination.next_cursor = cursorutil.encode_cursor(cursorutil.BEFORE, oldest.created_at, oldest.id)
+    return pagination
\ No newline at end of file
@@ -0,0 +1,226 @@
+# Persistence pipeline for chat messages received over WebSocket
+import asyncio
+import fcntl
+import glob
+import os
+from datetime import date, datetime, timezone
+from typing import List, Optional, Set
+
+from app.repo.datasource import AsyncDataSource
+from app.repo.message_repo import AsyncMessageRepo
+from app.settings import settings
+from app.utils import jsonutil, loggerutil
+from app.utils.exceptions import MessageBufferFullError
+
+logger = loggerutil.get_logger(__name__)
+
+SYNC = "sync"
+WRITE_BEHIND = "write_behind"
+
+
+class MessageWriter:
+    """
+    Persists chat messages. In "sync" mode each message is committed before it is
+    broadcast. In "write_behind" mode the message is broadcast straight away with its
+    server-assigned ID and buffered; a background task bulk-inserts the buffer every
+    batch_size messages or flush_interval_ms.
+
+    Buffered rows are appended to a journal file first (when journal_path is set), so
+    rows that were still buffered when the process died are inserted on the next start.
+    Journal fsyncs run on a worker thread and are shared by concurrent submitters.
+    Each worker process journals to its own `<journal_path>.<pid>` file and holds an
+    exclusive lock on it while running; on start, a worker recovers every journal whose
+    lock is free (its owner is gone), one worker at a time.
+
+    At most max_buffered rows are held; while the database is failing, submit raises
+    MessageBufferFullError instead of growing the buffer.
+    """
+
+    def __init__(self, db: AsyncDataSource, message_repo: AsyncMessageRepo, mode: str = None,
+                 batch_size: int = None, flush_interval_ms: int = None, max_buffered: int = None,
+                 journal_path: Optional[str] = None, journal_fsync: Optional[bool] = None):
+        self.db = db
+        self.message_repo = message_repo
+        self.mode = mode or settings.MESSAGE_WRITE_MODE
+        if self.mode not in (SYNC, WRITE_BEHIND):
+            raise ValueError(f"Unknown message write mode: {self.mode}")
+        self.batch_size = batch_size or settings.MESSAGE_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms or settings.MESSAGE_FLUSH_INTERVAL_MS) / 1000
+        self.max_buffered = max_buffered or settings.MESSAGE_MAX_BUFFERED
+        self.journal_path = journal_path if journal_path is not None else settings.MESSAGE_JOURNAL_PATH
+        self.journal_fsync = journal_fsync if journal_fsync is not None else settings.MESSAGE_JOURNAL_FSYNC
+        self._buffer: List[dict] = []
+        self._journal = None
+        self._journal_file: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        # Journal lines written and covered by an fsync, for group fsync
+        self._journal_written = 0
+        self._journal_synced = 0
+        self._fsync_lock = asyncio.Lock()
+        self.flushed = 0
+        self.failed_flushes = 0
+        # UTC days of the rows journal recovery inserted; rollups of those days may be stale
+        self.recovered_days: Set[date] = set()
+
+    async def start(self) -> None:
+        if self.mode != WRITE_BEHIND:
+            return
+        if self.journal_path:
+            await self._recover_journals()
+            self._journal_file = f"{self.journal_path}.{os.getpid()}"
+            self._journal = open(self._journal_file, "a", encoding="utf-8")
+            # Held until the journal is closed: tells other workers this journal is live
+            fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # Let the loop finish its current insert rather than cancelling it mid-commit
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._journal is not None:
+            if not self._buffer:
+                # Nothing left to recover
+                os.remove(self._journal_file)
+            self._journal.close()
+            self._journal = None
+
+    async def submit(self, row: dict) -> None:
+        """Persist a message row: immediately in sync mode, otherwise via the buffer."""
+        if self.mode == SYNC:
+            await self._insert([row])
+            return
+        if len(self._buffer) >= self.max_buffered:
+            # Backpressure: the sender waits for the database rather than growing the buffer
+            await self.flush()
+            if len(self._buffer) >= self.max_buffered:
+                raise MessageBufferFullError(f"{len(self._buffer)} messages are waiting for the database")
+        if self._journal is not None:
+            self._journal.write(jsonutil.dumps(_to_journal(row)) + "\n")
+            self._journal.flush()
+            self._journal_written += 1
+        # Buffer before awaiting the fsync so a flush meanwhile can't truncate an unbuffered row
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        if self._journal is not None and self.journal_fsync:
+            await self._sync_journal(self._journal_written)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            while self._buffer:
+                rows = self._buffer[:self.batch_size]
+                try:
+                    await self._insert(rows)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    logger.exception(f"Failed to flush {len(rows)} buffered messages: {e}")
+                    return
+                del self._buffer[:len(rows)]
+                self.flushed += len(rows)
+            # Everything journaled so far is in the database now
+            if self._journal is not None:
+                self._journal.truncate(0)
+
+    async def _sync_journal(self, line: int) -> None:
+        async with self._fsync_lock:
+            if self._journal_synced >= line:
+                # The fsync that just finished covered this line too
+                return
+            if self._journal is None:
+                return
+            written = self._journal_written
+            await asyncio.to_thread(os.fsync, self._journal.fileno())
+            self._journal_synced = written
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _insert(self, rows: List[dict]) -> None:
+        session = self.db.get_session()
+        try:
+            await self.message_repo.bulk_create(session, rows)
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await self.db.close_session(session)
+
+    async def _recover_journals(self) -> None:
+        """Insert the rows left in the journals of workers that are no longer running."""
+        with open(f"{self.journal_path}.lock", "a") as lock:
+            # Serialises recovery between workers starting together; released on close
+            await asyncio.to_thread(fcntl.flock, lock.fileno(), fcntl.LOCK_EX)
+            # A journal from before per-worker journals has no suffix
+            paths = [self.journal_path] if os.path.exists(self.journal_path) else []
+            paths += [path for path in glob.glob(glob.escape(self.journal_path) + ".*")
+                      if path.rsplit(".", 1)[-1].isdigit()]
+            for path in paths:
+                with open(path, "r+", encoding="utf-8") as journal:
+                    try:
+                        fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # Owned by a running worker
+                    await self._recover_journal(path, journal)
+                    # Removed while still locked; a worker that stopped cleanly may have removed it already
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    async def _recover_journal(self, path: str, journal) -> None:
+        rows = []
+        for line in journal:
+            try:
+                rows.append(_from_journal(jsonutil.loads(line)))
+            except Exception:
+                # A torn last line from a crash mid-write
+                logger.warning("Skipping unreadable message journal entry")
+        if not rows:
+            return
+        session = self.db.get_session()
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                since = min((row["created_at"] for row in batch if row.get("created_at")), default=None)
+                existing = await self.message_repo.existing_ids(session, (row["id"] for row in batch), since=since)
+                missing = [row for row in batch if row["id"] not in existing]
+                await self.message_repo.bulk_create(session, missing)
+                self.recovered_days.update(row["created_at"].astimezone(timezone.utc).date()
+                                           for row in missing if row.get("created_at"))
+        finally:
+            await self.db.close_session(session)
+        logger.info(f"Recovered {len(rows)} journaled messages from {path}")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "buffered": len(self._buffer),
+            "max_buffered": self.max_buffered,
+            "flushed": self.flushed,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+def _to_journal(row: dict) -> dict:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def _from_journal(entry: dict) -> dict:
+    for key in ("created_at", "updated_at"):
+        if entry.get(key):
+            value = datetime.fromisoformat(entry[key])
+            # Journals written before timestamps were timezone-aware hold naive UTC
+            entry[key] = value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    return entry
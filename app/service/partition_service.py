@@ -0,0 +1,132 @@
+# Maintenance job for the monthly message partitions
+#
+#   python -m app.service.partition_service maintain     create upcoming partitions, drop expired ones
+#   python -m app.service.partition_service list
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.repo.analytics_repo import AnalyticsRepo
+from app.repo.datasource import DataSource
+from app.repo.partition_repo import PartitionRepo, add_months, month_start, partition_name
+from app.settings import settings
+from app.utils import loggerutil
+
+logger = loggerutil.get_logger(__name__)
+
+
+class PartitionService:
+    """
+    Keeps partitions of `messages` for the current month and the next `premake_months`,
+    and enforces retention by dropping whole months once all of a month is older than
+    `retention_days` (0 keeps everything). Dropping a partition is a catalog change, not
+    a row delete: no vacuum debt and no index bloat.
+
+    A month is only dropped after the daily rollups have compacted it, so the
+    analytics reports keep its counts. Does nothing unless `messages` is partitioned
+    (liquibase message/04; Postgres only).
+    """
+
+    def __init__(self, db: DataSource, partition_repo: PartitionRepo, analytics_repo: AnalyticsRepo,
+                 premake_months: int = None, retention_days: int = None, interval_seconds: float = None):
+        self.db = db
+        self.partition_repo = partition_repo
+        self.analytics_repo = analytics_repo
+        self.premake_months = premake_months if premake_months is not None else settings.MESSAGE_PARTITION_PREMAKE_MONTHS
+        self.retention_days = retention_days if retention_days is not None else settings.MESSAGE_RETENTION_DAYS
+        self.interval = interval_seconds or settings.MESSAGE_PARTITION_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    def maintain(self) -> dict:
+        """Returns the names of the partitions created and dropped."""
+        session = self.db.get_session()
+        try:
+            if not self.partition_repo.is_partitioned(session):
+                return {"created": [], "dropped": []}
+            self.partition_repo.lock(session)
+            existing = {month for month, _ in self.partition_repo.list_partitions(session)}
+            now = datetime.now(timezone.utc)
+            created = []
+            current = month_start(now.date())
+            for offset in range(self.premake_months + 1):
+                month = add_months(current, offset)
+                if month not in existing:
+                    self.partition_repo.create_partition(session, month)
+                    created.append(partition_name(month))
+            dropped = []
+            if self.retention_days > 0:
+                cutoff = (now - timedelta(days=self.retention_days)).date()
+                watermark = self.analytics_repo.get_watermark(session)
+                for month in sorted(existing):
+                    end = add_months(month, 1)
+                    if end > cutoff:
+                        break
+                    if settings.ROLLUP_ENABLED and (watermark is None or end > watermark):
+                        logger.warning(f"Keeping expired partition {partition_name(month)} until it is rolled up")
+                        break
+                    self.partition_repo.drop_partition(session, month)
+                    dropped.append(partition_name(month))
+            session.commit()
+            return {"created": created, "dropped": dropped}
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session(session)
+
+    def partitions(self) -> dict:
+        session = self.db.get_session()
+        try:
+            partitioned = self.partition_repo.is_partitioned(session)
+            months = self.partition_repo.list_partitions(session) if partitioned else []
+            return {
+                "partitioned": partitioned,
+                "retention_days": self.retention_days,
+                "partitions": [{"name": name, "start": month.isoformat(), "end": add_months(month, 1).isoformat()}
+                               for month, name in months],
+            }
+        finally:
+            self.db.close_session(session)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await asyncio.to_thread(self.maintain)
+                if result["created"] or result["dropped"]:
+                    logger.info(f"Message partitions created: {result['created']}, dropped: {result['dropped']}")
+            except Exception as e:
+                logger.exception(f"Message partition maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the monthly message partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("maintain", help="create upcoming partitions and drop expired ones")
+    commands.add_parser("list", help="show the current partitions")
+    args = parser.parse_args()
+
+    service = PartitionService(DataSource(), PartitionRepo(), AnalyticsRepo())
+    if args.command == "maintain":
+        result = service.maintain()
+        print(f"Created {result['created'] or 'none'}, dropped {result['dropped'] or 'none'}")
+    else:
+        result = service.partitions()
+        if not result["partitioned"]:
+            print("messages is not partitioned")
+        for partition in result["partitions"]:
+            print(f"{partition['name']}  [{partition['start']}, {partition['end']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Compaction job for the daily analytics rollups
+#
+#   python -m app.service.rollup_service compact              roll up every closed day
+#   python -m app.service.rollup_service rebuild              recompute all rollups from raw rows
+#   python -m app.service.rollup_service check [--days N] [--repair]
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from app.repo.analytics_repo import DAY, AnalyticsRepo
+from app.repo.datasource import DataSource
+from app.settings import settings
+from app.utils import loggerutil
+
+logger = loggerutil.get_logger(__name__)
+
+
+class RollupService:
+    """
+    Keeps the per-(room, day) and per-(user, day) message counts current. Each run
+    rolls up the UTC days between the stored watermark and the last closed day, then
+    advances the watermark in the same transaction. A day closes `grace_seconds`
+    after midnight, so late write-behind flushes still land before it is counted.
+    """
+
+    def __init__(self, db: DataSource, analytics_repo: AnalyticsRepo, interval_seconds: float = None,
+                 grace_seconds: float = None):
+        self.db = db
+        self.analytics_repo = analytics_repo
+        self.interval = interval_seconds or settings.ROLLUP_INTERVAL_SECONDS
+        self.grace = timedelta(seconds=grace_seconds if grace_seconds is not None else settings.ROLLUP_GRACE_SECONDS)
+        self._task: Optional[asyncio.Task] = None
+
+    def compact(self) -> int:
+        """Roll up all closed days past the watermark; returns how many days were added."""
+        session = self.db.get_session()
+        try:
+            # The row lock keeps concurrent workers from compacting the same days
+            day = self.analytics_repo.get_watermark(session, for_update=True) \
+                or self.analytics_repo.first_message_day(session)
+            closed = (datetime.now(timezone.utc) - self.grace).date()
+            days = 0
+            while day is not None and day < closed:
+                self.analytics_repo.rollup_day(session, day)
+                day += DAY
+                days += 1
+            if days:
+                self.analytics_repo.set_watermark(session, day)
+            session.commit()
+            return days
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session(session)
+
+    def reroll(self, days: Iterable[date]) -> int:
+        """
+        Recompute days that were already rolled up but gained raw rows since, e.g. rows
+        inserted by write-behind journal recovery. Days past the watermark are left to
+        compaction. Returns how many days were recomputed.
+        """
+        session = self.db.get_session()
+        try:
+            watermark = self.analytics_repo.get_watermark(session, for_update=True)
+            stale = sorted(day for day in set(days) if watermark is not None and day < watermark)
+            for day in stale:
+                self.analytics_repo.rollup_day(session, day)
+            session.commit()
+            return len(stale)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session(session)
+
+    def rebuild(self) -> int:
+        """Drop every rollup row and recompute from raw messages."""
+        session = self.db.get_session()
+        try:
+            self.analytics_repo.clear_rollups(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session(session)
+        return self.compact()
+
+    def check(self, days: Optional[int] = None, repair: bool = False) -> List[dict]:
+        """
+        Compare rolled-up totals with raw counts for the last `days` rolled-up days
+        (all of them by default). Returns the mismatching days, recomputing them when
+        `repair` is set.
+        """
+        session = self.db.get_session()
+        try:
+            watermark = self.analytics_repo.get_watermark(session)
+            if watermark is None:
+                return []
+            first = self.analytics_repo.first_message_day(session) or watermark
+            if days is not None:
+                first = max(first, watermark - DAY * days)
+            mismatches = []
+            day: date = first
+            while day < watermark:
+                totals = self.analytics_repo.rollup_totals(session, day)
+                if not totals["raw"] == totals["by_room"] == totals["by_user"]:
+                    mismatches.append({"day": day.isoformat(), **totals})
+                    if repair:
+                        self.analytics_repo.rollup_day(session, day)
+                day += DAY
+            session.commit()
+            return mismatches
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session(session)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                days = await asyncio.to_thread(self.compact)
+                if days:
+                    logger.info(f"Rolled up {days} day(s) of message counts")
+            except Exception as e:
+                logger.exception(f"Rollup compaction failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the daily analytics rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="roll up every closed day past the watermark")
+    commands.add_parser("rebuild", help="recompute all rollups from raw messages")
+    check = commands.add_parser("check", help="compare rollups with raw counts")
+    check.add_argument("--days", type=int, default=None, help="only the most recent N rolled-up days")
+    check.add_argument("--repair", action="store_true", help="recompute mismatching days")
+    args = parser.parse_args()
+
+    service = RollupService(DataSource(), AnalyticsRepo())
+    if args.command == "compact":
+        print(f"Rolled up {service.compact()} day(s)")
+    elif args.command == "rebuild":
+        print(f"Rebuilt {service.rebuild()} day(s)")
+    else:
+        mismatches = service.check(args.days, args.repair)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatching day(s)" + (" repaired" if args.repair and mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
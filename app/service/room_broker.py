@@ -0,0 +1,158 @@
+# Pub/sub backends for room fan-out across workers
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from app.settings import settings
+from app.utils import loggerutil
+
+logger = loggerutil.get_logger(__name__)
+
+RoomHandler = Callable[[str, str], Awaitable[None]]
+EventHandler = Callable[[str], Awaitable[None]]
+
+
+class RoomBroker:
+    """
+    Delivers room messages to every worker that has members of the room connected.
+    Each worker registers one handler that pushes a message to its local sockets.
+    Messages travel as pre-encoded JSON text so they are serialized once per message.
+
+    Besides rooms, every worker listens on one event channel for internal
+    notifications (user cache invalidations); it is separate from the room channels,
+    so no client can join or publish to it.
+    """
+
+    def __init__(self):
+        self._handler: Optional[RoomHandler] = None
+        self._event_handler: Optional[EventHandler] = None
+
+    def set_handler(self, handler: RoomHandler) -> None:
+        self._handler = handler
+
+    def set_event_handler(self, handler: EventHandler) -> None:
+        self._event_handler = handler
+
+    async def start(self) -> None:
+        """Start listening on the event channel."""
+        pass
+
+    async def publish_event(self, frame: str) -> None:
+        """Notify every worker, this one included."""
+        await self._dispatch_event(frame)
+
+    async def subscribe(self, room_id: str) -> None:
+        pass
+
+    async def unsubscribe(self, room_id: str) -> None:
+        pass
+
+    async def publish(self, room_id: str, frame: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def _dispatch(self, room_id: str, frame: str) -> None:
+        if self._handler is None:
+            return
+        try:
+            await self._handler(room_id, frame)
+        except Exception as e:
+            logger.exception(f"Error delivering message to room {room_id}: {e}")
+
+    async def _dispatch_event(self, frame: str) -> None:
+        if self._event_handler is None:
+            return
+        try:
+            await self._event_handler(frame)
+        except Exception as e:
+            logger.exception(f"Error handling broker event: {e}")
+
+
+class InMemoryRoomBroker(RoomBroker):
+    """Single-process broker: publishing delivers straight to the local handler."""
+
+    async def publish(self, room_id: str, frame: str) -> None:
+        await self._dispatch(room_id, frame)
+
+
+class RedisRoomBroker(RoomBroker):
+    """
+    Multi-process broker over the Redis pub/sub protocol. Any Redis-compatible
+    server works, including a local stand-in. Each worker subscribes only to the
+    rooms it has local connections for, and receives its own publishes back.
+    """
+
+    def __init__(self, url: str, channel_prefix: str = "chat:room:", event_channel: str = "chat:events"):
+        super().__init__()
+        import redis.asyncio as redis
+
+        self.channel_prefix = channel_prefix
+        self.event_channel = event_channel
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._listener: Optional[asyncio.Task] = None
+
+    def _channel(self, room_id: str) -> str:
+        return f"{self.channel_prefix}{room_id}"
+
+    async def subscribe(self, room_id: str) -> None:
+        await self._pubsub.subscribe(self._channel(room_id))
+        self._ensure_listener()
+
+    async def start(self) -> None:
+        await self._pubsub.subscribe(self.event_channel)
+        self._ensure_listener()
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, room_id: str) -> None:
+        await self._pubsub.unsubscribe(self._channel(room_id))
+
+    async def publish(self, room_id: str, frame: str) -> None:
+        await self._redis.publish(self._channel(room_id), frame)
+
+    async def publish_event(self, frame: str) -> None:
+        await self._redis.publish(self.event_channel, frame)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Room broker listener error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode("utf-8")
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            if channel == self.event_channel:
+                await self._dispatch_event(data)
+                continue
+            room_id = channel[len(self.channel_prefix):]
+            await self._dispatch(room_id, data)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        await self._pubsub.close()
+        await self._redis.close()
+
+
+def create_room_broker(backend: Optional[str] = None) -> RoomBroker:
+    backend = (backend or settings.ROOM_BROKER).lower()
+    if backend == "memory":
+        return InMemoryRoomBroker()
+    if backend == "redis":
+        return RedisRoomBroker(settings.REDIS_URL)
+    raise ValueError(f"Unknown room broker backend: {backend}")
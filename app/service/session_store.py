@@ -0,0 +1,283 @@
+# Session backends: which access tokens are live and which have been revoked
+import asyncio
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.domain.auth import Session
+from app.settings import settings
+from app.utils import loggerutil, tokenutil
+
+logger = loggerutil.get_logger(__name__)
+
+
+class SessionStore:
+    """
+    Tracks issued access tokens. Tokens are keyed by a 16-byte digest rather than the
+    JWT itself. Logging out removes the session and adds the key to a revocation set
+    until the token would have expired anyway, so `is_revoked` is a single lookup.
+
+    Methods are blocking (SQLite file, Redis round trip); call them from async code
+    through run_in_threadpool.
+    """
+
+    def add_session(self, email: str, token: str, expires: datetime) -> None:
+        raise NotImplementedError
+
+    def get_session(self, token: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def remove_session(self, token: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        """Reject a token until `expires_at`, whether or not this store issued it."""
+        raise NotImplementedError
+
+    def is_revoked(self, token: str) -> bool:
+        raise NotImplementedError
+
+    def cleanup_expired(self) -> int:
+        """Drop expired sessions and revocations; returns how many entries were removed."""
+        return 0
+
+    def stats(self) -> dict:
+        return {}
+
+    async def start(self, interval: float = None) -> None:
+        """Start the background sweeper."""
+        interval = interval or settings.SESSION_SWEEP_INTERVAL_SECONDS
+        self._sweeper = asyncio.create_task(self._sweep(interval))
+
+    async def stop(self) -> None:
+        sweeper = getattr(self, "_sweeper", None)
+        if sweeper is not None:
+            sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await asyncio.to_thread(self.cleanup_expired)
+                if removed:
+                    logger.debug(f"Swept {removed} expired session entries")
+            except Exception as e:
+                logger.exception(f"Session sweep failed: {e}")
+
+
+def _session(email: str, token: str, expires_at: float) -> Session:
+    return Session(email=email, expiry=datetime.fromtimestamp(expires_at), access_token=token)
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Single-worker store. A min-heap ordered by expiry lets the sweeper remove expired
+    entries without scanning everything. Superseded heap entries are skipped lazily.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[bytes, Tuple[str, float]] = {}
+        self._revoked: Dict[bytes, float] = {}
+        self._expiry: List[Tuple[float, bytes]] = []
+        self._lock = threading.Lock()
+
+    def add_session(self, email: str, token: str, expires: datetime) -> None:
+        key = tokenutil.token_key(token)
+        expires_at = expires.timestamp()
+        with self._lock:
+            self._sessions[key] = (email, expires_at)
+            heapq.heappush(self._expiry, (expires_at, key))
+
+    def get_session(self, token: str) -> Optional[Session]:
+        key = tokenutil.token_key(token)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._sessions[key]
+                return None
+        return _session(entry[0], token, entry[1])
+
+    def remove_session(self, token: str) -> Optional[Session]:
+        key = tokenutil.token_key(token)
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+            if entry is None:
+                return None
+            self._revoked[key] = entry[1]
+        return _session(entry[0], token, entry[1])
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        key = tokenutil.token_key(token)
+        with self._lock:
+            self._revoked[key] = expires_at
+            heapq.heappush(self._expiry, (expires_at, key))
+
+    def is_revoked(self, token: str) -> bool:
+        return tokenutil.token_key(token) in self._revoked
+
+    def cleanup_expired(self) -> int:
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expiry)
+                entry = self._sessions.get(key)
+                if entry is not None and entry[1] == expires_at:
+                    del self._sessions[key]
+                    removed += 1
+                if self._revoked.get(key) == expires_at:
+                    del self._revoked[key]
+                    removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self._sessions), "revoked": len(self._revoked)}
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Store shared by every worker on one host through a SQLite file in WAL mode. Each
+    thread keeps its own connection; lookups are primary-key reads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS sessions (token_key BLOB PRIMARY KEY, email TEXT NOT NULL, expires_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);"
+            "CREATE TABLE IF NOT EXISTS revoked_tokens (token_key BLOB PRIMARY KEY, expires_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens (expires_at);"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_session(self, email: str, token: str, expires: datetime) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (token_key, email, expires_at) VALUES (?, ?, ?)",
+            (tokenutil.token_key(token), email, expires.timestamp()))
+
+    def get_session(self, token: str) -> Optional[Session]:
+        row = self._conn().execute(
+            "SELECT email, expires_at FROM sessions WHERE token_key = ? AND expires_at > ?",
+            (tokenutil.token_key(token), time.time())).fetchone()
+        return _session(row[0], token, row[1]) if row else None
+
+    def remove_session(self, token: str) -> Optional[Session]:
+        key = tokenutil.token_key(token)
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT email, expires_at FROM sessions WHERE token_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM sessions WHERE token_key = ?", (key,))
+            conn.execute("INSERT OR REPLACE INTO revoked_tokens (token_key, expires_at) VALUES (?, ?)", (key, row[1]))
+        return _session(row[0], token, row[1])
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        self._conn().execute("INSERT OR REPLACE INTO revoked_tokens (token_key, expires_at) VALUES (?, ?)",
+                             (tokenutil.token_key(token), expires_at))
+
+    def is_revoked(self, token: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM revoked_tokens WHERE token_key = ?", (tokenutil.token_key(token),)).fetchone() is not None
+
+    def cleanup_expired(self) -> int:
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+            removed += conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,)).rowcount
+        return removed
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        return {
+            "backend": "sqlite",
+            "sessions": conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "revoked": conn.execute("SELECT COUNT(*) FROM revoked_tokens").fetchone()[0],
+        }
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store shared across hosts over the Redis protocol. Keys carry the token's
+    remaining lifetime as their TTL, so the server expires them and no sweep is needed.
+    """
+
+    def __init__(self, url: str, prefix: str = "chat:"):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def _key(self, kind: str, token: str) -> str:
+        return f"{self.prefix}{kind}:{tokenutil.token_key(token).hex()}"
+
+    def add_session(self, email: str, token: str, expires: datetime) -> None:
+        ttl = int(expires.timestamp() - time.time())
+        if ttl > 0:
+            self._redis.set(self._key("session", token), f"{expires.timestamp()}|{email}", ex=ttl)
+
+    def get_session(self, token: str) -> Optional[Session]:
+        value = self._redis.get(self._key("session", token))
+        if value is None:
+            return None
+        expires_at, email = value.decode("utf-8").split("|", 1)
+        return _session(email, token, float(expires_at))
+
+    def remove_session(self, token: str) -> Optional[Session]:
+        pipe = self._redis.pipeline()
+        pipe.get(self._key("session", token))
+        pipe.delete(self._key("session", token))
+        value, _ = pipe.execute()
+        if value is None:
+            return None
+        expires_at, email = value.decode("utf-8").split("|", 1)
+        self.revoke(token, float(expires_at))
+        return _session(email, token, float(expires_at))
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        ttl = int(expires_at - time.time()) + 1
+        if ttl > 0:
+            self._redis.set(self._key("revoked", token), b"1", ex=ttl)
+
+    def is_revoked(self, token: str) -> bool:
+        return bool(self._redis.exists(self._key("revoked", token)))
+
+    async def start(self, interval: float = None) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+def create_session_store(backend: Optional[str] = None) -> SessionStore:
+    backend = (backend or settings.SESSION_BACKEND).lower()
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore(settings.SESSION_SQLITE_PATH or os.path.join(settings.TEMP_DIRECTORY, "chatapp_sessions.db"))
+    if backend == "redis":
+        return RedisSessionStore(settings.REDIS_URL)
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+session_store = create_session_store()
@@ -0,0 +1,153 @@
+# Distinct active users per room and day, kept as mergeable HyperLogLog sketches
+#
+#   python -m app.service.sketch_service backfill [--days N]    merge sketches rebuilt from raw messages
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.repo.analytics_repo import DAY, day_start
+from app.repo.datasource import AsyncDataSource, DataSource
+from app.repo.sketch_repo import AsyncSketchRepo, SketchRepo
+from app.settings import settings
+from app.utils import loggerutil
+from app.utils.hllutil import DEFAULT_PRECISION, HyperLogLog
+
+logger = loggerutil.get_logger(__name__)
+
+
+class ActiveUserSketches:
+    """
+    Every message adds its author to the (room, UTC day) sketch in this worker's
+    memory, which only changes when the author is new to a register. Changed sketches
+    are merged into the shared rows every `flush_interval_seconds`. Merging is a
+    register-wise max, so flushes from any number of workers combine exactly, and a
+    failed flush is simply retried.
+    """
+
+    def __init__(self, db: AsyncDataSource, sketch_repo: AsyncSketchRepo, flush_interval_seconds: float = None):
+        self.db = db
+        self.sketch_repo = sketch_repo
+        self.flush_interval = flush_interval_seconds or settings.SKETCH_FLUSH_INTERVAL_SECONDS
+        self._pending: Dict[Tuple[str, date], HyperLogLog] = {}
+        self._seen: Dict[Tuple[str, date], HyperLogLog] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def record(self, room_id: str, user_id: str, created_at: Optional[datetime] = None) -> None:
+        created_at = created_at or datetime.now(timezone.utc)
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        key = (str(room_id), created_at.date())
+        # `_seen` remembers what this worker already sent today so repeat posters cost one hash
+        seen = self._seen.get(key)
+        if seen is None:
+            seen = self._seen[key] = HyperLogLog()
+        if seen.add(str(user_id)):
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = HyperLogLog()
+            pending.add(str(user_id))
+
+    async def flush(self) -> None:
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            self._forget_old_days()
+            if not pending:
+                return
+            session = self.db.get_session()
+            try:
+                for (room_id, day), sketch in sorted(pending.items()):
+                    row = await self.sketch_repo.get_for_update(session, room_id, day, bytes(sketch.m))
+                    row.registers = HyperLogLog.from_bytes(row.registers).merge(sketch).to_bytes()
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                for key, sketch in pending.items():
+                    self._pending[key] = self._pending[key].merge(sketch) if key in self._pending else sketch
+                logger.exception(f"Failed to flush {len(pending)} user sketches: {e}")
+            finally:
+                await self.db.close_session(session)
+
+    def _forget_old_days(self) -> None:
+        yesterday = datetime.now(timezone.utc).date() - DAY
+        for key in [key for key in self._seen if key[1] < yesterday]:
+            del self._seen[key]
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {"pending_sketches": len(self._pending), "tracked_room_days": len(self._seen)}
+
+
+def estimate_distinct_users(db: Session, sketch_repo: SketchRepo, first_day: date, last_day: date,
+                            room_ids: Optional[List[str]] = None, per_room: bool = False) -> dict:
+    """Merge the sketches of the given rooms (all rooms by default) over [first_day, last_day]."""
+    merged = HyperLogLog()
+    rooms: Dict[str, HyperLogLog] = {}
+    for room_id, _, registers in sketch_repo.get_sketches(db, first_day, last_day, room_ids):
+        merged.merge_registers(registers)
+        if per_room:
+            rooms.setdefault(room_id, HyperLogLog()).merge_registers(registers)
+    result = {
+        "first_day": first_day.isoformat(),
+        "last_day": last_day.isoformat(),
+        "distinct_users": merged.count(),
+        "relative_error": round(merged.relative_error, 4),
+        "precision": DEFAULT_PRECISION,
+    }
+    if per_room:
+        result["rooms"] = {room_id: sketch.count() for room_id, sketch in rooms.items()}
+    return result
+
+
+def backfill(db: Session, sketch_repo: SketchRepo, day: date) -> int:
+    """
+    Rebuild one day's sketches from raw messages and merge them into the stored rows;
+    returns the number of rooms. Merging keeps what live workers recorded for the day
+    and the sketches of months whose messages were dropped by retention.
+    """
+    sketches: Dict[str, HyperLogLog] = {}
+    for room_id, user_id in sketch_repo.room_day_users(db, day_start(day), day_start(day + DAY)):
+        sketches.setdefault(room_id, HyperLogLog()).add(str(user_id))
+    sketch_repo.merge_day(db, day, {room_id: sketch.to_bytes() for room_id, sketch in sketches.items()})
+    return len(sketches)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the per-room daily active user sketches")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("backfill", help="merge sketches rebuilt from raw messages")
+    command.add_argument("--days", type=int, default=30, help="number of most recent days to rebuild")
+    args = parser.parse_args()
+
+    db = DataSource()
+    session = db.get_session()
+    try:
+        today = datetime.now(timezone.utc).date()
+        for offset in range(args.days, -1, -1):
+            day = today - timedelta(days=offset)
+            print(f"{day}: {backfill(session, SketchRepo(), day)} room(s)")
+    finally:
+        db.close_session(session)
+
+
+active_user_sketches = ActiveUserSketches(AsyncDataSource(), AsyncSketchRepo())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Message counts per time bucket for the admin traffic curves
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.repo.analytics_repo import BUCKET_WIDTHS, AnalyticsRepo
+from app.settings import settings
+from app.utils.cacheutil import TTLCache
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Range used when the caller gives no start
+DEFAULT_SPANS = {"minute": timedelta(hours=1), "hour": timedelta(days=1), "day": timedelta(days=30)}
+
+
+def floor_bucket(value: datetime, width: timedelta) -> datetime:
+    return _EPOCH + width * ((value - _EPOCH) // width)
+
+
+class TimeseriesService:
+    """
+    Dense per-bucket message counts. Counts of closed buckets (ended more than
+    `close_grace_seconds` ago) never change, so they are cached per bucket and only
+    the uncached tail of a range, normally just the open buckets, goes to the
+    database. Missing buckets come back as zeros.
+    """
+
+    def __init__(self, analytics_repo: AnalyticsRepo, max_buckets: int = None, cache_size: int = None,
+                 close_grace_seconds: float = None):
+        self.analytics_repo = analytics_repo
+        self.max_buckets = max_buckets or settings.TIMESERIES_MAX_BUCKETS
+        self.close_grace = timedelta(seconds=close_grace_seconds if close_grace_seconds is not None
+                                     else settings.TIMESERIES_CLOSE_GRACE_SECONDS)
+        self._closed = TTLCache(cache_size or settings.TIMESERIES_CACHE_MAX_SIZE, settings.TIMESERIES_CACHE_TTL_SECONDS)
+
+    def series(self, db: Session, bucket: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               group_by: Optional[str] = None, room_id: Optional[str] = None, user_id: Optional[str] = None) -> dict:
+        """Raises ValueError for an unknown bucket or a range with too many buckets."""
+        if bucket not in BUCKET_WIDTHS:
+            raise ValueError(f"Unknown bucket: {bucket}")
+        width = BUCKET_WIDTHS[bucket]
+        now = datetime.now(timezone.utc)
+        end = _utc(end) or now
+        start = _utc(start) or end - DEFAULT_SPANS[bucket]
+        first = floor_bucket(start, width)
+        count = max(0, -(-(end - first) // width))
+        if count > self.max_buckets:
+            raise ValueError(f"Range spans {count} {bucket} buckets; at most {self.max_buckets} are allowed")
+        starts = [first + width * i for i in range(count)]
+
+        scope = (bucket, group_by, room_id, user_id)
+        per_bucket: List[Optional[Dict]] = [self._closed.get(scope + (s,)) for s in starts]
+        missing = next((i for i, counts in enumerate(per_bucket) if counts is None), count)
+        if missing < count:
+            fetched: List[Dict] = [{} for _ in range(count - missing)]
+            rows = self.analytics_repo.bucket_counts(db, bucket, starts[missing], first + width * count,
+                                                     group_by=group_by, room_id=room_id, user_id=user_id)
+            for bucket_start, key, message_count in rows:
+                index = (bucket_start - starts[missing]) // width
+                if 0 <= index < len(fetched):
+                    fetched[index][key] = message_count
+            closed_before = now - self.close_grace
+            for offset, counts in enumerate(fetched):
+                i = missing + offset
+                per_bucket[i] = counts
+                if starts[i] + width <= closed_before:
+                    self._closed.set(scope + (starts[i],), counts)
+
+        # One dense array per key, zero where a bucket had no messages
+        series: Dict[Optional[str], List[int]] = {}
+        for i, counts in enumerate(per_bucket):
+            for key, message_count in counts.items():
+                series.setdefault(key, [0] * count)[i] = message_count
+        return {
+            "bucket": bucket,
+            "start": first.isoformat(),
+            "end": (first + width * count).isoformat(),
+            "buckets": [s.isoformat() for s in starts],
+            "series": [{"key": key if key is not None else "all", "counts": counts} for key, counts in
+                       sorted(series.items(), key=lambda item: -sum(item[1]))],
+        }
+
+    def stats(self) -> dict:
+        return self._closed.stats()
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
@@ -0,0 +1,168 @@
+# Bulk user provisioning from CSV or NDJSON uploads
+import csv
+import io
+import uuid
+from typing import AsyncIterator, Dict, IO, Iterator, List, Optional, Set
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.repo.user_repo import UserRepo
+from app.service.hashing_service import HashingService, hashing_service
+from app.settings import settings
+from app.utils import jsonutil, loggerutil
+from app.utils.strutil import generate_unique_username, generate_username_from_name, is_empty
+
+logger = loggerutil.get_logger(__name__)
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+ROLES = ("user", "admin", "business")
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+FAILED = "failed"
+
+
+def read_rows(file: IO[bytes], format: str) -> Iterator[dict]:
+    """Parse an uploaded file lazily, one dict per row. Unparseable NDJSON lines yield {"_error": ...}."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if format == CSV:
+        for row in csv.DictReader(text):
+            yield {key.strip(): value for key, value in row.items() if key}
+        return
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            row = jsonutil.loads(line)
+        except Exception as e:
+            yield {"_error": f"Invalid JSON: {e}"}
+            continue
+        yield row if isinstance(row, dict) else {"_error": "Expected a JSON object"}
+
+
+class UserImportService:
+    """
+    Creates users in batches. Each batch is checked for duplicate emails and usernames
+    with one query each, has its passwords hashed in parallel on the hashing pool, and
+    is inserted with a single executemany. A result is produced for every input row.
+    """
+
+    def __init__(self, user_repo: UserRepo, hasher: HashingService = hashing_service, batch_size: int = None):
+        self.user_repo = user_repo
+        self.hasher = hasher
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+
+    async def import_rows(self, rows: Iterator[dict]) -> AsyncIterator[dict]:
+        """Yields one result per row in input order, then a summary."""
+        totals = {CREATED: 0, DUPLICATE: 0, INVALID: 0, FAILED: 0}
+        seen_emails: Set[str] = set()
+        number = 0
+        while True:
+            batch = await run_in_threadpool(_take, rows, self.batch_size)
+            if not batch:
+                break
+            results = await self._import_batch(list(enumerate(batch, start=number + 1)), seen_emails)
+            number += len(batch)
+            for result in results:
+                totals[result["status"]] += 1
+                yield result
+        yield {"summary": {"rows": number, **totals}}
+
+    async def _import_batch(self, batch: List[tuple], seen_emails: Set[str]) -> List[dict]:
+        results: Dict[int, dict] = {}
+        candidates = []
+        for number, row in batch:
+            error = _validate(row)
+            email = str(row.get("email") or "").strip().lower()
+            if error:
+                results[number] = _result(number, email, INVALID, error=error)
+            elif email in seen_emails:
+                results[number] = _result(number, email, DUPLICATE, error="Email repeated in this import")
+            else:
+                seen_emails.add(email)
+                candidates.append((number, row, email))
+
+        existing = await run_in_threadpool(self.user_repo.existing_emails, [email for _, _, email in candidates])
+        requested = [str(row["username"]).strip() for _, row, _ in candidates if not is_empty(row.get("username"))]
+        taken = await run_in_threadpool(self.user_repo.existing_usernames, requested)
+        bases = {number: generate_username_from_name(str(row.get("full_name"))) or
+                 generate_username_from_name(email.split("@")[0]) or "user"
+                 for number, row, email in candidates if is_empty(row.get("username"))}
+        taken |= await run_in_threadpool(self.user_repo.get_usernames_with_prefixes, bases.values())
+
+        accepted = []
+        for number, row, email in candidates:
+            if email in existing:
+                results[number] = _result(number, email, DUPLICATE, error="User already exists")
+                continue
+            if number in bases:
+                username = generate_unique_username(bases[number], taken)
+            else:
+                username = str(row["username"]).strip()
+                if username in taken:
+                    results[number] = _result(number, email, DUPLICATE, error="Username already taken")
+                    continue
+            taken.add(username)
+            accepted.append((number, row, email, username))
+
+        hashes = await self.hasher.hash_many([str(row["password"]) for _, row, _, _ in accepted])
+        records = [{
+            "id": str(uuid.uuid4()),
+            "username": username,
+            "email": email,
+            "password": password_hash,
+            "role": str(row.get("role") or "user"),
+            "full_name": str(row["full_name"]).strip(),
+            "phone": row.get("phone") or None,
+            "profile_pic_url": row.get("profile_pic_url") or None,
+        } for (_, row, email, username), password_hash in zip(accepted, hashes)]
+        for (number, _, email, _), record in zip(accepted, records):
+            results[number] = _result(number, email, CREATED, id=record["id"], username=record["username"])
+
+        try:
+            await run_in_threadpool(self.user_repo.bulk_insert, records)
+        except IntegrityError:
+            # A concurrent signup took an email or username: insert one by one to find which
+            for (number, _, email, _), record in zip(accepted, records):
+                try:
+                    await run_in_threadpool(self.user_repo.bulk_insert, [record])
+                except IntegrityError:
+                    results[number] = _result(number, email, DUPLICATE, error="User already exists")
+                except Exception as e:
+                    logger.exception(f"Failed to insert imported user on row {number}: {e}")
+                    results[number] = _result(number, email, FAILED, error="Database error")
+        except Exception as e:
+            logger.exception(f"Failed to insert a batch of {len(records)} users: {e}")
+            for number, _, email, _ in accepted:
+                results[number] = _result(number, email, FAILED, error="Database error")
+        return [results[number] for number, _ in batch]
+
+
+def _take(rows: Iterator[dict], count: int) -> List[dict]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= count:
+            break
+    return batch
+
+
+def _validate(row: dict) -> Optional[str]:
+    if "_error" in row:
+        return row["_error"]
+    for field in ("email", "full_name", "password"):
+        if is_empty(None if row.get(field) is None else str(row.get(field))):
+            return f"{field} is required"
+    if "@" not in str(row["email"]):
+        return "Invalid email"
+    if row.get("role") and row["role"] not in ROLES:
+        return f"role must be one of {', '.join(ROLES)}"
+    return None
+
+
+def _result(row: int, email: str, status: str, **fields) -> dict:
+    return {"row": row, "email": email, "status": status, **fields}
@@ -7,11 +7,12 @@ from app.domain.user_req_res import (
     UpdateUserPasswordRequest, UpdateUserPasswordResponse, 
     ListUserRequest
 )
+from starlette.concurrency import run_in_threadpool
 from app.repo.user_repo import UserRepo
 from app.service.auth_service import AuthService
+from app.service.hashing_service import hashing_service
 from app.utils import loggerutil
-from app.utils.hashing import Hash
-from app.utils.strutil import is_empty
+from app.utils.strutil import generate_username_from_name, is_empty
 from app.domain.user import User
 from app.mapper.user_mapper import user_mapper
 
@@ -21,7 +22,7 @@ class UserService:
         self.user_repo = user_repo
         self.logger = loggerutil.get_logger(self.__class__.__name__)
 
-    def create_user(self, req: CreateUserRequest) -> CreateUserResponse:
+    async def create_user(self, req: CreateUserRequest) -> CreateUserResponse:
         self.logger.debug("Creating new user")
         if not req.user:
             return CreateUserResponse(error=True, msg="User data is required")
@@ -31,13 +32,26 @@ class UserService:
             return CreateUserResponse(error=True, msg="Email is required")
         if is_empty(req.user.full_name):
             return CreateUserResponse(error=True, msg="Full name is required")
-        existing_user = self.user_repo.get_user_by_email(req.user.email)
+        # Repo calls are blocking: keep them off the event loop
+        existing_user = await run_in_threadpool(self.user_repo.get_user_by_email, req.user.email)
         if existing_user:
             return CreateUserResponse(error=True, msg="User already exists")
         user_dict = req.user.dict()
         user_role = user_dict.get('role', 'user')
-        user_record = user_mapper.map_user_create_to_user_record(user_dict, req.password, role=user_role)
-        created_user = self.user_repo.add_user_record(user_record)
+        requested_username = user_dict.get('username')
+        if not is_empty(requested_username) and \
+                await run_in_threadpool(self.user_repo.is_username_taken, requested_username):
+            return CreateUserResponse(error=True, msg="Username already taken")
+        user_record = user_mapper.map_user_create_to_user_record(
+            user_dict, await hashing_service.hash(req.password), role=user_role)
+        if not is_empty(requested_username):
+            created_user = await run_in_threadpool(self.user_repo.add_user_record, user_record)
+        else:
+            # No username given: derive one from the name, adding a suffix if it is taken
+            base_username = generate_username_from_name(req.user.full_name) \
+                or generate_username_from_name(req.user.email.split("@")[0]) or "user"
+            created_user = await run_in_threadpool(
+                self.user_repo.add_user_record_with_unique_username, user_record, base_username)
         return CreateUserResponse(error=False, user=created_user)
 
     def list_users(self, req: ListUserRequest, authorization: str) -> ListUserResponse:
@@ -75,15 +89,15 @@ class UserService:
         updated_user = self.user_repo.update_user(req.id, req.user)
         return UpdateUserResponse(error=False, user=updated_user)
 
-    def update_user_password(self, user_id: str, req: UpdateUserPasswordRequest) -> UpdateUserPasswordResponse:
-        user_record = self.user_repo.get_user_record_by_id(user_id)
+    async def update_user_password(self, user_id: str, req: UpdateUserPasswordRequest) -> UpdateUserPasswordResponse:
+        user_record = await run_in_threadpool(self.user_repo.get_user_record_by_id, user_id, True)
         if not user_record:
             return UpdateUserPasswordResponse(success=False, msg="User not found")
         password_hash = str(user_record.password) if user_record.password is not None else None
-        if not password_hash or not Hash.verify(req.old_password, password_hash):
+        if not password_hash or not await hashing_service.verify(req.old_password, password_hash):
             return UpdateUserPasswordResponse(success=False, msg="Old password is incorrect")
         if req.new_password != req.confirm_password:
             return UpdateUserPasswordResponse(success=False, msg="Passwords do not match")
-        hashed_new_password = Hash.hash(req.new_password)
-        self.user_repo.update_user_password(user_id, hashed_new_password)
+        hashed_new_password = await hashing_service.hash(req.new_password)
+        await run_in_threadpool(self.user_repo.update_user_password, user_id, hashed_new_password)
         return UpdateUserPasswordResponse(success=True, msg="Password updated successfully")
\ No newline at end of file
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Set
+from typing import List, Set
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
 
@@ -8,6 +8,10 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
 class Settings:
     def __init__(self):
         # Required fields
@@ -34,13 +38,95 @@ class Settings:
         self.DATABASE_NAME: str = self._get_env("DATABASE_NAME", "chatapp")
         self.CHUNK_SIZE: int = int(self._get_env("CHUNK_SIZE", 512))
         self.DATABASE_PASSWORD_ENCODED: str = quote_plus(self.DATABASE_PASSWORD)
-        self.ASYNC_DATABASE_URL: str = (
+        self.ASYNC_DATABASE_URL: str = self._get_env(
+            "ASYNC_DATABASE_URL",
             f"postgresql+asyncpg://{self.DATABASE_USER}:{self.DATABASE_PASSWORD_ENCODED}@"
             f"{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
         )
+        # Read replicas (comma-separated, sync and async URLs); READ-intent sessions are spread over the healthy ones
+        self.DATABASE_REPLICA_URLS: List[str] = _split(self._get_env("DATABASE_REPLICA_URLS", ""))
+        self.ASYNC_DATABASE_REPLICA_URLS: List[str] = _split(self._get_env("ASYNC_DATABASE_REPLICA_URLS", ""))
+        # A user's reads stay on the primary this long after they write; failed replicas are retried after this
+        self.READ_YOUR_WRITES_SECONDS: float = float(self._get_env("READ_YOUR_WRITES_SECONDS", 5))
+        self.REPLICA_RETRY_SECONDS: float = float(self._get_env("REPLICA_RETRY_SECONDS", 30))
+        self.REPLICA_HEALTH_CHECK_INTERVAL_SECONDS: float = float(self._get_env("REPLICA_HEALTH_CHECK_INTERVAL_SECONDS", 10))
         self.ALLOW_ORIGINS: Set[str] = set(self._get_env("ALLOW_ORIGINS", "*").split(","))
         self.FRONTEND_URL: str = self._get_env("FRONTEND_URL", "http://localhost:3000")
 
+        # Cache of user records for authenticated requests (updates and deletes invalidate it)
+        self.USER_CACHE_MAX_SIZE: int = int(self._get_env("USER_CACHE_MAX_SIZE", 10000))
+        self.USER_CACHE_TTL_SECONDS: float = float(self._get_env("USER_CACHE_TTL_SECONDS", 60))
+
+        # Cache of verified JWT claims; entries also expire at the token's exp
+        self.TOKEN_CACHE_MAX_SIZE: int = int(self._get_env("TOKEN_CACHE_MAX_SIZE", 50000))
+        self.TOKEN_CACHE_MAX_TTL_SECONDS: float = float(self._get_env("TOKEN_CACHE_MAX_TTL_SECONDS", 3600))
+
+        # Password hashing: bcrypt work factor (older hashes are upgraded on login) and process pool limits
+        self.BCRYPT_ROUNDS: int = int(self._get_env("BCRYPT_ROUNDS", 12))
+        self.HASH_POOL_WORKERS: int = int(self._get_env("HASH_POOL_WORKERS", os.cpu_count() or 1))
+        self.HASH_POOL_MAX_PENDING: int = int(self._get_env("HASH_POOL_MAX_PENDING", 64))
+
+        # Sessions: "memory" (single worker), "sqlite" (workers on one host) or "redis" (shared)
+        self.SESSION_BACKEND: str = self._get_env("SESSION_BACKEND", "memory")
+        self.SESSION_SQLITE_PATH: str = self._get_env("SESSION_SQLITE_PATH", "")
+        self.SESSION_SWEEP_INTERVAL_SECONDS: float = float(self._get_env("SESSION_SWEEP_INTERVAL_SECONDS", 60))
+
+        # Daily analytics rollups: compaction interval, and how long after midnight (UTC) a day is closed.
+        # Messages that journal recovery inserts after that are re-rolled at startup. Deleted messages
+        # are not: run `python -m app.service.rollup_service check --repair` after deleting any.
+        self.ROLLUP_ENABLED: bool = self._get_env("ROLLUP_ENABLED", "True").lower() == "true"
+        self.ROLLUP_INTERVAL_SECONDS: float = float(self._get_env("ROLLUP_INTERVAL_SECONDS", 300))
+        self.ROLLUP_GRACE_SECONDS: float = float(self._get_env("ROLLUP_GRACE_SECONDS", 300))
+
+        # Monthly message partitions (Postgres): months created ahead, retention (0 = keep forever), check interval
+        self.MESSAGE_PARTITION_PREMAKE_MONTHS: int = int(self._get_env("MESSAGE_PARTITION_PREMAKE_MONTHS", 3))
+        self.MESSAGE_RETENTION_DAYS: int = int(self._get_env("MESSAGE_RETENTION_DAYS", 0))
+        self.MESSAGE_PARTITION_INTERVAL_SECONDS: float = float(self._get_env("MESSAGE_PARTITION_INTERVAL_SECONDS", 3600))
+
+        # Timeseries: max buckets per request, and caching of buckets closed for longer than the grace period
+        self.TIMESERIES_MAX_BUCKETS: int = int(self._get_env("TIMESERIES_MAX_BUCKETS", 10000))
+        self.TIMESERIES_CACHE_MAX_SIZE: int = int(self._get_env("TIMESERIES_CACHE_MAX_SIZE", 100000))
+        self.TIMESERIES_CACHE_TTL_SECONDS: float = float(self._get_env("TIMESERIES_CACHE_TTL_SECONDS", 86400))
+        self.TIMESERIES_CLOSE_GRACE_SECONDS: float = float(self._get_env("TIMESERIES_CLOSE_GRACE_SECONDS", 60))
+
+        # How often each worker merges its active-user sketches into the shared per-room daily rows
+        self.SKETCH_FLUSH_INTERVAL_SECONDS: float = float(self._get_env("SKETCH_FLUSH_INTERVAL_SECONDS", 5))
+
+        # Rows fetched from the server-side cursor and written per chunk by streaming exports
+        self.EXPORT_CHUNK_ROWS: int = int(self._get_env("EXPORT_CHUNK_ROWS", 1000))
+
+        # Rows validated, hashed and inserted together by the admin user import
+        self.USER_IMPORT_BATCH_SIZE: int = int(self._get_env("USER_IMPORT_BATCH_SIZE", 500))
+
+        # Room fan-out: "memory" (single worker) or "redis" (any Redis-protocol server, multi-worker)
+        self.ROOM_BROKER: str = self._get_env("ROOM_BROKER", "memory")
+        self.REDIS_URL: str = self._get_env("REDIS_URL", "redis://localhost:6379/0")
+        # Per-connection send queue; overflow policy is one of drop_oldest, disconnect, coalesce
+        self.WS_SEND_QUEUE_SIZE: int = int(self._get_env("WS_SEND_QUEUE_SIZE", 256))
+        self.WS_OVERFLOW_POLICY: str = self._get_env("WS_OVERFLOW_POLICY", "drop_oldest")
+        self.WS_SEND_TIMEOUT_SECONDS: float = float(self._get_env("WS_SEND_TIMEOUT_SECONDS", 10))
+        # Most messages one coalesced frame may carry; the oldest past it are dropped
+        self.WS_COALESCE_MAX_MESSAGES: int = int(self._get_env("WS_COALESCE_MAX_MESSAGES", 1000))
+        # History replayed on WS join: default/max depth (?history=N) and messages per frame
+        self.WS_HISTORY_DEFAULT: int = int(self._get_env("WS_HISTORY_DEFAULT", 50))
+        self.WS_HISTORY_MAX: int = int(self._get_env("WS_HISTORY_MAX", 500))
+        self.WS_HISTORY_CHUNK_SIZE: int = int(self._get_env("WS_HISTORY_CHUNK_SIZE", 100))
+        # Per-room ring buffer of recent messages (history replay and first-page listing)
+        self.MESSAGE_CACHE_ROOM_CAPACITY: int = int(self._get_env("MESSAGE_CACHE_ROOM_CAPACITY", 100))
+        self.MESSAGE_CACHE_MAX_ROOMS: int = int(self._get_env("MESSAGE_CACHE_MAX_ROOMS", 10000))
+        self.MESSAGE_CACHE_MAX_BYTES: int = int(self._get_env("MESSAGE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        # Re-seed from the database after this many seconds (0 = never); bounds staleness across workers
+        self.MESSAGE_CACHE_TTL_SECONDS: float = float(self._get_env("MESSAGE_CACHE_TTL_SECONDS", 0))
+        # WebSocket message persistence: "sync" (commit before broadcast) or "write_behind" (batched)
+        self.MESSAGE_WRITE_MODE: str = self._get_env("MESSAGE_WRITE_MODE", "sync")
+        self.MESSAGE_BATCH_SIZE: int = int(self._get_env("MESSAGE_BATCH_SIZE", 200))
+        self.MESSAGE_FLUSH_INTERVAL_MS: int = int(self._get_env("MESSAGE_FLUSH_INTERVAL_MS", 50))
+        self.MESSAGE_MAX_BUFFERED: int = int(self._get_env("MESSAGE_MAX_BUFFERED", 10000))
+        # Journal for buffered rows, one `<path>.<pid>` file per worker; empty disables it
+        # (buffered rows are lost on a crash)
+        self.MESSAGE_JOURNAL_PATH: str = self._get_env("MESSAGE_JOURNAL_PATH", "")
+        self.MESSAGE_JOURNAL_FSYNC: bool = self._get_env("MESSAGE_JOURNAL_FSYNC", "True").lower() == "true"
+
         # # Test connections
         # print(f"Service running on port: {self.SERVICE_PORT}")
         print(f"Database URL: {self.DATABASE_URL}")
@@ -1,19 +1,16 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from app.repo.datasource import DataSource
+from app.repo.datasource import READ, DataSource
 from app.repo.user_repo import UserRepo
 from app.model.user_record import UserRecord
-import os
-from app.service.auth_service import SECRET_KEY, JWT_ALGORITHM
+from app.service.session_store import session_store
+from app.utils import tokenutil
 
 # Security scheme
 security = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-# JWT Configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
-ALGORITHM = "HS256"
+# Lookups go through the shared user identity cache
+user_repo = UserRepo(DataSource())
 
 def get_db():
     db = DataSource()
@@ -23,10 +20,7 @@ def get_db():
     finally:
         db.close_session(session)
 
-def get_current_user(
-    token: str = Depends(security),
-    db: Session = Depends(get_db)
-) -> UserRecord:
+def get_current_user(token: str = Depends(security)) -> UserRecord:
     """
     Validate JWT token and return current authenticated user
     """
@@ -36,23 +30,32 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Decode JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if not isinstance(email, str) or not email:
-            raise credentials_exception
-    except JWTError:
+    # Verify JWT token (cached after the first check)
+    payload = tokenutil.verify_token(token)
+    if payload is None or session_store.is_revoked(token):
+        raise credentials_exception
+    email = payload.get("sub")
+    if not isinstance(email, str) or not email:
         raise credentials_exception
     
-    # Get user from database
-    user_repo = UserRepo(DataSource())
+    # Get user (cached, so authenticated reads don't cost a round-trip)
     user = user_repo.get_user_by_email(email)
     if user is None:
         raise credentials_exception
     
     return user
 
+def get_read_db(current_user: UserRecord = Depends(get_current_user)):
+    """
+    Session for read-only handlers: served by a replica unless the user wrote recently.
+    """
+    db = DataSource()
+    session = db.get_session(READ, user_id=current_user.id)
+    try:
+        yield session
+    finally:
+        db.close_session(session)
+
 def get_current_active_user(current_user: UserRecord = Depends(get_current_user)) -> UserRecord:
     """
     Ensure user is active (you can add additional checks here)
@@ -0,0 +1,58 @@
+import base64
+from datetime import datetime, timezone
+from typing import Callable, Optional, Sequence
+
+import orjson
+
+BEFORE = "b"
+AFTER = "a"
+
+
+def _direction(value) -> str:
+    if value not in (BEFORE, AFTER):
+        raise ValueError(f"Unknown direction: {value!r}")
+    return value
+
+
+def _timestamp(value) -> datetime:
+    created_at = datetime.fromisoformat(value)
+    # Server-side timestamps are UTC
+    return created_at if created_at.tzinfo is not None else created_at.replace(tzinfo=timezone.utc)
+
+
+def _text(value) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"Expected a string, got {value!r}")
+    return value
+
+
+# Key fields of each cursor, as one converter per field. HISTORY is (direction,
+# created_at, id): whether the page is older (BEFORE) or newer (AFTER) than the
+# position. SEARCH is (rank, created_at, id) of the last hit of a search page.
+HISTORY = (_direction, _timestamp, _text)
+SEARCH = (float, _timestamp, _text)
+
+
+def encode_cursor(*fields) -> str:
+    """Opaque keyset cursor for a position given by its key fields; datetimes are stored as ISO 8601."""
+    raw = orjson.dumps([field.isoformat() if isinstance(field, datetime) else field for field in fields])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: Sequence[Callable] = HISTORY) -> tuple:
+    """
+    Inverse of encode_cursor, converting each key field with the matching entry of
+    `fields`. Raises ValueError for anything that isn't a valid cursor of that shape.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = orjson.loads(raw)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError(f"Expected {len(fields)} key fields")
+        return tuple(convert(value) for convert, value in zip(fields, values))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_cursor(cursor: Optional[str], fields: Sequence[Callable] = HISTORY) -> Optional[tuple]:
+    return decode_cursor(cursor, fields) if cursor else None
@@ -83,3 +83,19 @@ class InvalidSubjectError(InvalidTokenError):
 
 class InvalidJTIError(InvalidTokenError):
     pass
+
+
+class HashingBusyError(Exception):
+    """
+    Raised when the password hashing pool has no room for another job
+    """
+
+    pass
+
+
+class MessageBufferFullError(Exception):
+    """
+    Raised when write-behind persistence is failing and the message buffer is full
+    """
+
+    pass
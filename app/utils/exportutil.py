@@ -0,0 +1,172 @@
+import csv
+import io
+from typing import AsyncIterator, Iterable, Iterator, List, Sequence, Tuple
+
+import anyio
+import orjson
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+CSV = "csv"
+NDJSON = "ndjson"
+ARROW = "arrow"
+PARQUET = "parquet"
+FORMATS = (CSV, NDJSON, ARROW, PARQUET)
+
+MEDIA_TYPES = {
+    CSV: "text/csv",
+    NDJSON: "application/x-ndjson",
+    ARROW: "application/vnd.apache.arrow.stream",
+    PARQUET: "application/vnd.apache.parquet",
+}
+EXTENSIONS = {CSV: "csv", NDJSON: "ndjson", ARROW: "arrows", PARQUET: "parquet"}
+
+# Export columns are (name, kind) with kind one of "string", "int", "timestamp"
+Columns = List[Tuple[str, str]]
+
+_DONE = object()
+
+
+def _close(iterable) -> None:
+    close = getattr(iterable, "close", None)
+    if close is not None:
+        close()
+
+
+def has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def encode(format: str, batches: Iterable[Sequence[dict]], columns: Columns) -> Iterator:
+    """Encode batches of rows in an export format, yielding one chunk per batch."""
+    if format == CSV:
+        return csv_chunks(batches, [name for name, _ in columns])
+    if format == NDJSON:
+        return ndjson_chunks(batches, columns)
+    if format == ARROW:
+        return arrow_chunks(batches, columns)
+    if format == PARQUET:
+        return parquet_chunks(batches, columns)
+    raise ValueError(f"Unknown export format: {format}")
+
+
+def csv_chunks(batches: Iterable[Sequence[dict]], fieldnames: List[str]) -> Iterator[str]:
+    """Encode batches of rows as CSV text, one chunk per batch. The header goes out first."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    try:
+        yield output.getvalue()
+        for batch in batches:
+            output.seek(0)
+            output.truncate(0)
+            writer.writerows(batch)
+            yield output.getvalue()
+    finally:
+        _close(batches)
+
+
+def ndjson_chunks(batches: Iterable[Sequence[dict]], columns: Columns) -> Iterator[bytes]:
+    """One JSON object per line; datetimes are written as RFC 3339 strings."""
+    names = [name for name, _ in columns]
+    try:
+        for batch in batches:
+            yield b"".join(orjson.dumps({name: row[name] for name in names}) + b"\n" for row in batch)
+    finally:
+        _close(batches)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_schema(columns: Columns):
+    import pyarrow as pa
+
+    types = {"string": pa.string(), "int": pa.int64(), "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _record_batch(batch: Sequence[dict], schema):
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array([row[field.name] for row in batch], type=field.type) for field in schema], schema=schema)
+
+
+def arrow_chunks(batches: Iterable[Sequence[dict]], columns: Columns) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema, then one record batch per chunk."""
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    try:
+        with pa.ipc.new_stream(sink, schema) as writer:
+            yield sink.take()
+            for batch in batches:
+                writer.write_batch(_record_batch(batch, schema))
+                yield sink.take()
+        yield sink.take()
+    finally:
+        _close(batches)
+
+
+def parquet_chunks(batches: Iterable[Sequence[dict]], columns: Columns) -> Iterator[bytes]:
+    """Parquet file written one row group per chunk; the footer follows the last one."""
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    try:
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for batch in batches:
+                writer.write_batch(_record_batch(batch, schema))
+                yield sink.take()
+        yield sink.take()
+    finally:
+        _close(batches)
+
+
+async def stream(request: Request, chunks: Iterator) -> AsyncIterator:
+    """
+    Drive a blocking chunk iterator from the threadpool, one chunk at a time. Stops
+    as soon as the client disconnects and closes the iterator in either case, so the
+    database cursor and session behind it are released straight away. The close is
+    shielded: a disconnect cancels the response task, which would otherwise skip it.
+    """
+    try:
+        while not await request.is_disconnected():
+            chunk = await run_in_threadpool(next, chunks, _DONE)
+            if chunk is _DONE:
+                break
+            if chunk:
+                yield chunk
+    finally:
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(chunks.close)
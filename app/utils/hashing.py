@@ -1,14 +1,16 @@
 import bcrypt
 
+DEFAULT_ROUNDS = 12
+
 
 class Hash:
     @staticmethod
-    def hash(password: str) -> str:
+    def hash(password: str, rounds: int = DEFAULT_ROUNDS) -> str:
         """
-        Hash a password with bcrypt.
+        Hash a password with bcrypt using the given work factor.
         """
         pwd_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=rounds)
         hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
         return hashed_password.decode('utf-8')
 
@@ -19,3 +21,17 @@ class Hash:
         """
         password_byte_enc = plain_password.encode('utf-8')
         return bcrypt.checkpw(password=password_byte_enc, hashed_password=hashed_password.encode('utf-8'))
+
+    @staticmethod
+    def rounds(hashed_password: str) -> int:
+        """
+        Work factor a bcrypt hash was created with ("$2b$<rounds>$...").
+        """
+        try:
+            return int(hashed_password.split('$')[2])
+        except (IndexError, ValueError):
+            return 0
+
+    @staticmethod
+    def needs_rehash(hashed_password: str, rounds: int = DEFAULT_ROUNDS) -> bool:
+        return Hash.rounds(hashed_password) != rounds
@@ -0,0 +1,22 @@
+from typing import Any, List
+
+import orjson
+
+
+def dumps(obj: Any) -> str:
+    """Encode to a JSON text frame with orjson."""
+    return orjson.dumps(obj).decode("utf-8")
+
+
+def loads(data) -> Any:
+    return orjson.loads(data)
+
+
+def join_frames(frames: List[str]) -> str:
+    """Combine already-encoded JSON objects into one JSON array without re-encoding them."""
+    return "[" + ",".join(frames) + "]"
+
+
+def batch_frame(frames: List[str]) -> str:
+    """{"type": "batch", "messages": [...]} around already-encoded JSON objects."""
+    return '{"type":"batch","messages":' + join_frames(frames) + "}"
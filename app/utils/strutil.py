@@ -5,7 +5,7 @@
 """
 
 import re
-from typing import Optional
+from typing import Collection, Optional
 
 
 def is_empty(value: Optional[str]) -> bool:
@@ -48,13 +48,14 @@ def generate_username_from_name(full_name: str) -> str:
     return username
 
 
-def generate_unique_username(base_username: str, existing_usernames: list) -> str:
+def generate_unique_username(base_username: str, existing_usernames: Collection[str]) -> str:
     """
     Generate a unique username by adding a suffix if the base username already exists.
     
     Args:
         base_username: The base username to check
-        existing_usernames: List of existing usernames to check against
+        existing_usernames: Taken usernames starting with the base (e.g. from
+            UserRepo.get_usernames_with_prefix), ideally as a set
         
     Returns:
         str: Unique username
@@ -62,6 +63,8 @@ def generate_unique_username(base_username: str, existing_usernames: list) -> st
     if not base_username:
         return ""
     
+    if not isinstance(existing_usernames, (set, frozenset)):
+        existing_usernames = set(existing_usernames)
     username = base_username
     counter = 1
     
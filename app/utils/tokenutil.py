@@ -0,0 +1,65 @@
+import hashlib
+import time
+from typing import Dict, Optional
+
+import jwt
+
+from app.settings import settings
+from app.utils import loggerutil
+from app.utils.cacheutil import TTLCache
+
+SECRET_KEY = settings.SECRET_KEY
+ALGORITHM = settings.ALGORITHM
+
+logger = loggerutil.get_logger(__name__)
+
+# Claims of tokens whose signature already checked out, keyed by a digest of the token
+_verified = TTLCache(settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_CACHE_MAX_TTL_SECONDS)
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def token_key(token: str) -> bytes:
+    """Compact 16-byte identifier for a token, used to track sessions and revocations."""
+    return _digest(token)[:16]
+
+
+def create_token(claims: Dict) -> str:
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_token(token: str) -> Optional[Dict]:
+    """
+    Decode and verify a bearer token, returning its claims or None if it is invalid
+    or expired. Verified claims are cached until the token's `exp`, so repeat calls
+    with the same token skip the HMAC check.
+    """
+    if not token:
+        return None
+    key = _digest(token)
+    claims = _verified.get(key)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        logger.error("Token has expired")
+        return None
+    except jwt.InvalidTokenError as e:
+        logger.error(f"Invalid token: {e}")
+        return None
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        _verified.set(key, claims, ttl_seconds=exp - time.time())
+    return claims
+
+
+def forget_token(token: str) -> None:
+    """Drop a token's cached claims, e.g. on logout."""
+    _verified.pop(_digest(token))
+
+
+def stats() -> dict:
+    return _verified.stats()
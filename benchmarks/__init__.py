@@ -0,0 +1,16 @@
+# Benchmarks for the hot paths in app/. Each one is a standalone script:
+#
+#   python -m benchmarks.bench_broker --help
+#
+# Anything that needs a database uses a throwaway SQLite file in the temp directory
+# unless DATABASE_URL / ASYNC_DATABASE_URL are already set, so point those at a
+# migrated scratch Postgres to measure the production setup. Benchmarks empty the
+# database before seeding it; anything but the SQLite file is only emptied with
+# BENCH_RESET_DATABASE=1.
+import os
+import tempfile
+
+BENCH_DB_PATH = os.path.join(tempfile.gettempdir(), "chatapp_bench.db")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{BENCH_DB_PATH}")
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DB_PATH}")
@@ -0,0 +1,86 @@
+# Admin analytics reports: the old per-entity COUNT loop against the single query
+#
+#   python -m benchmarks.bench_analytics [--messages 1000000] [--rooms 1000] [--users 10000] [--days 90]
+#
+# Seeds the database (see benchmarks/__init__.py), then times messages-per-room and
+# user-activity over all time and over the last 7 days three ways: "N+1" loads every
+# room/user and counts each one separately, as the endpoints used to; "single query"
+# is AnalyticsRepo with no rollups yet, so it counts raw rows; "with rollups" is the
+# same after RollupService.compact(), so whole days come from the daily rollups.
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.model.message_record import MessageRecord
+from app.model.room_record import RoomRecord
+from app.model.user_record import UserRecord
+from app.repo.analytics_repo import AnalyticsRepo
+from app.service.rollup_service import RollupService
+from benchmarks.common import (best_of, bench_database, insert_rows, message_rows, print_table, room_rows,
+                               user_rows)
+
+
+def _count_each(db: Session, records, column, start, end) -> list:
+    result = []
+    for record in db.query(records).all():
+        query = db.query(MessageRecord).filter(column == record.id)
+        if start:
+            query = query.filter(MessageRecord.created_at >= start)
+        if end:
+            query = query.filter(MessageRecord.created_at <= end)
+        result.append((record.id, query.count()))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the admin analytics reports on a seeded dataset")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=90, help="messages are spread over this many days")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    db = bench_database()
+    started = time.perf_counter()
+    insert_rows(db.engine, UserRecord.__table__, user_rows(args.users))
+    insert_rows(db.engine, RoomRecord.__table__, room_rows(args.rooms, "user-00000000"))
+    insert_rows(db.engine, MessageRecord.__table__, message_rows(args.messages, args.rooms, args.users, args.days))
+    print(f"Seeded {args.messages:,} messages in {time.perf_counter() - started:.1f}s")
+
+    repo = AnalyticsRepo()
+    end = datetime.now(timezone.utc)
+    ranges = {"all time": (None, None), "last 7 days": (end - timedelta(days=7), end)}
+    reports = {
+        "messages per room": (RoomRecord, MessageRecord.room_id, repo.messages_per_room),
+        "user activity": (UserRecord, MessageRecord.user_id, repo.user_activity),
+    }
+
+    def measure(fn) -> float:
+        session = db.get_session()
+        try:
+            return best_of(lambda: fn(session), args.repeat)
+        finally:
+            db.close_session(session)
+
+    timings = {}
+    for report, (records, column, single) in reports.items():
+        for label, (start, stop) in ranges.items():
+            timings[report, label] = [
+                measure(lambda session: _count_each(session, records, column, start, stop)),
+                measure(lambda session: single(session, start=start, end=stop)),
+            ]
+    RollupService(db, repo, grace_seconds=0).compact()
+    for report, (records, column, single) in reports.items():
+        for label, (start, stop) in ranges.items():
+            timings[report, label].append(measure(lambda session: single(session, start=start, end=stop)))
+
+    rows = [[report, label, *(seconds * 1000 for seconds in times), times[0] / min(times[1:])]
+            for (report, label), times in timings.items()]
+    print_table(["report", "range", "N+1 ms", "single query ms", "with rollups ms", "best speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Room fan-out across workers: delivery latency and throughput against worker count
+#
+#   python -m benchmarks.bench_broker [--workers 1 2 4 8] [--messages 5000] [--rate 0]
+#                                     [--redis-url redis://localhost:6379/0]
+#
+# One publisher sends --messages frames to a room that every worker process has
+# subscribed to, and each worker records the publish-to-handler latency of every
+# frame it receives. The in-process broker is measured as the one-worker baseline;
+# the Redis broker runs only when a Redis-compatible server answers at --redis-url.
+import argparse
+import asyncio
+import multiprocessing
+import queue
+import time
+import uuid
+from typing import List, Tuple
+
+from app.service.room_broker import InMemoryRoomBroker, RedisRoomBroker, RoomBroker
+from app.settings import settings
+from app.utils import jsonutil
+from benchmarks.common import percentile, print_table
+
+ROOM = "bench"
+# Roughly the size of a chat message frame
+CONTENT = "x" * 200
+WORKER_TIMEOUT_SECONDS = 60.0
+
+
+def _frame(seq: int) -> str:
+    return jsonutil.dumps({"seq": seq, "sent": time.time(), "content": CONTENT})
+
+
+async def _publish(broker: RoomBroker, messages: int, rate: float) -> float:
+    """Publish the frames (at `rate` per second, or flat out when 0) and return the start time."""
+    interval = 1.0 / rate if rate else 0.0
+    started = time.time()
+    for seq in range(messages):
+        await broker.publish(ROOM, _frame(seq))
+        if interval:
+            await asyncio.sleep(interval)
+    return started
+
+
+def _subscriber(url: str, prefix: str, messages: int, ready, results) -> None:
+    asyncio.run(_subscribe(url, prefix, messages, ready, results))
+
+
+async def _subscribe(url: str, prefix: str, messages: int, ready, results) -> None:
+    broker = RedisRoomBroker(url, channel_prefix=prefix, event_channel=f"{prefix}events")
+    latencies: List[float] = []
+    received = asyncio.Event()
+
+    async def on_message(room_id: str, frame: str) -> None:
+        latencies.append(time.time() - jsonutil.loads(frame)["sent"])
+        if len(latencies) >= messages:
+            received.set()
+
+    broker.set_handler(on_message)
+    await broker.subscribe(ROOM)
+    ready.put(True)
+    try:
+        await asyncio.wait_for(received.wait(), WORKER_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        results.put((latencies, time.time()))
+        await broker.close()
+
+
+async def _run_memory(messages: int, rate: float) -> Tuple[List[float], float]:
+    broker = InMemoryRoomBroker()
+    latencies: List[float] = []
+
+    async def on_message(room_id: str, frame: str) -> None:
+        latencies.append(time.time() - jsonutil.loads(frame)["sent"])
+
+    broker.set_handler(on_message)
+    started = await _publish(broker, messages, rate)
+    return latencies, time.time() - started
+
+
+def _run_redis(url: str, workers: int, messages: int, rate: float) -> Tuple[List[float], float]:
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Queue(), context.Queue()
+    # A fresh prefix per run, so leftovers of an aborted run are never counted
+    prefix = f"bench:{uuid.uuid4().hex}:"
+    processes = [context.Process(target=_subscriber, args=(url, prefix, messages, ready, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=WORKER_TIMEOUT_SECONDS)
+
+    async def publish() -> float:
+        broker = RedisRoomBroker(url, channel_prefix=prefix, event_channel=f"{prefix}events")
+        try:
+            return await _publish(broker, messages, rate)
+        finally:
+            await broker.close()
+
+    started = asyncio.run(publish())
+    latencies: List[float] = []
+    finished = started
+    for _ in processes:
+        try:
+            worker_latencies, worker_finished = results.get(timeout=WORKER_TIMEOUT_SECONDS + 5)
+        except queue.Empty:
+            break
+        latencies.extend(worker_latencies)
+        finished = max(finished, worker_finished)
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    return latencies, finished - started
+
+
+async def _redis_available(url: str) -> bool:
+    import redis.asyncio as redis
+
+    client = redis.from_url(url, socket_connect_timeout=1.0)
+    try:
+        await client.ping()
+        return True
+    except Exception:
+        return False
+    finally:
+        await client.close()
+
+
+def _row(backend: str, workers: int, messages: int, latencies: List[float], elapsed: float) -> list:
+    expected = messages * workers
+    return [
+        backend, workers, f"{len(latencies)}/{expected}",
+        percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+        len(latencies) / elapsed if elapsed > 0 else 0.0,
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark room fan-out through the room brokers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker process counts")
+    parser.add_argument("--messages", type=int, default=5000, help="frames published per run")
+    parser.add_argument("--rate", type=float, default=0, help="publish rate in frames/s (0 = as fast as possible)")
+    parser.add_argument("--redis-url", default=settings.REDIS_URL)
+    args = parser.parse_args()
+
+    rows = []
+    latencies, elapsed = asyncio.run(_run_memory(args.messages, args.rate))
+    rows.append(_row("memory", 1, args.messages, latencies, elapsed))
+    if asyncio.run(_redis_available(args.redis_url)):
+        for workers in args.workers:
+            latencies, elapsed = _run_redis(args.redis_url, workers, args.messages, args.rate)
+            rows.append(_row("redis", workers, args.messages, latencies, elapsed))
+    else:
+        print(f"No Redis-compatible server at {args.redis_url}; only the in-process broker was measured")
+    print_table(["broker", "workers", "delivered", "p50 ms", "p99 ms", "deliveries/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Broadcast encode cost against room size
+#
+#   python -m benchmarks.bench_encode [--sizes 10 100 1000 2000] [--messages 200]
+#
+# "per recipient" is the old path: conn.send_json(payload) for every member, which
+# is json.dumps with Starlette's options once per socket. "encode once" is the
+# current path: jsonutil.dumps (orjson) once per message, the same text frame then
+# handed to every member.
+import argparse
+import json
+from datetime import datetime, timezone
+
+from app.utils import jsonutil
+from benchmarks.common import best_of, print_table
+
+NOW = datetime.now(timezone.utc).isoformat()
+PAYLOAD = {
+    "id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+    "content": "Deploy is done, dashboards look normal. Ping me if the error rate moves. " * 2,
+    "user_id": "0b6a2b3e-2f1c-4d4e-9f57-5d1c8f0c9e11",
+    "room_id": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+    "full_name": "Jane Doe",
+    "created_at": NOW,
+    "updated_at": NOW,
+}
+
+
+def per_recipient(members: int, messages: int) -> None:
+    for _ in range(messages):
+        [json.dumps(PAYLOAD, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+         for _ in range(members)]
+
+
+def encode_once(members: int, messages: int) -> None:
+    for _ in range(messages):
+        frame = jsonutil.dumps(PAYLOAD)
+        [frame for _ in range(members)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark broadcast payload encoding against room size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 2000], help="room member counts")
+    parser.add_argument("--messages", type=int, default=200, help="messages broadcast per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    rows = []
+    for members in args.sizes:
+        old = best_of(lambda: per_recipient(members, args.messages), args.repeat) / args.messages
+        new = best_of(lambda: encode_once(members, args.messages), args.repeat) / args.messages
+        rows.append([members, old * 1e6, new * 1e6, old / new if new else 0.0])
+    print_table(["members", "per recipient us/msg", "encode once us/msg", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Export encoder throughput per format
+#
+#   python -m benchmarks.bench_export [--rows 10000000] [--chunk-rows 1000] [--formats csv ndjson arrow parquet]
+#
+# Encodes a room message export of --rows rows through exportutil.encode, in chunks
+# of --chunk-rows as the endpoints stream them, and reports rows/s and output size
+# per format against CSV. Rows are synthetic and built once per chunk up front, so
+# only encoding is timed, not the database cursor. Every chunk repeats the same rows,
+# so the compressed parquet size is optimistic.
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+
+from app.api.routers.admin_analytics_routes import MESSAGE_COLUMNS
+from app.settings import settings
+from app.utils import exportutil
+from benchmarks.common import print_table
+
+
+def _chunk(size: int) -> List[dict]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(size):
+        created_at = start + timedelta(seconds=i)
+        rows.append({
+            "id": f"7c9e6679-7425-40de-944b-{i:012d}",
+            "room_id": "3fa85f64-5717-4562-b3fc-2c963f66afa6",
+            "user_id": f"0b6a2b3e-2f1c-4d4e-9f57-{i % 500:012d}",
+            "full_name": f"User {i % 500}",
+            "content": f"Message {i}: deploy is done, dashboards look normal.",
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    return rows
+
+
+def _batches(rows: int, chunk: List[dict]) -> Iterator[List[dict]]:
+    for offset in range(0, rows, len(chunk)):
+        yield chunk[:rows - offset]
+
+
+def _encode(format: str, rows: int, chunk: List[dict]) -> tuple:
+    size = 0
+    started = time.perf_counter()
+    for part in exportutil.encode(format, _batches(rows, chunk), MESSAGE_COLUMNS):
+        size += len(part)
+    return time.perf_counter() - started, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark export encoding throughput per format")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=settings.EXPORT_CHUNK_ROWS)
+    parser.add_argument("--formats", nargs="+", default=list(exportutil.FORMATS), choices=exportutil.FORMATS)
+    args = parser.parse_args()
+
+    formats = args.formats
+    if not exportutil.has_pyarrow():
+        formats = [format for format in formats if format not in (exportutil.ARROW, exportutil.PARQUET)]
+        print("pyarrow is not installed; skipping arrow and parquet")
+    chunk = _chunk(args.chunk_rows)
+    results = {format: _encode(format, args.rows, chunk) for format in formats}
+
+    baseline = results.get(exportutil.CSV)
+    rows = []
+    for format, (elapsed, size) in results.items():
+        vs_csv = baseline[0] / elapsed if baseline else ""
+        rows.append([format, elapsed, args.rows / elapsed, size / 2 ** 20, vs_csv])
+    print_table(["format", "seconds", "rows/s", "output MiB", "vs csv"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Login throughput against hashing pool size
+#
+#   python -m benchmarks.bench_hashing [--workers 1 2 4 8] [--logins 64] [--rounds 12]
+#
+# A burst of --logins concurrent password checks goes through HashingService.verify
+# for each pool size; "inline" is the old path, Hash.verify on the event loop. Loop
+# lag is the worst delay of a 10 ms ticker running alongside the burst, i.e. how
+# long every other request on the worker would have stalled.
+import argparse
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Tuple
+
+from app.service.hashing_service import HashingService
+from app.settings import settings
+from app.utils.hashing import Hash
+from benchmarks.common import print_table
+
+PASSWORD = "correct horse battery staple"
+TICK_SECONDS = 0.01
+
+
+async def _burst(check: Callable[[], Awaitable[bool]], logins: int) -> Tuple[float, float]:
+    """Run `logins` concurrent checks; returns (elapsed seconds, worst loop lag in seconds)."""
+    worst_lag = 0.0
+    running = True
+
+    async def ticker() -> None:
+        nonlocal worst_lag
+        while running:
+            expected = time.perf_counter() + TICK_SECONDS
+            await asyncio.sleep(TICK_SECONDS)
+            worst_lag = max(worst_lag, time.perf_counter() - expected)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(check() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick
+    assert all(results)
+    return elapsed, worst_lag
+
+
+async def _inline(hashed: str) -> bool:
+    return Hash.verify(PASSWORD, hashed)
+
+
+async def _run(workers_list, logins: int, rounds: int) -> list:
+    hashed = Hash.hash(PASSWORD, rounds)
+    rows = []
+    elapsed, lag = await _burst(lambda: _inline(hashed), logins)
+    rows.append(["inline", logins / elapsed, lag * 1000])
+    for workers in workers_list:
+        service = HashingService(workers=workers, max_pending=logins, rounds=rounds)
+        try:
+            # Start the worker processes outside the measurement
+            await asyncio.gather(*(service.verify(PASSWORD, hashed) for _ in range(workers)))
+            elapsed, lag = await _burst(lambda: service.verify(PASSWORD, hashed), logins)
+        finally:
+            service.shutdown()
+        rows.append([f"pool of {workers}", logins / elapsed, lag * 1000])
+    return rows
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark login throughput against hashing pool size")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cpus}), help="pool sizes to measure")
+    parser.add_argument("--logins", type=int, default=64, help="concurrent logins per burst")
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS, help="bcrypt work factor")
+    args = parser.parse_args()
+
+    rows = asyncio.run(_run(args.workers, args.logins, args.rounds))
+    print_table(["hashing", "logins/s", "worst loop lag ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
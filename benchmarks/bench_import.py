@@ -0,0 +1,80 @@
+# Bulk user import against one signup per row
+#
+#   python -m benchmarks.bench_import [--rows 10000] [--per-row 200] [--existing 100000] [--rounds 12]
+#
+# Seeds --existing users, then creates new ones two ways: "bulk import" streams --rows
+# rows through UserImportService (one duplicate check per batch, hash_many on the
+# hashing pool, one executemany); "per row" repeats what POST /user/signup did for
+# each of --per-row rows (email lookup, inline bcrypt, single-row commit). The rates
+# are comparable although the row counts differ.
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from app.model.user_record import UserRecord
+from app.repo.user_repo import UserRepo
+from app.service.hashing_service import HashingService
+from app.service.user_import_service import CREATED, UserImportService
+from app.settings import settings
+from app.utils.hashing import Hash
+from benchmarks.common import bench_database, insert_rows, print_table, user_rows
+
+
+def _import_rows(count: int, prefix: str):
+    for i in range(count):
+        yield {"email": f"{prefix}{i}@example.com", "full_name": f"Imported {prefix} {i}", "password": f"secret-{i}"}
+
+
+async def _bulk_import(service: UserImportService, count: int) -> int:
+    created = 0
+    async for result in service.import_rows(_import_rows(count, "bulk")):
+        created += result.get("status") == CREATED
+    return created
+
+
+def _per_row(repo: UserRepo, count: int, rounds: int) -> int:
+    created = 0
+    for row in _import_rows(count, "single"):
+        if repo.get_user_by_email(row["email"], fresh=True) is not None:
+            continue
+        repo.add_user_record(UserRecord(id=str(uuid.uuid4()), email=row["email"], full_name=row["full_name"],
+                                        username=row["email"].split("@")[0], role="user",
+                                        password=Hash.hash(row["password"], rounds)))
+        created += 1
+    return created
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bulk user import against per-row signup")
+    parser.add_argument("--rows", type=int, default=10000, help="rows in the bulk import")
+    parser.add_argument("--per-row", type=int, default=200, help="rows created one signup at a time")
+    parser.add_argument("--existing", type=int, default=100000, help="users seeded beforehand")
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS, help="bcrypt work factor")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing pool size")
+    args = parser.parse_args()
+
+    db = bench_database()
+    insert_rows(db.engine, UserRecord.__table__, user_rows(args.existing))
+    repo = UserRepo(db)
+
+    rows = []
+    started = time.perf_counter()
+    created = _per_row(repo, args.per_row, args.rounds)
+    elapsed = time.perf_counter() - started
+    rows.append(["per row", created, elapsed, created / elapsed])
+
+    hasher = HashingService(workers=args.workers, rounds=args.rounds)
+    try:
+        started = time.perf_counter()
+        created = asyncio.run(_bulk_import(UserImportService(repo, hasher), args.rows))
+        elapsed = time.perf_counter() - started
+    finally:
+        hasher.shutdown()
+    rows.append([f"bulk import ({args.workers} hashing workers)", created, elapsed, created / elapsed])
+    print_table(["method", "users created", "seconds", "users/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Signup username selection with a large user table
+#
+#   python -m benchmarks.bench_signup [--users 1000000] [--colliding 200] [--signups 20]
+#
+# Seeds --users users, --colliding of which already hold "jane_doe" or "jane_doe_N",
+# then signs up --signups more Jane Does two ways: "load all" reads every username and
+# probes the list for a free suffix, as signup used to; "prefix query" is
+# UserRepo.add_user_record_with_unique_username, which reads only the usernames under
+# the prefix through the username index. Both insert the user; hashing is left out.
+import argparse
+import time
+import uuid
+
+from app.model.user_record import UserRecord
+from app.repo.user_repo import UserRepo
+from benchmarks.common import bench_database, insert_rows, print_table, user_rows
+
+BASE_USERNAME = "jane_doe"
+
+
+def _colliding_rows(count: int):
+    for i in range(count):
+        yield {"id": f"jane-{i:08d}", "email": f"jane{i}@example.com", "password": "not-a-hash",
+               "username": BASE_USERNAME if i == 0 else f"{BASE_USERNAME}_{i}", "full_name": "Jane Doe"}
+
+
+def _new_record() -> UserRecord:
+    id = str(uuid.uuid4())
+    return UserRecord(id=id, email=f"{id}@example.com", password="not-a-hash", full_name="Jane Doe", role="user")
+
+
+def _signup_load_all(repo: UserRepo) -> None:
+    with repo.db.get_session() as session:
+        existing = [str(row[0]) for row in session.query(UserRecord.username).all() if row[0]]
+    username = BASE_USERNAME
+    counter = 1
+    while username in existing:
+        username = f"{BASE_USERNAME}_{counter}"
+        counter += 1
+    record = _new_record()
+    record.username = username
+    repo.add_user_record(record)
+
+
+def _signup_prefix_query(repo: UserRepo) -> None:
+    repo.add_user_record_with_unique_username(_new_record(), BASE_USERNAME)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark signup username selection on a large user table")
+    parser.add_argument("--users", type=int, default=1_000_000, help="existing users")
+    parser.add_argument("--colliding", type=int, default=200, help="existing users named jane_doe[_N]")
+    parser.add_argument("--signups", type=int, default=20, help="signups timed per approach")
+    args = parser.parse_args()
+
+    db = bench_database()
+    started = time.perf_counter()
+    insert_rows(db.engine, UserRecord.__table__, user_rows(args.users - args.colliding))
+    insert_rows(db.engine, UserRecord.__table__, _colliding_rows(args.colliding))
+    print(f"Seeded {args.users:,} users in {time.perf_counter() - started:.1f}s")
+
+    repo = UserRepo(db)
+    rows = []
+    for name, signup in (("load all", _signup_load_all), ("prefix query", _signup_prefix_query)):
+        started = time.perf_counter()
+        for _ in range(args.signups):
+            signup(repo)
+        elapsed = time.perf_counter() - started
+        rows.append([name, elapsed / args.signups * 1000, args.signups / elapsed])
+    print_table(["username check", "ms/signup", "signups/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
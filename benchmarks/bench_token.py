@@ -0,0 +1,46 @@
+# Cold against warm bearer-token verification
+#
+#   python -m benchmarks.bench_token [--calls 20000]
+#
+# "cold" forgets the token before every call, so each verify_token decodes and
+# HMAC-checks it; "warm" verifies the same token again and is served from the
+# verified-claims cache. "jwt.decode" is the uncached call every request used to make.
+import argparse
+import time
+
+import jwt
+
+from app.utils import tokenutil
+from benchmarks.common import best_of, print_table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark cold and warm token verification")
+    parser.add_argument("--calls", type=int, default=20000, help="verifications per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    token = tokenutil.create_token({"sub": "bench@example.com", "exp": int(time.time()) + 3600})
+
+    def decode() -> None:
+        for _ in range(args.calls):
+            jwt.decode(token, tokenutil.SECRET_KEY, algorithms=[tokenutil.ALGORITHM])
+
+    def cold() -> None:
+        for _ in range(args.calls):
+            tokenutil.forget_token(token)
+            tokenutil.verify_token(token)
+
+    def warm() -> None:
+        for _ in range(args.calls):
+            tokenutil.verify_token(token)
+
+    tokenutil.verify_token(token)
+    rows = [[name, best_of(fn, args.repeat) / args.calls * 1e6]
+            for name, fn in (("jwt.decode", decode), ("cold", cold), ("warm", warm))]
+    baseline = rows[0][1]
+    print_table(["verification", "us/call", "vs jwt.decode"], [row + [baseline / row[1]] for row in rows])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Timing and reporting helpers shared by the benchmarks
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Sequence
+
+from sqlalchemy import inspect
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 for an empty sample)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def best_of(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Fastest wall-clock time in seconds of `repeat` calls of fn()."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def print_table(headers: Sequence[str], rows: List[Sequence]) -> None:
+    """Print rows as a right-aligned plain-text table; floats get 2 decimals."""
+    cells = [[_cell(value) for value in row] for row in rows]
+    widths = [max([len(header)] + [len(row[i]) for row in cells]) for i, header in enumerate(headers)]
+    print("  ".join(header.rjust(width) for header, width in zip(headers, widths)))
+    for row in cells:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def _cell(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def bench_database():
+    """
+    The DataSource behind the benchmark, emptied first. The default SQLite file gets
+    a fresh schema; any other database must already be migrated and is only wiped
+    when BENCH_RESET_DATABASE=1, so a benchmark never empties a real one by accident.
+    """
+    import app.model.analytics_record  # noqa: F401 - registers the rollup tables
+    import app.repo.message_repo  # noqa: F401 - registers users, rooms and messages
+    from app.repo.datasource import Base, DataSource
+
+    db = DataSource()
+    if db.engine.dialect.name == "sqlite":
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+    elif os.environ.get("BENCH_RESET_DATABASE") == "1":
+        existing = set(inspect(db.engine).get_table_names())
+        with db.engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                if table.name in existing:
+                    conn.execute(table.delete())
+    else:
+        raise SystemExit(f"{db.engine.url!r} would be emptied; set BENCH_RESET_DATABASE=1 to allow it")
+    return db
+
+
+def insert_rows(engine, table, rows: Iterable[dict], batch_size: int = 10000) -> int:
+    """executemany `rows` into `table` in batches; returns the row count."""
+    count = 0
+    with engine.begin() as conn:
+        for batch in _batches(rows, batch_size):
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+    return count
+
+
+def user_rows(count: int, start: int = 0) -> Iterator[dict]:
+    for i in range(start, start + count):
+        yield {"id": f"user-{i:08d}", "email": f"user{i}@example.com", "password": "not-a-hash",
+               "username": f"user{i}", "full_name": f"User {i}", "role": "user"}
+
+
+def room_rows(count: int, admin_id: str) -> Iterator[dict]:
+    for i in range(count):
+        yield {"id": f"room-{i:06d}", "name": f"room {i}", "admin_id": admin_id}
+
+
+def message_rows(count: int, rooms: int, users: int, days: int, seed: int = 42) -> Iterator[dict]:
+    """Messages spread at random over rooms, users and the last `days` days."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    span = days * 86400
+    for i in range(count):
+        created_at = now - timedelta(seconds=rng.random() * span)
+        yield {"id": f"message-{i:09d}", "content": "hello", "user_id": f"user-{rng.randrange(users):08d}",
+               "room_id": f"room-{rng.randrange(rooms):06d}", "created_at": created_at, "updated_at": created_at}
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
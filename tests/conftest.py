@@ -0,0 +1,20 @@
+import os
+
+# app.settings requires a database URL at import; the tests only use in-memory SQLite
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+from app.repo.datasource import Base  # noqa: E402
+from tests.seed import seed  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def seeded_engine():
+    """In-memory SQLite with the tests.seed dataset. Tests must not modify it."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    seed(engine)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,39 @@
+# Deterministic dataset for the tests that need real rows
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+import app.model.analytics_record  # noqa: F401 - registers the rollup and sketch tables
+from app.model.message_record import MessageRecord
+from app.model.room_record import RoomRecord
+from app.model.user_record import UserRecord
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DAYS = 30
+USERS = [f"user-{i:02d}" for i in range(50)]
+ROOMS = [f"room-{i:02d}" for i in range(10)]
+
+
+def _messages():
+    rng = random.Random(7)
+    messages = []
+    for i in range(5000):
+        created_at = START + timedelta(minutes=rng.randrange(DAYS * 24 * 60))
+        messages.append({"id": f"message-{i:05d}", "content": "hello", "user_id": rng.choice(USERS),
+                         "room_id": rng.choice(ROOMS), "created_at": created_at, "updated_at": created_at})
+    return messages
+
+
+# 5000 messages spread over 50 users, 10 rooms and the 30 days from START
+MESSAGES = _messages()
+
+
+def seed(engine) -> None:
+    """Insert the dataset and ANALYZE it, so the planner sees realistic statistics."""
+    with engine.begin() as conn:
+        conn.execute(UserRecord.__table__.insert(), [
+            {"id": id, "email": f"{id}@example.com", "password": "x", "username": id, "full_name": id} for id in USERS])
+        conn.execute(RoomRecord.__table__.insert(), [{"id": id, "name": id, "admin_id": USERS[0]} for id in ROOMS])
+        conn.execute(MessageRecord.__table__.insert(), MESSAGES)
+        conn.execute(text("ANALYZE"))
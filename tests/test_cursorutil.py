@@ -0,0 +1,60 @@
+# Keyset cursors must survive an encode/decode round trip and reject anything else
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils import cursorutil
+
+CREATED_AT = datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("direction", [cursorutil.BEFORE, cursorutil.AFTER])
+def test_cursor_round_trip(direction):
+    cursor = cursorutil.encode_cursor(direction, CREATED_AT, "message-1")
+    assert cursorutil.decode_cursor(cursor) == (direction, CREATED_AT, "message-1")
+    assert cursorutil.parse_cursor(cursor) == (direction, CREATED_AT, "message-1")
+
+
+def test_cursor_is_url_safe():
+    cursor = cursorutil.encode_cursor(cursorutil.BEFORE, CREATED_AT, "id/with+odd=chars?")
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+    assert cursorutil.decode_cursor(cursor)[2] == "id/with+odd=chars?"
+
+
+def test_naive_timestamps_decode_as_utc():
+    cursor = cursorutil.encode_cursor(cursorutil.AFTER, CREATED_AT.replace(tzinfo=None), "message-1")
+    assert cursorutil.decode_cursor(cursor)[1] == CREATED_AT
+
+
+def test_missing_cursor_parses_as_none():
+    assert cursorutil.parse_cursor(None) is None
+    assert cursorutil.parse_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", cursorutil.encode_cursor("x", CREATED_AT, "message-1")],
+                         ids=["garbage", "wrong_shape", "unknown_direction"])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        cursorutil.decode_cursor(cursor)
+
+
+def test_search_cursor_round_trip():
+    cursor = cursorutil.encode_cursor(-1.25, CREATED_AT, "message-1")
+    assert cursorutil.decode_cursor(cursor, cursorutil.SEARCH) == (-1.25, CREATED_AT, "message-1")
+    assert cursorutil.parse_cursor(cursor, cursorutil.SEARCH) == (-1.25, CREATED_AT, "message-1")
+
+
+@pytest.mark.parametrize("fields", [(cursorutil.BEFORE, CREATED_AT), (cursorutil.BEFORE, CREATED_AT, "id", "extra")],
+                         ids=["too_few", "too_many"])
+def test_cursor_with_wrong_field_count_is_invalid(fields):
+    with pytest.raises(ValueError):
+        cursorutil.decode_cursor(cursorutil.encode_cursor(*fields))
+
+
+def test_cursor_of_another_kind_is_invalid():
+    history = cursorutil.encode_cursor(cursorutil.BEFORE, CREATED_AT, "message-1")
+    search = cursorutil.encode_cursor(-1.25, CREATED_AT, "message-1")
+    with pytest.raises(ValueError):
+        cursorutil.decode_cursor(history, cursorutil.SEARCH)
+    with pytest.raises(ValueError):
+        cursorutil.decode_cursor(search)
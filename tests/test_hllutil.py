@@ -0,0 +1,55 @@
+# HyperLogLog estimates must stay within a few standard errors and merge losslessly
+import pytest
+
+from app.utils.hllutil import HyperLogLog
+
+
+def _sketch(values, p=12):
+    sketch = HyperLogLog(p)
+    sketch.update(values)
+    return sketch
+
+
+def _assert_close(estimate, actual, sketch):
+    assert abs(estimate - actual) <= 4 * sketch.relative_error * actual, (estimate, actual)
+
+
+@pytest.mark.parametrize("distinct", [10, 1000, 50000])
+def test_count_is_within_error(distinct):
+    sketch = _sketch(f"user-{i}" for i in range(distinct))
+    _assert_close(sketch.count(), distinct, sketch)
+
+
+def test_repeated_values_count_once():
+    sketch = _sketch(f"user-{i % 100}" for i in range(10000))
+    _assert_close(sketch.count(), 100, sketch)
+    assert not sketch.add("user-1")
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+
+
+def test_merge_equals_sketch_of_union():
+    first = _sketch(f"user-{i}" for i in range(0, 30000))
+    second = _sketch(f"user-{i}" for i in range(20000, 50000))
+    union = _sketch(f"user-{i}" for i in range(0, 50000))
+    merged = first.merge(second)
+    assert merged.to_bytes() == union.to_bytes()
+    _assert_close(merged.count(), 50000, merged)
+
+
+def test_merge_registers_and_round_trip():
+    first = _sketch(f"user-{i}" for i in range(1000))
+    second = _sketch(f"user-{i}" for i in range(500, 1500))
+    restored = HyperLogLog.from_bytes(first.to_bytes())
+    assert restored.to_bytes() == first.to_bytes()
+    restored.merge_registers(second.to_bytes())
+    assert restored.to_bytes() == _sketch(f"user-{i}" for i in range(1500)).to_bytes()
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(10))
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge_registers(bytes(10))
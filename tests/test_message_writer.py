@@ -0,0 +1,158 @@
+# Write-behind journals must be replayed once, by one worker, and only when their owner is gone
+import asyncio
+import fcntl
+import os
+from datetime import datetime, timezone
+
+from app.service.message_writer import WRITE_BEHIND, MessageWriter
+from app.utils import jsonutil
+
+CREATED_AT = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class _FakeSession:
+    async def rollback(self):
+        pass
+
+
+class _FakeDataSource:
+    def get_session(self):
+        return _FakeSession()
+
+    async def close_session(self, session):
+        pass
+
+
+class _FakeMessageRepo:
+    """Keeps inserted rows by id, like the messages table."""
+
+    def __init__(self, stored=()):
+        self.rows = {id: None for id in stored}
+        self.inserted = []
+
+    async def bulk_create(self, session, rows):
+        self.inserted += [row["id"] for row in rows]
+        self.rows.update((row["id"], row) for row in rows)
+
+    async def existing_ids(self, session, ids, since=None):
+        return {id for id in ids if id in self.rows}
+
+
+def _row(id):
+    return {"id": id, "content": "hello", "user_id": "user-1", "room_id": "room-1",
+            "created_at": CREATED_AT, "updated_at": CREATED_AT}
+
+
+def _write_journal(path, *ids, torn=False):
+    with open(path, "w", encoding="utf-8") as journal:
+        for id in ids:
+            row = {**_row(id), "created_at": CREATED_AT.isoformat(), "updated_at": CREATED_AT.isoformat()}
+            journal.write(jsonutil.dumps(row) + "\n")
+        if torn:
+            journal.write('{"id": "message-torn", "cont')
+
+
+def _writer(journal_path, repo):
+    return MessageWriter(_FakeDataSource(), repo, mode=WRITE_BEHIND, batch_size=100, flush_interval_ms=60000,
+                         journal_path=str(journal_path), journal_fsync=False)
+
+
+def _run(writer, *steps):
+    async def run():
+        await writer.start()
+        for step in steps:
+            await step(writer)
+        await writer.stop()
+    asyncio.run(run())
+
+
+def test_recovers_journal_of_stopped_worker(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    dead = f"{journal_path}.99999999"
+    _write_journal(dead, "message-1", "message-2", torn=True)
+    repo = _FakeMessageRepo(stored=["message-1"])
+    _run(_writer(journal_path, repo))
+    # Already stored rows are skipped and the torn line is dropped
+    assert repo.inserted == ["message-2"]
+    assert repo.rows["message-2"]["created_at"] == CREATED_AT
+    assert not os.path.exists(dead)
+
+
+def test_recovers_unsuffixed_legacy_journal(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    _write_journal(journal_path, "message-1")
+    repo = _FakeMessageRepo()
+    _run(_writer(journal_path, repo))
+    assert repo.inserted == ["message-1"]
+    assert not journal_path.exists()
+
+
+def test_leaves_live_journal_alone(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    live = f"{journal_path}.99999999"
+    _write_journal(live, "message-1")
+    repo = _FakeMessageRepo()
+    with open(live, "a") as owner:
+        fcntl.flock(owner.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        _run(_writer(journal_path, repo))
+    assert repo.inserted == []
+    assert os.path.exists(live)
+
+
+def test_crashed_worker_rows_are_recovered_once(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    repo = _FakeMessageRepo()
+    crashed = _writer(journal_path, repo)
+
+    async def crash():
+        await crashed.start()
+        await crashed.submit(_row("message-1"))
+        await crashed.submit(_row("message-2"))
+        # Dies without flushing: the task goes away and the OS drops the journal lock
+        crashed._task.cancel()
+        crashed._journal.close()
+
+    asyncio.run(crash())
+    assert repo.inserted == []
+    _run(_writer(journal_path, repo))
+    _run(_writer(journal_path, repo))
+    assert repo.inserted == ["message-1", "message-2"]
+    assert not list(tmp_path.glob("messages.journal.[0-9]*"))
+
+
+def test_flush_inserts_buffer_and_clears_journal(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    repo = _FakeMessageRepo()
+    writer = _writer(journal_path, repo)
+    own_journal = f"{journal_path}.{os.getpid()}"
+
+    async def submit_and_flush(writer):
+        await writer.submit(_row("message-1"))
+        assert os.path.getsize(own_journal) > 0
+        await writer.flush()
+        assert os.path.getsize(own_journal) == 0
+
+    _run(writer, submit_and_flush)
+    assert repo.inserted == ["message-1"]
+    # A clean stop leaves nothing to recover
+    assert not os.path.exists(own_journal)
+
+
+def test_naive_journal_timestamps_are_read_as_utc(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    naive = CREATED_AT.replace(tzinfo=None).isoformat()
+    with open(journal_path, "w", encoding="utf-8") as journal:
+        journal.write(jsonutil.dumps({**_row("message-1"), "created_at": naive, "updated_at": naive}) + "\n")
+    repo = _FakeMessageRepo()
+    _run(_writer(journal_path, repo))
+    assert repo.rows["message-1"]["created_at"] == CREATED_AT
+    assert repo.rows["message-1"]["created_at"].tzinfo is not None
+
+
+def test_recovery_reports_the_days_it_inserted_into(tmp_path):
+    journal_path = tmp_path / "messages.journal"
+    _write_journal(f"{journal_path}.99999999", "message-1", "message-2")
+    repo = _FakeMessageRepo(stored=["message-1"])
+    writer = _writer(journal_path, repo)
+    _run(writer)
+    assert writer.recovered_days == {CREATED_AT.date()}
@@ -0,0 +1,116 @@
+# Hot queries must be served by their indexes on SQLite, planned against the seeded
+# dataset (tests.seed) after ANALYZE:
+# - room history by ix_messages_room_id_created_at_id, an index range scan in
+#   (created_at DESC, id DESC) order with no sort step;
+# - per-user activity reports and timeseries by ix_messages_user_id_created_at.
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.model.message_record import MessageRecord
+from app.repo.analytics_repo import AnalyticsRepo
+from app.repo.message_repo import AsyncMessageRepo
+from tests.seed import MESSAGES, START, USERS
+
+HISTORY_INDEX = "ix_messages_room_id_created_at_id"
+USER_ACTIVITY_INDEX = "ix_messages_user_id_created_at"
+POSITION = (datetime(2024, 1, 1, 12, 0, 0), "message-id")
+RANGE = {"start": START + timedelta(days=3), "end": START + timedelta(days=5)}
+
+
+class _CapturingSession:
+    """Stands in for the AsyncSession so the repo's own statement can be planned."""
+
+    def __init__(self):
+        self.statement = None
+
+    async def execute(self, statement):
+        self.statement = statement
+        return self
+
+    def all(self):
+        return []
+
+
+def _history_statement(**kwargs):
+    session = _CapturingSession()
+    asyncio.run(AsyncMessageRepo().get_history(session, "room-1", **kwargs))
+    return session.statement
+
+
+def _query_plan(engine, run):
+    """EXPLAIN QUERY PLAN details for the last SQL, with its parameters, that run(session) sent."""
+    executed = []
+
+    def capture(conn, cursor, sql, parameters, context, executemany):
+        executed.append((sql, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with Session(engine) as session:
+            run(session)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    sql, parameters = executed[-1]
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parameters)]
+
+
+def _messages_step(plan):
+    return next(step for step in plan if "messages" in step)
+
+
+def _uses_index(step, index):
+    return f"USING INDEX {index}" in step or f"USING COVERING INDEX {index}" in step
+
+
+def test_indexes_are_declared():
+    indexes = {index.name for index in MessageRecord.__table__.indexes}
+    assert {HISTORY_INDEX, USER_ACTIVITY_INDEX} <= indexes
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"before": POSITION}, {"after": POSITION}],
+                         ids=["first_page", "older_page", "newer_page"])
+def test_history_uses_room_created_at_index(seeded_engine, kwargs):
+    statement = _history_statement(**kwargs)
+    plan = _query_plan(seeded_engine, lambda session: session.execute(statement))
+    step = _messages_step(plan)
+    assert _uses_index(step, HISTORY_INDEX), plan
+    assert "room_id=?" in step, plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+@pytest.mark.parametrize("kwargs", [{}, RANGE], ids=["all_time", "date_range"])
+def test_user_activity_uses_user_created_at_index(seeded_engine, kwargs):
+    repo = AnalyticsRepo()
+    plan = _query_plan(seeded_engine, lambda session: repo.user_activity(session, **kwargs))
+    step = _messages_step(plan)
+    assert _uses_index(step, USER_ACTIVITY_INDEX), plan
+    if kwargs:
+        assert "created_at>?" in step and "created_at<?" in step, plan
+
+
+def test_user_timeseries_uses_user_created_at_index(seeded_engine):
+    repo = AnalyticsRepo()
+    plan = _query_plan(seeded_engine, lambda session: repo.bucket_counts(
+        session, "hour", RANGE["start"], RANGE["end"], user_id=USERS[0]))
+    step = _messages_step(plan)
+    assert _uses_index(step, USER_ACTIVITY_INDEX), plan
+    assert "user_id=?" in step and "created_at>?" in step, plan
+
+
+@pytest.mark.parametrize("kwargs", [{}, RANGE], ids=["all_time", "date_range"])
+def test_user_activity_counts(seeded_engine, kwargs):
+    start, end = kwargs.get("start"), kwargs.get("end")
+    expected = Counter(message["user_id"] for message in MESSAGES
+                       if (start is None or message["created_at"] >= start)
+                       and (end is None or message["created_at"] <= end))
+    with Session(seeded_engine) as session:
+        rows = AnalyticsRepo().user_activity(session, **kwargs)
+    assert {row["user_id"]: row["message_count"] for row in rows} == {user: expected[user] for user in USERS}
+    counts = [row["message_count"] for row in rows]
+    assert counts == sorted(counts, reverse=True)
@@ -0,0 +1,65 @@
+# Rolled-up days must be recomputed when late rows land in them
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.model.message_record import MessageRecord
+from app.repo.analytics_repo import DAY, AnalyticsRepo
+from app.repo.datasource import Base
+from app.service.rollup_service import RollupService
+from tests.seed import DAYS, ROOMS, START, USERS, seed
+
+
+class _DataSource:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def get_session(self):
+        return Session(self.engine)
+
+    def close_session(self, session):
+        session.close()
+
+
+@pytest.fixture
+def service():
+    # Its own database: these tests add rows
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    seed(engine)
+    yield RollupService(_DataSource(engine), AnalyticsRepo(), grace_seconds=0)
+    engine.dispose()
+
+
+def _add_late_message(service, day):
+    created_at = START + DAY * day + timedelta(hours=12)
+    with service.db.engine.begin() as conn:
+        conn.execute(MessageRecord.__table__.insert(), [{
+            "id": f"late-{day}", "content": "late", "user_id": USERS[0], "room_id": ROOMS[0],
+            "created_at": created_at, "updated_at": created_at}])
+    return created_at.date()
+
+
+def _totals(service, day):
+    with service.db.get_session() as session:
+        return service.analytics_repo.rollup_totals(session, day)
+
+
+def test_reroll_recomputes_rolled_up_days(service):
+    assert service.compact() >= DAYS
+    day = _add_late_message(service, 3)
+    totals = _totals(service, day)
+    assert totals["raw"] == totals["by_room"] + 1 == totals["by_user"] + 1
+    assert service.reroll([day, day]) == 1
+    totals = _totals(service, day)
+    assert totals["raw"] == totals["by_room"] == totals["by_user"]
+    assert service.check() == []
+
+
+def test_reroll_leaves_days_past_the_watermark_to_compaction(service):
+    assert service.reroll([START.date()]) == 0
+    service.compact()
+    # Today is still open, so it is past the watermark
+    assert service.reroll([datetime.now(timezone.utc).date()]) == 0
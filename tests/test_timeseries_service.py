@@ -0,0 +1,75 @@
+# Timeseries must come back dense, with zeros for empty buckets, and match the seed
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.repo.analytics_repo import AnalyticsRepo
+from app.service.timeseries_service import TimeseriesService, floor_bucket
+from tests.seed import MESSAGES, ROOMS, START
+
+HOUR = timedelta(hours=1)
+
+
+class _CountingRepo(AnalyticsRepo):
+    def __init__(self):
+        self.calls = 0
+
+    def bucket_counts(self, *args, **kwargs):
+        self.calls += 1
+        return super().bucket_counts(*args, **kwargs)
+
+
+def _expected(start, end, width, key=None):
+    counts = Counter()
+    for message in MESSAGES:
+        if start <= message["created_at"] < end:
+            counts[floor_bucket(message["created_at"], width), message[key] if key else None] += 1
+    return counts
+
+
+def test_empty_buckets_are_zero_filled(seeded_engine):
+    start, end = START - 3 * HOUR, START + 3 * HOUR
+    with Session(seeded_engine) as session:
+        result = TimeseriesService(AnalyticsRepo()).series(session, "hour", start, end)
+    assert result["buckets"] == [(start + HOUR * i).isoformat() for i in range(6)]
+    expected = _expected(start, end, HOUR)
+    [series] = result["series"]
+    assert series["key"] == "all"
+    assert series["counts"] == [expected[start + HOUR * i, None] for i in range(6)]
+    assert series["counts"][:3] == [0, 0, 0] and sum(series["counts"]) > 0
+
+
+def test_grouped_series_are_dense(seeded_engine):
+    start, end = START, START + timedelta(days=2)
+    with Session(seeded_engine) as session:
+        result = TimeseriesService(AnalyticsRepo()).series(session, "hour", start, end, group_by="room")
+    expected = _expected(start, end, HOUR, key="room_id")
+    assert {series["key"] for series in result["series"]} == set(ROOMS)
+    for series in result["series"]:
+        assert len(series["counts"]) == 48
+        assert series["counts"] == [expected[start + HOUR * i, series["key"]] for i in range(48)]
+    totals = [sum(series["counts"]) for series in result["series"]]
+    assert totals == sorted(totals, reverse=True)
+
+
+def test_closed_buckets_are_cached(seeded_engine):
+    repo = _CountingRepo()
+    service = TimeseriesService(repo, close_grace_seconds=0)
+    start, end = START, START + timedelta(days=1)
+    with Session(seeded_engine) as session:
+        first = service.series(session, "hour", start, end)
+        second = service.series(session, "hour", start, end)
+    assert first == second
+    assert repo.calls == 1
+    assert service.stats()["hits"] >= 24
+
+
+def test_rejects_unknown_bucket_and_oversized_ranges(seeded_engine):
+    service = TimeseriesService(AnalyticsRepo(), max_buckets=24)
+    with Session(seeded_engine) as session:
+        with pytest.raises(ValueError):
+            service.series(session, "week", START, START + HOUR)
+        with pytest.raises(ValueError):
+            service.series(session, "hour", START, START + timedelta(days=2))